@@ -1,22 +1,20 @@
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 import uvicorn
 import os
-import signal
 import sys
 import asyncio
+import gzip
+import json
+import uuid
 from dotenv import load_dotenv
-from typing import List
-
-from core.system_detector import SystemDetector
-from core.test_engine import TestEngine
-from core.llm_client import LLMClient
-from core.report_generator import ReportGenerator
-from models.schemas import TestPlan, TestResult, SystemInfo, TestStatus
+from datetime import datetime
+from typing import List, Optional, Dict, Any
 
 # 加载环境变量 - 修复路径问题
+# 必须在导入core模块之前：日志、追踪等在导入时读取配置
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
 if os.path.exists(env_path):
     load_dotenv(env_path)
@@ -26,6 +24,29 @@ else:
     if os.path.exists(example_path):
         load_dotenv(example_path)
 
+from core.system_detector import SystemDetector
+from core.test_engine import TestEngine
+from core.llm_client import LLMClient
+from core.report_generator import ReportGenerator
+from core.report_renderers import media_type_for, render_diff_markdown
+from core.result_store import ResultStore
+from core.blob_store import AnalysisCache
+from core.result_diff import diff_executions
+from core.scheduler import Scheduler, HostLocks
+from core.checkpoint import CheckpointStore, Checkpoint
+from core.plan_cache import PlanCache
+from core.triage import ResultTriage, load_previous_results
+from core.loop_watchdog import LoopWatchdog
+from core.shared_state import create_shared_state, WORKER_ID
+from core.job_tracker import JobTracker
+from core.coalescing import SingleFlight
+from core.retention import RetentionManager, ManagedDirectory, ARCHIVE_SUFFIX, INDEX_FILENAME
+from core.tracing import tracer
+from core.logger import get_logger, fields, log_payload
+from models.schemas import TestPlan, TestItem, TestResult, SystemInfo, TestSchedule
+
+logger = get_logger("app")
+
 app = FastAPI(
     title="SysScope AI API",
     description="基于LLM的自动化系统测试报告生成API / LLM-based Automated System Test Report Generation API",
@@ -41,49 +62,199 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """为每个HTTP请求记录一个span"""
+    with tracer.span("http.request", method=request.method, path=request.url.path) as span:
+        response = await call_next(request)
+        span.set_attribute("status", response.status_code)
+        return response
+
 # 初始化核心组件
 system_detector = SystemDetector()
 test_engine = TestEngine()
 llm_client = LLMClient()
 report_generator = ReportGenerator()
+result_store = ResultStore(os.getenv("RESULTS_OUTPUT_PATH", os.path.join(report_generator.config.output_path, "results")))
+
+def _build_retention_manager() -> RetentionManager:
+    """报告、结构化结果和轮转日志的保留策略管理"""
+    reports_dir = report_generator.config.output_path
+    directories = [
+        ManagedDirectory(
+            reports_dir,
+            lambda name: media_type_for(name) is not None and '.partial.' not in name and name != INDEX_FILENAME
+        ),
+        ManagedDirectory(
+            result_store.base_path,
+            lambda name: name != "index.ndjson" and name.endswith(('.json', '.ndjson', '.csv')),
+            on_removed=result_store.remove_from_index
+        )
+    ]
+    log_file = os.getenv("LOG_FILE")
+    if log_file:
+        # 只处理轮转出的备份（app.log.1 等），不动正在写入的日志文件
+        base = os.path.basename(log_file)
+        directories.append(ManagedDirectory(
+            os.path.dirname(log_file) or ".",
+            lambda name: name.startswith(base + ".") and name[len(base) + 1:].split('.')[0].isdigit(),
+            timestamped_archives=True
+        ))
+    return RetentionManager(directories, os.path.join(reports_dir, INDEX_FILENAME))
+
+retention_manager = _build_retention_manager()
+# 跨worker共享的任务状态、进度、计划缓存和租约，WORKERS大于1时使用SQLite
+shared_state = create_shared_state()
+job_tracker = JobTracker(shared_state)
+# 按内容缓存单项分析，内容相同的结果（跨主机、跨执行）只调用一次LLM
+analysis_cache = AnalysisCache(shared_state, float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "604800")))
+host_locks = HostLocks(shared_state)
+checkpoint_store = CheckpointStore(os.getenv("CHECKPOINT_PATH", "data/checkpoints"))
+plan_cache = PlanCache(
+    llm_client.generate_test_plan,
+    ttl_seconds=float(os.getenv("PLAN_CACHE_TTL_SECONDS", "3600")),
+    shared=shared_state
+)
+plan_prefetch_enabled = os.getenv("PLAN_PREFETCH_ENABLED", "true").lower() == "true"
+system_info_flight = SingleFlight("system_info")
+# LLM分析前的规则预分类，未变化和已知正常的结果不再调用LLM
+result_triage = ResultTriage.from_env() if os.getenv("TRIAGE_ENABLED", "true").lower() == "true" else None
+
+async def _collect_system_info() -> SystemInfo:
+    """在线程中采集系统信息，并发请求合并为一次采集"""
+    return await system_info_flight.do("system_info", lambda: asyncio.to_thread(system_detector.get_system_info))
+
+# 事件循环延迟和阻塞调用检测
+loop_watchdog = LoopWatchdog.from_env()
+# 多worker时/metrics、/api/trace等只返回处理请求的那个worker的数据，导出的指标加上worker标签区分
+if int(os.getenv("WORKERS", "1")) > 1:
+    tracer.set_constant_labels(worker=WORKER_ID)
 
 # 全局变量用于存储清理任务
 cleanup_tasks = []
 
-# 模拟测试进度和结果（实际应由任务管理器动态生成）
-test_progress_data = [
-    {"name": "系统信息收集", "status": TestStatus.RUNNING, "progress": 40, "result": None},
-    {"name": "INT算力测试", "status": TestStatus.PENDING, "progress": 0, "result": None},
-    {"name": "FP8算力测试", "status": TestStatus.COMPLETED, "progress": 100, "result": "通过"},
-    {"name": "FP16算力测试", "status": TestStatus.FAILED, "progress": 100, "result": "失败"},
-    {"name": "FP32算力测试", "status": TestStatus.PENDING, "progress": 0, "result": None},
-]
+# 执行中的测试计划（execution_id -> task），关闭时等待其完成
+active_runs: Dict[str, asyncio.Task] = {}
+# 进入关闭流程后不再接受新的执行
+draining = False
+
+def _blob_grace_seconds() -> float:
+    return float(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))
 
-def signal_handler(signum, frame):
-    """信号处理器，确保优雅关闭"""
-    print(f"\n[APP] 收到信号 {signum}，正在关闭应用...")
-    sys.exit(0)
+async def _run_retention() -> Optional[Dict[str, Any]]:
+    """在共享租约下执行一轮保留策略和blob回收，其他worker（或请求）正在执行时返回None
 
-# 注册信号处理器
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+    多个worker同时压缩同一个文件会写同一个临时文件并删除原文件，必须互斥。
+    """
+    owner = f"{WORKER_ID}:{uuid.uuid4().hex[:8]}"
+    lock_seconds = float(os.getenv("REPORT_RETENTION_LOCK_SECONDS", "3600"))
+    if not await shared_state.acquire_lease("retention:run", owner, lock_seconds):
+        return None
+    try:
+        summary = await asyncio.to_thread(retention_manager.run)
+        summary["blobs_removed"] = await asyncio.to_thread(result_store.collect_blobs, _blob_grace_seconds())
+        # 检查点已不存在的执行不会再恢复，其部分报告不再需要
+        summary["partials_removed"] = await asyncio.to_thread(
+            report_generator.remove_stale_partial_reports, checkpoint_store.exists
+        )
+        return summary
+    finally:
+        await shared_state.release_lease("retention:run", owner)
+
+async def _retention_loop(interval: float):
+    """周期性执行保留策略，只有持有保留租约的worker执行"""
+    while True:
+        try:
+            if await shared_state.acquire_lease("retention", WORKER_ID, interval * 2):
+                await _run_retention()
+        except Exception as e:
+            logger.error(f"执行保留策略时出错: {e}")
+        await asyncio.sleep(interval)
+
+async def _coordination_loop(interval: float, scheduler_enabled: bool):
+    """续期worker存活租约；竞争调度租约，只有持有租约的worker运行定时调度器"""
+    while True:
+        try:
+            await job_tracker.heartbeat(interval * 3)
+            if scheduler_enabled:
+                leader = await shared_state.acquire_lease("scheduler", WORKER_ID, interval * 3)
+                if leader and not scheduler.running:
+                    await scheduler.start()
+                    logger.info("成为定时调度worker", extra=fields(worker=WORKER_ID))
+                elif not leader and scheduler.running:
+                    await scheduler.stop()
+                    logger.info("失去定时调度租约", extra=fields(worker=WORKER_ID))
+                elif leader:
+                    # 其他worker可能修改了定时计划
+                    scheduler.wake()
+        except Exception as e:
+            logger.error(f"续期共享状态租约时出错: {e}")
+        await asyncio.sleep(interval)
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动时的初始化"""
-    print("[APP] 应用启动中...")
+    logger.info("应用启动中...")
+    
+    if os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() == "true":
+        loop_watchdog.start()
+    
+    # 上一个进程未完成的执行保留为interrupted，可通过resume继续（其他存活worker的执行除外）
+    heartbeat_interval = float(os.getenv("WORKER_HEARTBEAT_SECONDS", "10"))
+    await job_tracker.heartbeat(heartbeat_interval * 3)
+    await checkpoint_store.mark_interrupted(is_active=job_tracker.is_active)
+    
+    # 启动报告保留策略的后台任务
+    if os.getenv("REPORT_RETENTION_ENABLED", "false").lower() == "true":
+        interval = float(os.getenv("REPORT_RETENTION_INTERVAL_HOURS", "6")) * 3600
+        retention_task = asyncio.create_task(_retention_loop(interval))
+        cleanup_tasks.append(retention_task.cancel)
+    
+    # 启动定时测试调度器：加载计划供API查询，由持有调度租约的worker运行调度循环
+    await scheduler.refresh()
+    coordination_task = asyncio.create_task(_coordination_loop(
+        heartbeat_interval, os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+    ))
+    cleanup_tasks.append(coordination_task.cancel)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭时清理资源"""
-    print("[APP] 应用关闭中，清理资源...")
+    logger.info("应用关闭中，清理资源...")
+    
+    # 排空：等待执行中的测试计划完成，超时后取消，已完成的部分保留在检查点中
+    global draining
+    draining = True
+    if active_runs:
+        drain_timeout = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "30"))
+        logger.info(f"等待 {len(active_runs)} 个执行中的测试计划完成（最长 {drain_timeout} 秒）...")
+        _, pending = await asyncio.wait(list(active_runs.values()), timeout=drain_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    
+    # 停止定时调度器，释放调度租约和worker存活租约，由其他worker接管
+    try:
+        await scheduler.stop()
+        await shared_state.release_lease("scheduler", WORKER_ID)
+        await shared_state.release_lease("retention", WORKER_ID)
+        await job_tracker.retire()
+    except Exception as e:
+        logger.error(f"停止定时调度器时出错: {e}")
     
     # 清理LLM客户端
     try:
         await llm_client.close()
-        print("[APP] LLM客户端已关闭")
+        logger.info("LLM客户端已关闭")
+    except Exception as e:
+        logger.error(f"关闭LLM客户端时出错: {e}")
+    
+    # 关闭测试引擎的shell工作进程池
+    try:
+        await test_engine.close()
+        logger.info("测试引擎已关闭")
     except Exception as e:
-        print(f"[APP] 关闭LLM客户端时出错: {e}")
+        logger.error(f"关闭测试引擎时出错: {e}")
     
     # 执行其他清理任务
     for task in cleanup_tasks:
@@ -93,9 +264,21 @@ async def shutdown_event():
             else:
                 task()
         except Exception as e:
-            print(f"[APP] 清理任务执行出错: {e}")
+            logger.error(f"清理任务执行出错: {e}")
     
-    print("[APP] 资源清理完成")
+    await loop_watchdog.stop()
+    await shared_state.close()
+    
+    # 写出追踪文件
+    trace_file = os.getenv("TRACE_FILE")
+    if trace_file:
+        try:
+            tracer.write_chrome_trace(trace_file)
+            logger.info(f"追踪数据已写入 {trace_file}")
+        except Exception as e:
+            logger.error(f"写入追踪文件时出错: {e}")
+    
+    logger.info("资源清理完成")
 
 @app.get("/")
 async def root():
@@ -105,58 +288,345 @@ async def root():
 async def get_system_info():
     """获取系统信息"""
     try:
-        system_info = system_detector.get_system_info()
+        system_info = await _collect_system_info()
+        
+        # 用户通常在查看系统信息后生成测试计划，提前在后台生成
+        if plan_prefetch_enabled:
+            plan_cache.prefetch(system_info)
+        
         return system_info
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/test-plan/generate")
-async def generate_test_plan():
-    """使用LLM生成测试计划"""
+async def generate_test_plan(refresh: bool = False):
+    """使用LLM生成测试计划，优先返回预生成的缓存，refresh为true时强制重新生成"""
     try:
-        print("[API] /api/test-plan/generate called")
         # 获取系统信息
-        system_info = system_detector.get_system_info()
-        print("[API] System info:", system_info)
+        system_info = await _collect_system_info()
+        log_payload(logger, "System info", system_info.model_dump(mode="json"))
         
-        # 使用LLM生成测试计划
-        test_plan = await llm_client.generate_test_plan(system_info)
-        print("[API] LLM generated test plan:", test_plan)
+        # 使用LLM生成测试计划（同一系统指纹共享缓存和进行中的生成）
+        test_plan = await plan_cache.get(system_info, refresh=refresh)
         
         return test_plan
     except Exception as e:
-        print("[API] Exception in generate_test_plan:", str(e))
+        logger.error("Exception in generate_test_plan", extra=fields(error=str(e)))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/test-plan/eta")
+async def estimate_test_plan(test_plan: TestPlan):
+    """按历史时长预测计划的执行顺序和总耗时"""
+    try:
+        return await asyncio.to_thread(test_engine.estimate_plan, test_plan)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/test-plan/validate")
+async def validate_test_plan(test_plan: TestPlan):
+    """执行前的静态安全分析：每个启用项目的命令分类、风险、开销估计和处理结果（allow/sandbox/reject）"""
+    try:
+        enabled = [item for item in test_plan.test_items if item.enabled]
+        verdicts = await test_engine.validate_plan(enabled)
+        summary = {decision: 0 for decision in ("allow", "sandbox", "reject")}
+        for verdict in verdicts:
+            summary[verdict["decision"]] += 1
+        return {"mode": test_engine.command_validator.mode, "summary": summary, "items": verdicts}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/test-plan/generate/stream")
+async def generate_test_plan_stream():
+    """流式生成测试计划：以NDJSON逐行返回已到达的测试项目，最后一行为完整计划"""
+    try:
+        system_info = await _collect_system_info()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def events():
+        try:
+            async for event in llm_client.generate_test_plan_stream(system_info):
+                if event["type"] == "item":
+                    line = {"type": "item", "item": event["item"].model_dump(mode="json")}
+                else:
+                    # 只缓存完整的计划，被截断后恢复的计划不影响之后的生成
+                    if event["complete"]:
+                        await plan_cache.put(system_info, event["plan"])
+                    line = {"type": "plan", "complete": event["complete"], "plan": event["plan"].model_dump(mode="json")}
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error("Exception in generate_test_plan_stream", extra=fields(error=str(e)))
+            yield json.dumps({"type": "error", "error": str(e)}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+async def _execute_checkpointed(checkpoint: Checkpoint) -> Dict[str, Any]:
+    """执行（或继续执行）检查点对应的测试计划、分析结果并生成报告
+
+    每个测试结果和分析完成后都写入检查点，中断后可跳过已完成的部分继续执行。
+    """
+    test_plan = checkpoint.test_plan
+    active_runs[checkpoint.execution_id] = asyncio.current_task()
+    try:
+        # 同一主机上同时只允许一次执行，避免基准测试互相干扰
+        async with host_locks.hold():
+            await checkpoint.set_state("running")
+            # 按历史时长安排执行顺序，同时用于预测ETA
+            schedule = await asyncio.to_thread(test_engine.plan_schedule, test_plan)
+            await job_tracker.start(
+                checkpoint.execution_id, test_plan, checkpoint.results,
+                schedule=schedule, concurrency=test_engine.concurrency
+            )
+            # 执行选中的测试项目，执行过程中持续追加部分报告；恢复执行时先回放已完成的结果
+            partial_report = await report_generator.open_partial_report(
+                test_plan, checkpoint.execution_id, checkpoint.results
+            )
+            
+            async def on_result(result: TestResult):
+                await checkpoint.append_result(result)
+                await partial_report.append_result(result)
+                await job_tracker.record_result(checkpoint.execution_id, result)
+            
+            async def on_item_state(test_item: TestItem, state: str):
+                await job_tracker.set_item_state(checkpoint.execution_id, test_item.id, state)
+            
+            try:
+                test_results = await test_engine.execute_tests(
+                    test_plan,
+                    on_result=on_result,
+                    execution_id=checkpoint.execution_id,
+                    completed_results=checkpoint.results,
+                    started_at=checkpoint.started_at,
+                    schedule=schedule,
+                    on_item_state=on_item_state
+                )
+                # 计算输出和日志的内容哈希，相同内容共用一个字符串对象；哈希大块输出放到线程中，避免阻塞事件循环
+                await asyncio.to_thread(result_store.blobs.intern_results, test_results.test_results)
+                
+                # 使用LLM分析测试结果，预分类后只有失败、异常和有变化的结果需要LLM
+                await checkpoint.set_state("analyzing")
+                await job_tracker.set_state(checkpoint.execution_id, "analyzing")
+                if result_triage is not None:
+                    previous = await asyncio.to_thread(
+                        load_previous_results, result_store, test_results, int(os.getenv("TRIAGE_HISTORY_DEPTH", "3"))
+                    )
+                    for result in result_triage.apply(test_results, previous):
+                        await checkpoint.append_analysis(result)
+                analyzed_results = await llm_client.analyze_test_results(
+                    test_results, on_analyzed=checkpoint.append_analysis, cache=analysis_cache
+                )
+                
+                # 生成报告
+                report_path = await report_generator.generate_report(analyzed_results)
+                
+                # 与报告一同写出机器可读的结构化结果
+                result_paths = await result_store.save(analyzed_results)
+                await job_tracker.set_state(checkpoint.execution_id, "completed")
+            except BaseException as e:
+                # 部分报告与检查点一同保留，恢复执行时重新打开
+                await partial_report.close()
+                await checkpoint.set_state("interrupted")
+                await job_tracker.set_state(checkpoint.execution_id, "failed" if isinstance(e, Exception) else "interrupted")
+                raise
+            await partial_report.discard()
+        
+        await checkpoint.discard()
+    finally:
+        active_runs.pop(checkpoint.execution_id, None)
+    
+    # 每次执行后刷新追踪文件
+    trace_file = os.getenv("TRACE_FILE")
+    if trace_file:
+        await asyncio.to_thread(tracer.write_chrome_trace, trace_file)
+    
+    return {
+        "test_results": analyzed_results,
+        "report_path": report_path,
+        "result_paths": result_paths
+    }
+
+async def _run_test_plan(test_plan: TestPlan) -> Dict[str, Any]:
+    """执行新的测试计划，手动执行和定时执行共用"""
+    if draining:
+        raise RuntimeError("Server is shutting down")
+    checkpoint = await checkpoint_store.create(test_engine.new_execution_id(), test_plan)
+    return await _execute_checkpointed(checkpoint)
+
 @app.post("/api/test/execute")
 async def execute_tests(test_plan: TestPlan):
     """执行测试计划"""
     try:
-        # 执行选中的测试项目
-        test_results = await test_engine.execute_tests(test_plan)
-        
-        # 使用LLM分析测试结果
-        analyzed_results = await llm_client.analyze_test_results(test_results)
-        
-        # 生成报告
-        report_path = await report_generator.generate_report(analyzed_results)
-        
-        return {
-            "test_results": analyzed_results,
-            "report_path": report_path
-        }
+        return await _run_test_plan(test_plan)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+scheduler = Scheduler(_run_test_plan, host_locks, os.getenv("SCHEDULES_FILE", "data/schedules.json"))
+
+@app.get("/api/executions/checkpoints")
+async def list_checkpoints():
+    """列出尚未完成（执行中或被中断）的执行"""
+    checkpoints = await checkpoint_store.list_checkpoints()
+    for checkpoint in checkpoints:
+        checkpoint["active"] = checkpoint["execution_id"] in active_runs or await job_tracker.is_active(checkpoint["execution_id"])
+    return {"checkpoints": checkpoints}
+
+@app.get("/api/executions")
+async def list_executions():
+    """列出所有worker上的执行任务及其状态"""
+    return {"executions": await job_tracker.list_jobs()}
+
+@app.get("/api/executions/{execution_id}/progress")
+async def get_execution_progress(execution_id: str):
+    """获取一次执行的状态和逐项进度"""
+    job = await job_tracker.get(execution_id, include_items=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    job["active"] = await job_tracker.is_active(execution_id)
+    return job
+
+@app.get("/api/executions/{execution_id}/eta")
+async def get_execution_eta(execution_id: str):
+    """按剩余项目的历史时长预测执行的完成时间，随测试完成持续更新"""
+    eta = await job_tracker.eta(execution_id)
+    if eta is None:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    return eta
+
+@app.post("/api/executions/{execution_id}/resume")
+async def resume_execution(execution_id: str):
+    """从检查点继续被中断的执行，跳过已完成的测试和分析"""
+    if execution_id in active_runs or await job_tracker.is_active(execution_id):
+        raise HTTPException(status_code=409, detail="Execution is already running")
+    if draining:
+        raise HTTPException(status_code=503, detail="Server is shutting down")
+    try:
+        checkpoint = await checkpoint_store.load(execution_id)
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+    try:
+        return await _execute_checkpointed(checkpoint)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/schedules")
+async def list_schedules():
+    """列出所有定时测试计划"""
+    await scheduler.refresh()
+    return {"schedules": scheduler.list_schedules()}
+
+@app.post("/api/schedules")
+async def create_schedule(schedule: TestSchedule):
+    """新增定时测试计划，id为空时自动生成"""
+    try:
+        return await scheduler.upsert(schedule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/schedules/{schedule_id}")
+async def get_schedule(schedule_id: str):
+    """获取定时测试计划"""
+    await scheduler.refresh()
+    schedule = scheduler.get(schedule_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return schedule
+
+@app.put("/api/schedules/{schedule_id}")
+async def update_schedule(schedule_id: str, schedule: TestSchedule):
+    """更新定时测试计划"""
+    await scheduler.refresh()
+    if scheduler.get(schedule_id) is None:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    schedule.id = schedule_id
+    try:
+        return await scheduler.upsert(schedule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/api/schedules/{schedule_id}")
+async def delete_schedule(schedule_id: str):
+    """删除定时测试计划"""
+    if not await scheduler.remove(schedule_id):
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return {"success": True}
+
+@app.post("/api/schedules/{schedule_id}/run")
+async def run_schedule(schedule_id: str):
+    """立即在后台执行一次定时测试计划"""
+    if not await scheduler.trigger(schedule_id):
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return {"success": True, "schedule_id": schedule_id}
+
+@app.post("/api/reports/retention/run")
+async def run_retention():
+    """立即执行一轮报告保留策略"""
+    try:
+        summary = await _run_retention()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if summary is None:
+        raise HTTPException(status_code=409, detail="Retention is already running")
+    return {"policy": retention_manager.policy.to_dict(), **summary}
+
+@app.get("/api/reports/archive")
+async def get_report_archive():
+    """列出已归档（压缩）的文件"""
+    return {"archives": await asyncio.to_thread(retention_manager.load_index)}
+
+def _iter_gzip(path: str, chunk_size: int = 64 * 1024):
+    """分块解压已归档的报告"""
+    with gzip.open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """按Accept-Encoding的q值判断客户端是否接受gzip（gzip;q=0表示不接受）"""
+    qualities = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    for coding in ("gzip", "x-gzip"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return qualities.get("*", 0) > 0
+
 @app.get("/api/reports/{report_id}")
-async def get_report(report_id: str):
-    """获取生成的报告"""
+async def get_report(report_id: str, request: Request):
+    """获取生成的报告，已归档的报告按客户端能力直接返回gzip或解压后返回"""
     try:
-        report_path = f"reports/{report_id}.md"
-        if os.path.exists(report_path):
-            return FileResponse(report_path, media_type="text/markdown")
-        else:
+        reports_dir = report_generator.config.output_path
+        if os.path.basename(report_id) != report_id:
             raise HTTPException(status_code=404, detail="Report not found")
+        for file in os.listdir(reports_dir):
+            archived = file.endswith(ARCHIVE_SUFFIX)
+            name = file[:-len(ARCHIVE_SUFFIX)] if archived else file
+            media_type = media_type_for(name)
+            if not media_type or name == INDEX_FILENAME or os.path.splitext(name)[0] != report_id:
+                continue
+            path = os.path.join(reports_dir, file)
+            if not archived:
+                return FileResponse(path, media_type=media_type)
+            if _accepts_gzip(request.headers.get("accept-encoding", "")):
+                return FileResponse(path, media_type=media_type,
+                                    headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+            return StreamingResponse(_iter_gzip(path), media_type=media_type, headers={"Vary": "Accept-Encoding"})
+        raise HTTPException(status_code=404, detail="Report not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -164,23 +634,106 @@ async def get_report(report_id: str):
 async def list_reports():
     """列出所有可用的报告"""
     try:
-        reports_dir = "reports"
+        reports_dir = report_generator.config.output_path
         if not os.path.exists(reports_dir):
             os.makedirs(reports_dir)
         
         reports = []
         for file in os.listdir(reports_dir):
-            if file.endswith('.md'):
+            archived = file.endswith(ARCHIVE_SUFFIX)
+            name = file[:-len(ARCHIVE_SUFFIX)] if archived else file
+            if media_type_for(name) and '.partial.' not in name and name != INDEX_FILENAME:
+                report_id, extension = os.path.splitext(name)
                 reports.append({
-                    "id": file.replace('.md', ''),
-                    "name": file,
-                    "path": f"/api/reports/{file.replace('.md', '')}"
+                    "id": report_id,
+                    "name": name,
+                    "format": extension.lstrip('.'),
+                    "archived": archived,
+                    "path": f"/api/reports/{report_id}"
                 })
         
         return {"reports": reports}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _parse_time(value: Optional[str], name: str) -> Optional[datetime]:
+    """解析ISO 8601格式的时间查询参数，带时区的时间转换为本地时间（执行记录按本地时间保存）"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith(("Z", "z")) else value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: {value}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+@app.get("/api/results")
+async def list_results(start: Optional[str] = None, end: Optional[str] = None, hostname: Optional[str] = None):
+    """列出时间范围内的执行记录"""
+    start_time, end_time = _parse_time(start, "start"), _parse_time(end, "end")
+    try:
+        executions = await asyncio.to_thread(result_store.list_executions, start_time, end_time, hostname)
+        return {"executions": executions}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/results/export")
+async def export_results(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    hostname: Optional[str] = None,
+    format: str = "ndjson"
+):
+    """流式导出时间范围内所有执行的测试结果（ndjson或csv）"""
+    start_time, end_time = _parse_time(start, "start"), _parse_time(end, "end")
+    media_types = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+    if format not in media_types:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    return StreamingResponse(
+        result_store.iter_export(format, start_time, end_time, hostname),
+        media_type=media_types[format],
+        headers={"Content-Disposition": f'attachment; filename="results.{format}"'}
+    )
+
+@app.get("/api/results/diff")
+async def diff_results(base: str, target: str, format: str = "json"):
+    """对比两次执行的结构化结果（json或markdown）"""
+    if format not in ("json", "markdown"):
+        raise HTTPException(status_code=400, detail=f"Unsupported diff format: {format}")
+    try:
+        base_results = await asyncio.to_thread(result_store.load, base)
+        target_results = await asyncio.to_thread(result_store.load, target)
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    try:
+        diff = diff_executions(base_results, target_results)
+        if format == "markdown":
+            return PlainTextResponse(render_diff_markdown(diff), media_type="text/markdown")
+        return diff
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/results/{execution_id}")
+async def get_result(execution_id: str):
+    """获取一次执行的完整结构化结果"""
+    try:
+        return await asyncio.to_thread(result_store.load, execution_id)
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="Execution not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/blobs/{digest}")
+async def get_blob(digest: str):
+    """按哈希获取测试输出或原始日志（output_hash / raw_log_hash）"""
+    try:
+        content = await asyncio.to_thread(result_store.blobs.get, digest)
+    except (FileNotFoundError, ValueError):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return PlainTextResponse(content)
+
 @app.post("/api/settings/save")
 async def save_settings(settings: dict = Body(...)):
     """保存LLM和报告配置到config.env"""
@@ -189,7 +742,7 @@ async def save_settings(settings: dict = Body(...)):
         # 只保存允许的字段
         allowed_keys = [
             'LLM_PROVIDER', 'LLM_MODEL', 'LLM_API_KEY', 'LLM_BASE_URL', 'LLM_MAX_TOKENS', 'LLM_TEMPERATURE',
-            'REPORT_OUTPUT_PATH', 'REPORT_FILENAME_PATTERN', 'REPORT_INCLUDE_SYSTEM_INFO',
+            'REPORT_OUTPUT_FORMAT', 'REPORT_OUTPUT_PATH', 'REPORT_FILENAME_PATTERN', 'REPORT_INCLUDE_SYSTEM_INFO',
             'REPORT_INCLUDE_RAW_LOGS', 'REPORT_INCLUDE_ANALYSIS'
         ]
         for key in allowed_keys:
@@ -208,19 +761,62 @@ async def save_settings(settings: dict = Body(...)):
         raise HTTPException(status_code=500, detail=f"保存配置失败: {str(e)}")
 
 @app.get("/api/test/progress")
-async def get_test_progress():
-    """获取所有测试项的进度和结果（模拟数据）"""
-    # 注意：实际项目中应返回真实的测试进度和结果
+async def get_test_progress(execution_id: Optional[str] = None):
+    """获取测试项的进度和结果，默认取最近开始的一次执行"""
+    if execution_id is None:
+        jobs = await job_tracker.list_jobs()
+        if not jobs:
+            return []
+        execution_id = jobs[0]["execution_id"]
+    job = await job_tracker.get(execution_id, include_items=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Execution not found")
     return [
         {
             "name": item["name"],
-            "status": item["status"].value,
+            "status": item["status"],
             "progress": item["progress"],
             "result": item["result"]
         }
-        for item in test_progress_data
+        for item in job["items"]
     ]
 
+@app.get("/api/test/durations")
+async def get_test_durations(hostname: Optional[str] = None):
+    """各测试学习到的历史时长和自适应超时，不指定主机时返回所有主机的汇总"""
+    if test_engine.duration_history is None:
+        return {"enabled": False, "tests": []}
+    await asyncio.to_thread(test_engine.duration_history.refresh)
+    return {"enabled": True, "tests": test_engine.duration_history.describe(hostname)}
+
+@app.get("/api/llm/routes")
+async def get_llm_routes():
+    """获取LLM路由配置（各调用类型使用的模型、端点和并发上限）"""
+    return llm_client.router.describe()
+
+@app.get("/api/diagnostics/event-loop")
+async def get_event_loop_diagnostics(stacks: bool = True):
+    """事件循环延迟统计、阻塞位置汇总和最近的阻塞事件（含调用栈），只包含处理本次请求的worker"""
+    return dict(loop_watchdog.snapshot(include_stacks=stacks), worker=WORKER_ID)
+
+@app.post("/api/diagnostics/event-loop/reset")
+async def reset_event_loop_diagnostics():
+    """清空已记录的延迟样本和阻塞事件"""
+    loop_watchdog.reset()
+    return {"success": True}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus格式的服务自身指标"""
+    return PlainTextResponse(tracer.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/trace")
+async def get_trace(limit: int = 0):
+    """导出最近的span，limit为0时返回完整的Chrome trace，只包含处理本次请求的worker"""
+    if limit > 0:
+        return {"worker": WORKER_ID, "spans": tracer.recent_spans(limit)}
+    return tracer.chrome_trace()
+
 if __name__ == "__main__":
     try:
         # 在开发环境中，建议不使用reload模式，或者使用更稳定的配置
@@ -230,7 +826,11 @@ if __name__ == "__main__":
             port=8000,
             reload=False,  # 关闭reload模式以避免进程管理问题
             log_level="info",
-            access_log=True
+            access_log=True,
+            # 多worker时任务状态、进度和缓存通过共享状态（SQLite WAL）在进程间共享
+            workers=int(os.getenv("WORKERS", "1")),
+            # 收到SIGTERM/SIGINT后等待进行中的请求，超时后取消，执行进度保留在检查点中
+            timeout_graceful_shutdown=int(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "30"))
         )
     except KeyboardInterrupt:
         print("\n[APP] 收到中断信号，正在关闭...")
@@ -0,0 +1,367 @@
+"""SysScope API 性能基准测试
+
+在进程内启动uvicorn运行FastAPI应用，LLM使用mock provider，用不同规模的合成测试计划
+驱动完整的 执行 -> 分析 -> 报告 流程，输出吞吐量、延迟分位数、内存峰值和事件循环延迟，
+全部场景运行多轮（--rounds）后各指标取中位数，与保存的基线比较，任一指标劣化超过容差
+（且超过该指标的绝对下限）时以非零状态退出。基线的运行环境（CPU、Python版本、mock延迟、
+轮数）与本次不同时拒绝比较。
+
+用法（在backend目录下）：
+    python -m benchmarks.run                       # 运行全部场景并与基线比较
+    python -m benchmarks.run --scenarios execute_10_small api_concurrent
+    python -m benchmarks.run --update-baseline     # 用本次结果覆盖基线
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import gc
+import shutil
+import argparse
+import tempfile
+import platform
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baselines.json")
+
+# 指标方向：吞吐量越高越好，其余越低越好
+HIGHER_IS_BETTER = {"throughput_items_per_s", "throughput_requests_per_s"}
+# 只用于说明结果的字段，不参与比较（事件循环最大延迟是单个样本，波动太大；
+# 进程RSS峰值包含前面场景留下的内存，按场景比较的是rss_growth_mb）
+NOT_COMPARED = {"samples", "loop_lag_max_ms", "peak_rss_mb"}
+# 劣化的绝对下限（按指标名后缀匹配）：变化小于下限时视为抖动，即使超过了比例容差
+ABSOLUTE_FLOORS = {
+    "_ms": 5.0,
+    "_mb": 5.0
+}
+# 基线只在相同的运行环境和参数下可比，任一项不同时拒绝比较
+BASELINE_METADATA = ("machine", "cpu_count", "python", "mock_latency_ms", "rounds")
+# 样本数少于此值时p95/p99只是最大值附近的少数样本，不参与比较
+MIN_TAIL_SAMPLES = 100
+
+
+def _configure_environment(workdir: str, mock_latency_ms: int):
+    """在导入app之前设置环境，所有输出写入临时目录，LLM使用mock"""
+    defaults = {
+        "LLM_PROVIDER": "mock",
+        "LLM_MOCK_LATENCY_MS": str(mock_latency_ms),
+        "REPORT_OUTPUT_PATH": os.path.join(workdir, "reports"),
+        "CHECKPOINT_PATH": os.path.join(workdir, "checkpoints"),
+        "SCHEDULES_FILE": os.path.join(workdir, "schedules.json"),
+        "DURATION_HISTORY_PATH": os.path.join(workdir, "duration_history.ndjson"),
+        "SCHEDULER_ENABLED": "false",
+        "PLAN_PREFETCH_ENABLED": "false",
+        "REPORT_RETENTION_ENABLED": "false",
+        # 预分类会随历史结果变化，基准测试中关闭以保证每次LLM调用次数一致
+        "TRIAGE_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE": "",
+        "TRACE_FILE": ""
+    }
+    for key, value in defaults.items():
+        os.environ[key] = value
+
+
+# 轻量接口场景放在最前面，不受前面大输出场景遗留的内存状态影响
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    # 32路并发的短请求突发对CPU争用很敏感，多次运行之间相差约30%，使用更宽的容差
+    "api_concurrent": {"requests": 400, "concurrency": 32, "repeat": 5, "tolerance": 0.5},
+    "execute_10_small": {"items": 10, "output_bytes": 64, "repeat": 30},
+    "execute_100_small": {"items": 100, "output_bytes": 64, "repeat": 10},
+    "execute_1000_small": {"items": 1000, "output_bytes": 64, "repeat": 3},
+    "execute_10_huge": {"items": 10, "output_bytes": 4 * 1024 * 1024, "repeat": 8},
+    "execute_100_large": {"items": 100, "output_bytes": 256 * 1024, "repeat": 3}
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def synthetic_plan(system_info: Dict[str, Any], items: int, output_bytes: int) -> Dict[str, Any]:
+    """合成测试计划：每个项目输出约output_bytes字节的多行文本"""
+    # seq输出的平均行长约为数字位数+1，按字节数估算行数
+    lines = max(1, output_bytes // 8)
+    return {
+        "id": f"bench_{items}_{output_bytes}",
+        "name": f"Benchmark {items} x {output_bytes}B",
+        "description": "synthetic benchmark plan",
+        "system_info": system_info,
+        "test_items": [
+            {
+                "id": f"bench_{i}",
+                "name": f"Benchmark item {i}",
+                "description": "synthetic output",
+                "category": "performance",
+                "command": f"seq 1000000 {1000000 + lines - 1}",
+                "timeout": 120,
+                "priority": 1
+            }
+            for i in range(items)
+        ]
+    }
+
+
+class ResourceSampler:
+    """在被测事件循环中采样事件循环延迟和进程RSS，RSS增长以场景开始时为起点"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        import psutil
+        self.start_rss = self.peak_rss = psutil.Process().memory_info().rss
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        import psutil
+        process = psutil.Process()
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+            self.peak_rss = max(self.peak_rss, process.memory_info().rss)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "loop_lag_p99_ms": round(percentile(self.lags, 99) * 1000, 2),
+            "loop_lag_max_ms": round(max(self.lags, default=0.0) * 1000, 2),
+            "peak_rss_mb": round(self.peak_rss / (1024 * 1024), 1),
+            "rss_growth_mb": round((self.peak_rss - self.start_rss) / (1024 * 1024), 1)
+        }
+
+
+async def _run_execute(session, base_url: str, system_info: Dict[str, Any], spec: Dict[str, Any]) -> Dict[str, float]:
+    plan = synthetic_plan(system_info, spec["items"], spec["output_bytes"])
+    latencies = []
+    # 第一次执行用于预热（shell进程池、导入、文件缓存），不计入结果
+    for index in range(spec["repeat"] + 1):
+        start = time.perf_counter()
+        async with session.post(f"{base_url}/api/test/execute", json=plan) as response:
+            body = await response.read()
+            if response.status != 200:
+                raise RuntimeError(f"execute failed with status {response.status}: {body[:500]!r}")
+        if index > 0:
+            latencies.append(time.perf_counter() - start)
+    # 吞吐量按中位数延迟计算，不受个别慢的执行影响
+    return {
+        "samples": len(latencies),
+        "throughput_items_per_s": round(spec["items"] / percentile(latencies, 50), 2),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 1)
+    }
+
+
+async def _run_concurrent(session, base_url: str, spec: Dict[str, Any]) -> Dict[str, float]:
+    """并发请求轻量接口，衡量执行之外的API开销"""
+    paths = ["/api/reports", "/api/results", "/api/executions/checkpoints", "/api/schedules", "/metrics"]
+    latencies = []
+    semaphore = asyncio.Semaphore(spec["concurrency"])
+
+    async def request(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            async with session.get(f"{base_url}{paths[index % len(paths)]}") as response:
+                await response.read()
+                if response.status != 200:
+                    raise RuntimeError(f"{paths[index % len(paths)]} returned {response.status}")
+            latencies.append(time.perf_counter() - start)
+
+    # 第一轮预热不计入结果；吞吐量取各轮的中位数，单轮受调度影响较大
+    await asyncio.gather(*(request(i) for i in range(spec["requests"])))
+    latencies.clear()
+    throughputs = []
+    for _ in range(spec["repeat"]):
+        start = time.perf_counter()
+        await asyncio.gather(*(request(i) for i in range(spec["requests"])))
+        throughputs.append(spec["requests"] / (time.perf_counter() - start))
+    return {
+        "samples": len(latencies),
+        "throughput_requests_per_s": round(percentile(throughputs, 50), 1),
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 2)
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_benchmarks(names: List[str], rounds: int = 1) -> Dict[str, Dict[str, float]]:
+    """依次运行各场景rounds轮，每个指标取各轮的中位数"""
+    import aiohttp
+    import uvicorn
+    from app import app
+
+    port = _free_port()
+    # 延长keep-alive，避免服务端关闭空闲连接与客户端复用该连接竞争导致连接被重置
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on",
+                                           timeout_keep_alive=300))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if server_task.done():
+            server_task.result()
+        await asyncio.sleep(0.05)
+
+    base_url = f"http://127.0.0.1:{port}"
+    rounds_results: Dict[str, List[Dict[str, float]]] = {name: [] for name in names}
+    try:
+        timeout = aiohttp.ClientTimeout(total=3600)
+        async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=0)) as session:
+            async with session.get(f"{base_url}/api/system/info") as response:
+                system_info = await response.json()
+
+            for _ in range(rounds):
+                for name in names:
+                    spec = SCENARIOS[name]
+                    # 回收上一个场景留下的对象，避免其垃圾回收停顿计入本场景
+                    gc.collect()
+                    sampler = ResourceSampler()
+                    sampler.start()
+                    try:
+                        if "items" in spec:
+                            metrics = await _run_execute(session, base_url, system_info, spec)
+                        else:
+                            metrics = await _run_concurrent(session, base_url, spec)
+                    finally:
+                        await sampler.stop()
+                    metrics.update(sampler.summary())
+                    rounds_results[name].append(metrics)
+                    print(f"{name}: {json.dumps(metrics)}", flush=True)
+    finally:
+        server.should_exit = True
+        await server_task
+    return {
+        name: {metric: percentile([metrics[metric] for metrics in runs], 50) for metric in runs[0]}
+        for name, runs in rounds_results.items()
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """与基线比较，返回超过容差的劣化"""
+    regressions = []
+    for name, metrics in results.items():
+        scenario_tolerance = max(tolerance, SCENARIOS.get(name, {}).get("tolerance", 0.0))
+        for metric, value in metrics.items():
+            reference = baseline.get(name, {}).get(metric)
+            if not reference or metric in NOT_COMPARED:
+                continue
+            if metric.startswith(("latency_p95", "latency_p99")) and metrics.get("samples", 0) < MIN_TAIL_SAMPLES:
+                continue
+            if metric in HIGHER_IS_BETTER:
+                change = (reference - value) / reference
+            else:
+                change = (value - reference) / reference
+                floor = next((floor for suffix, floor in ABSOLUTE_FLOORS.items() if metric.endswith(suffix)), 0.0)
+                if value - reference < floor:
+                    continue
+            if change > scenario_tolerance:
+                regressions.append(f"{name}.{metric}: {reference} -> {value} ({change * 100:+.1f}% worse)")
+    return regressions
+
+
+def metadata_mismatches(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """本次运行与基线的环境和参数差异"""
+    return [
+        f"{key}: baseline {baseline.get(key)!r}, current {report.get(key)!r}"
+        for key in BASELINE_METADATA
+        if baseline.get(key) != report.get(key)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SysScope API benchmarks")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基线中对应的场景")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="允许的劣化比例，默认0.25（场景可以设置更宽的容差）")
+    parser.add_argument("--mock-latency-ms", type=int, default=5, help="mock LLM每次调用的模拟延迟")
+    parser.add_argument("--rounds", type=int, default=3, help="全部场景运行的轮数，各指标取中位数，默认3")
+    parser.add_argument("--output", help="把本次结果写入JSON文件")
+    parser.add_argument("--ignore-metadata", action="store_true",
+                        help="运行环境或参数与基线不同时仍然比较（只输出警告）")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="sysscope_bench_")
+    _configure_environment(workdir, args.mock_latency_ms)
+    sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+    try:
+        results = asyncio.run(run_benchmarks(args.scenarios, max(1, args.rounds)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "mock_latency_ms": args.mock_latency_ms,
+        "rounds": args.rounds,
+        "scenarios": results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    mismatches = metadata_mismatches(report, baseline) if baseline else []
+
+    if args.update_baseline:
+        # 环境不同时基线中其他场景的数据已不可比，只保留本次结果
+        scenarios = {} if mismatches else dict(baseline.get("scenarios", {}))
+        scenarios.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(dict(report, scenarios=scenarios), f, indent=2)
+            f.write("\n")
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    if not baseline:
+        print("No baseline found, run with --update-baseline to create one")
+        return
+
+    if mismatches:
+        print("Baseline was recorded in a different environment:")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+        if not args.ignore_metadata:
+            print("Refusing to compare; rerun with --update-baseline, or --ignore-metadata to compare anyway")
+            sys.exit(2)
+
+    regressions = compare(results, baseline.get("scenarios", {}), args.tolerance)
+    if regressions:
+        print(f"Performance regressions (tolerance {args.tolerance * 100:.0f}%):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Set, Iterable
+from models.schemas import TestResult
+from core.shared_state import SharedState
+from core.tracing import tracer
+from core.logger import get_logger, fields
+
+logger = get_logger("blob_store")
+
+
+def blob_hash(text: str) -> str:
+    """内容地址：UTF-8编码后的sha256"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class BlobStore:
+    """按内容哈希存储测试输出和原始日志
+
+    每个不同的内容只以gzip形式在 <base>/<哈希前两位>/<哈希>.gz 保存一次，
+    多台主机、多次执行产生的相同输出共用同一个blob。最近使用的内容按字节上限
+    缓存在内存中，相同内容的TestResult共享同一个字符串对象。
+    """
+
+    SUFFIX = ".gz"
+
+    def __init__(self, base_path: str, intern_max_bytes: int = 64 * 1024 * 1024):
+        self.base_path = base_path
+        self.intern_max_bytes = intern_max_bytes
+        self._interned: "OrderedDict[str, str]" = OrderedDict()
+        self._interned_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.base_path, exist_ok=True)
+
+    def path_for(self, digest: str) -> str:
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid blob hash: {digest}")
+        return os.path.join(self.base_path, digest[:2], digest + self.SUFFIX)
+
+    # ---- 内存去重 ----
+
+    def intern(self, text: str, digest: Optional[str] = None) -> str:
+        """返回与text内容相同的共享字符串对象"""
+        digest = digest or blob_hash(text)
+        with self._lock:
+            existing = self._interned.get(digest)
+            if existing is not None:
+                self._interned.move_to_end(digest)
+                return existing
+            size = len(text)
+            if size > self.intern_max_bytes:
+                return text
+            self._interned[digest] = text
+            self._interned_bytes += size
+            while self._interned_bytes > self.intern_max_bytes:
+                _, evicted = self._interned.popitem(last=False)
+                self._interned_bytes -= len(evicted)
+        return text
+
+    def intern_results(self, results: Iterable[TestResult]):
+        """为结果计算output_hash和raw_log_hash，并用共享对象替换相同的内容"""
+        for result in results:
+            if result.output:
+                result.output_hash = result.output_hash or blob_hash(result.output)
+                result.output = self.intern(result.output, result.output_hash)
+            if result.raw_log:
+                result.raw_log_hash = result.raw_log_hash or blob_hash(result.raw_log)
+                result.raw_log = self.intern(result.raw_log, result.raw_log_hash)
+
+    # ---- 持久化 ----
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+
+    def put(self, text: str, digest: Optional[str] = None) -> str:
+        """保存内容，已存在时不重复写入，返回哈希"""
+        digest = digest or blob_hash(text)
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            try:
+                # 刷新修改时间，并发的垃圾回收在宽限期内不会删除刚被重新引用的blob
+                os.utime(path)
+                tracer.inc("blob_writes_total", help_text="Blob writes by outcome", result="deduplicated")
+                return digest
+            except FileNotFoundError:
+                # 刚好被回收，重新写入
+                pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 写入临时文件后原子替换，并发写入相同内容时互不影响
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        tracer.inc("blob_writes_total", help_text="Blob writes by outcome", result="stored")
+        return digest
+
+    def get(self, digest: str) -> str:
+        with self._lock:
+            cached = self._interned.get(digest)
+        if cached is not None:
+            return cached
+        with gzip.open(self.path_for(digest), 'rt', encoding='utf-8') as f:
+            return self.intern(f.read(), digest)
+
+    def store_results(self, results: Iterable[TestResult]) -> List[TestResult]:
+        """保存结果中的输出和日志，返回只引用哈希、不含内容的副本"""
+        stripped = []
+        for result in results:
+            update = {}
+            if result.output:
+                result.output_hash = self.put(result.output, result.output_hash)
+                update["output"] = ""
+            if result.raw_log:
+                result.raw_log_hash = self.put(result.raw_log, result.raw_log_hash)
+                update["raw_log"] = ""
+            stripped.append(result.model_copy(update=update))
+        return stripped
+
+    def load_results(self, results: Iterable[TestResult]):
+        """按哈希还原结果中的输出和日志（blob已被清理时保持为空）"""
+        for result in results:
+            for field, hash_field in (("output", "output_hash"), ("raw_log", "raw_log_hash")):
+                digest = getattr(result, hash_field)
+                if digest and not getattr(result, field):
+                    try:
+                        setattr(result, field, self.get(digest))
+                    except FileNotFoundError:
+                        logger.warning("Blob missing", extra=fields(hash=digest, test_item_id=result.test_item_id))
+
+    @tracer.traced("blob_store.collect_garbage")
+    def collect_garbage(self, referenced: Set[str], grace_seconds: float = 3600) -> int:
+        """删除不再被任何结果引用的blob，新写入的blob在宽限期内保留（对应执行可能还未写出）"""
+        removed = 0
+        cutoff = time.time() - grace_seconds
+        for prefix in os.listdir(self.base_path):
+            directory = os.path.join(self.base_path, prefix)
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if not name.endswith(self.SUFFIX):
+                    continue
+                path = os.path.join(directory, name)
+                digest = name[:-len(self.SUFFIX)]
+                if digest in referenced or os.path.getmtime(path) > cutoff:
+                    continue
+                os.remove(path)
+                removed += 1
+        if removed:
+            logger.info("Unreferenced blobs removed", extra=fields(removed=removed))
+        return removed
+
+
+class AnalysisCache:
+    """按内容缓存单项分析结果
+
+    key由测试名称、状态、退出码和原始日志哈希组成：不同主机或不同执行中内容完全相同的
+    结果只需要分析一次。缓存保存在共享状态中，多个worker共用。
+    """
+
+    NAMESPACE = "analysis_cache"
+
+    def __init__(self, state: SharedState, ttl_seconds: float = 7 * 24 * 3600):
+        self.state = state
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def key_for(result: TestResult) -> str:
+        raw_log_hash = result.raw_log_hash or blob_hash(result.raw_log)
+        payload = json.dumps([result.test_item_name, result.status.value, result.exit_code, raw_log_hash])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        summary = await self.state.get(self.NAMESPACE, key)
+        tracer.inc("analysis_cache_requests_total", help_text="Per-test analysis cache lookups",
+                   result="hit" if summary is not None else "miss")
+        return summary
+
+    async def put(self, key: str, summary: str):
+        await self.state.set(self.NAMESPACE, key, summary, self.ttl_seconds)
+
+
+def referenced_hashes(results: Iterable[TestResult]) -> Set[str]:
+    hashes: Set[str] = set()
+    for result in results:
+        for digest in (result.output_hash, result.raw_log_hash):
+            if digest:
+                hashes.add(digest)
+    return hashes
@@ -0,0 +1,198 @@
+import os
+import json
+import shutil
+import asyncio
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from models.schemas import TestPlan, TestResult
+from core.logger import get_logger, fields
+
+logger = get_logger("checkpoint")
+
+PLAN_FILE = "plan.json"
+STATE_FILE = "state.json"
+RESULTS_FILE = "results.ndjson"
+ANALYSIS_FILE = "analysis.ndjson"
+
+
+class Checkpoint:
+    """一次执行的检查点
+
+    每完成一个测试就把TestResult追加到results.ndjson，每完成一次分析就把摘要
+    追加到analysis.ndjson，均在fsync后返回，进程重启后可以从中恢复。
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        execution_id: str,
+        test_plan: TestPlan,
+        started_at: datetime,
+        results: Optional[List[TestResult]] = None,
+        state: str = "running"
+    ):
+        self.directory = directory
+        self.execution_id = execution_id
+        self.test_plan = test_plan
+        self.started_at = started_at
+        self.results = results or []
+        self.state = state
+        # 并发分析会同时追加，串行化写入避免大行交错
+        self._write_lock = threading.Lock()
+
+    def _append(self, filename: str, line: str):
+        with self._write_lock, open(os.path.join(self.directory, filename), 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_state(self, state: str):
+        path = os.path.join(self.directory, STATE_FILE)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({"state": state, "updated_at": datetime.now().isoformat()}, f)
+        os.replace(path + ".tmp", path)
+
+    async def append_result(self, result: TestResult):
+        """记录一个已完成的测试结果"""
+        await asyncio.to_thread(self._append, RESULTS_FILE, result.model_dump_json())
+
+    async def append_analysis(self, result: TestResult):
+        """记录一个测试结果的LLM分析"""
+        line = json.dumps({
+            "test_item_id": result.test_item_id,
+            "analyzed_summary": result.analyzed_summary,
+            "triage": result.triage
+        }, ensure_ascii=False)
+        await asyncio.to_thread(self._append, ANALYSIS_FILE, line)
+
+    async def set_state(self, state: str):
+        """更新执行状态: running, analyzing, interrupted"""
+        self.state = state
+        await asyncio.to_thread(self._write_state, state)
+
+    async def discard(self):
+        """执行完成后删除检查点，结果已由ResultStore持久化"""
+        await asyncio.to_thread(shutil.rmtree, self.directory, True)
+
+
+class CheckpointStore:
+    """按执行ID组织的检查点目录"""
+
+    def __init__(self, base_path: str = "data/checkpoints"):
+        self.base_path = base_path
+        if not os.path.exists(self.base_path):
+            os.makedirs(self.base_path)
+
+    def _directory(self, execution_id: str) -> str:
+        if os.path.basename(execution_id) != execution_id:
+            raise ValueError(f"Invalid execution id: {execution_id}")
+        return os.path.join(self.base_path, execution_id)
+
+    async def create(self, execution_id: str, test_plan: TestPlan) -> Checkpoint:
+        """为新的执行创建检查点"""
+        checkpoint = Checkpoint(self._directory(execution_id), execution_id, test_plan, datetime.now())
+        await asyncio.to_thread(self._create, checkpoint)
+        return checkpoint
+
+    def _create(self, checkpoint: Checkpoint):
+        os.makedirs(checkpoint.directory)
+        with open(os.path.join(checkpoint.directory, PLAN_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                "execution_id": checkpoint.execution_id,
+                "started_at": checkpoint.started_at.isoformat(),
+                "test_plan": checkpoint.test_plan.model_dump(mode="json")
+            }, f, ensure_ascii=False)
+        checkpoint._write_state(checkpoint.state)
+
+    def exists(self, execution_id: str) -> bool:
+        """检查点是否存在（执行中或可恢复）"""
+        try:
+            return os.path.exists(os.path.join(self._directory(execution_id), PLAN_FILE))
+        except ValueError:
+            return False
+
+    async def load(self, execution_id: str) -> Checkpoint:
+        """加载检查点，已完成的分析会合并到对应的测试结果中"""
+        directory = self._directory(execution_id)
+        if not os.path.exists(os.path.join(directory, PLAN_FILE)):
+            raise FileNotFoundError(f"Checkpoint not found: {execution_id}")
+        return await asyncio.to_thread(self._load, directory)
+
+    @staticmethod
+    def _read_lines(path: str) -> List[Dict[str, Any]]:
+        records = []
+        if not os.path.exists(path):
+            return records
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 进程在写入中途退出时，最后一行可能不完整
+                    continue
+        return records
+
+    def _load(self, directory: str) -> Checkpoint:
+        with open(os.path.join(directory, PLAN_FILE), 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+
+        results = [TestResult.model_validate(record) for record in self._read_lines(os.path.join(directory, RESULTS_FILE))]
+        analyses = {
+            record["test_item_id"]: record
+            for record in self._read_lines(os.path.join(directory, ANALYSIS_FILE))
+        }
+        for result in results:
+            if result.test_item_id in analyses:
+                result.analyzed_summary = analyses[result.test_item_id]["analyzed_summary"]
+                result.triage = analyses[result.test_item_id].get("triage")
+
+        state = "interrupted"
+        state_path = os.path.join(directory, STATE_FILE)
+        if os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f).get("state", state)
+
+        return Checkpoint(
+            directory,
+            plan["execution_id"],
+            TestPlan.model_validate(plan["test_plan"]),
+            datetime.fromisoformat(plan["started_at"]),
+            results,
+            state
+        )
+
+    async def list_checkpoints(self) -> List[Dict[str, Any]]:
+        """列出尚未完成的执行"""
+        checkpoints = []
+        for name in sorted(await asyncio.to_thread(os.listdir, self.base_path)):
+            try:
+                checkpoint = await self.load(name)
+            except (FileNotFoundError, ValueError, OSError, json.JSONDecodeError):
+                continue
+            checkpoints.append({
+                "execution_id": checkpoint.execution_id,
+                "test_plan_id": checkpoint.test_plan.id,
+                "test_plan_name": checkpoint.test_plan.name,
+                "state": checkpoint.state,
+                "started_at": checkpoint.started_at,
+                "completed_results": len(checkpoint.results),
+                "analyzed_results": len([result for result in checkpoint.results if result.analyzed_summary]),
+                "enabled_tests": len([item for item in checkpoint.test_plan.test_items if item.enabled])
+            })
+        return checkpoints
+
+    async def mark_interrupted(self, is_active: Optional[Callable[[str], Awaitable[bool]]] = None):
+        """启动时把上一个进程遗留的running/analyzing检查点标记为interrupted
+
+        is_active用于多worker部署，跳过其他存活worker正在执行的检查点。
+        """
+        for checkpoint in await self.list_checkpoints():
+            if checkpoint["state"] in ("running", "analyzing"):
+                if is_active is not None and await is_active(checkpoint["execution_id"]):
+                    continue
+                loaded = await self.load(checkpoint["execution_id"])
+                await loaded.set_state("interrupted")
+                logger.info("Found interrupted execution", extra=fields(
+                    execution_id=loaded.execution_id, completed_results=len(loaded.results)
+                ))
@@ -0,0 +1,62 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+from core.tracing import tracer
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """合并相同key的并发调用
+
+    同一key同时只执行一次底层计算，其余调用等待同一个结果（或异常）。
+    计算结束后立即移除，之后的调用会重新计算；需要缓存时由调用方自行处理。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    def inflight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def start(self, key: Hashable, func: Callable[[], Awaitable[T]], fresh: bool = False) -> "asyncio.Task[T]":
+        """启动（或加入）key对应的计算并返回其任务
+
+        fresh为True时不加入正在进行的计算而是启动新的计算，之后的调用加入新的计算，
+        原有计算继续为已在等待的调用方完成。
+        """
+        task = self._inflight.get(key)
+        if task is not None and not fresh:
+            self._waiters[key] = self._waiters.get(key, 0) + 1
+            tracer.inc("coalesced_calls_total", help_text="Calls merged onto an in-flight computation", flight=self.name)
+            return task
+
+        task = asyncio.create_task(self._run(key, func))
+        self._inflight[key] = task
+        self._waiters[key] = 0
+        tracer.inc("coalescing_computations_total", help_text="Underlying computations started by single-flight groups",
+                   flight=self.name)
+        return task
+
+    async def _run(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        try:
+            with tracer.span("coalescing.compute", flight=self.name):
+                return await func()
+        finally:
+            # 被fresh计算替换后，key已经属于新的计算
+            if self._inflight.get(key) is asyncio.current_task():
+                self._inflight.pop(key, None)
+                waiters = self._waiters.pop(key, 0)
+                tracer.observe("coalescing_fanout", waiters + 1, help_text="Callers served by one computation",
+                               buckets=[1, 2, 4, 8, 16, 32, 64, 128], flight=self.name)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """执行或等待key对应的计算
+
+        使用shield等待：某个调用方被取消时不会取消其他调用方共享的计算。
+        """
+        return await asyncio.shield(self.start(key, func))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "inflight": len(self._inflight), "waiters": sum(self._waiters.values())}
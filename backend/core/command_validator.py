@@ -0,0 +1,711 @@
+import os
+import re
+import shlex
+import shutil
+import subprocess
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple, Set
+from models.schemas import TestItem
+from core.tracing import tracer
+from core.logger import get_logger, fields
+
+logger = get_logger("command_validator")
+
+# 命令分类
+READ_ONLY = "read_only"
+BENCHMARK = "benchmark"
+WRITES = "writes"
+NETWORK = "network"
+PRIVILEGED = "privileged"
+UNKNOWN = "unknown"
+
+# 处理结果
+ALLOW = "allow"
+SANDBOX = "sandbox"
+REJECT = "reject"
+
+# 发现的严重程度：critical直接拒绝，warning放入沙箱执行，info只做提示
+CRITICAL = "critical"
+WARNING = "warning"
+INFO = "info"
+
+READ_ONLY_COMMANDS = {
+    "cat", "ls", "uname", "lscpu", "lsblk", "lspci", "lsusb", "lsmod", "lshw", "lsof", "free", "df", "du", "ps",
+    "top", "htop", "vmstat", "iostat", "mpstat", "pidstat", "sar", "uptime", "w", "who", "whoami", "id", "groups",
+    "hostname", "hostnamectl", "date", "env", "printenv", "which", "whereis", "type", "command", "echo", "printf",
+    "true", "false", "test", "[", "seq", "sleep", "head", "tail", "grep", "egrep", "fgrep", "sed", "cut",
+    "sort", "uniq", "wc", "tr", "column", "paste", "xargs", "stat", "file", "find", "readlink", "realpath",
+    "basename", "dirname", "nproc", "getconf", "ip", "ifconfig", "ss", "netstat", "route", "arp", "ethtool",
+    "dmidecode", "dmesg", "journalctl", "systemctl", "timedatectl", "localectl", "loginctl", "sysctl", "ulimit",
+    "numactl", "taskset", "lstopo", "cpupower", "sensors", "smartctl", "nvidia-smi", "lsb_release", "dpkg",
+    "dpkg-query", "rpm", "apt", "yum", "dnf", "pip", "pip3", "python", "python3", "java", "gcc", "cc", "go",
+    "node", "sw_vers", "system_profiler", "vm_stat", "diskutil", "spctl", "csrutil", "fdesetup",
+    "socketfilterfw", "pmset", "ioreg", "launchctl", "defaults", "mdls", "firewall-cmd", "ufw", "getenforce",
+    "sestatus", "aa-status", "auditctl", "last", "lastlog", "getent", "mount", "blkid", "findmnt", "swapon",
+    "zpool", "zfs", "pvs", "vgs", "lvs", "mdadm", "nvme", "hdparm", "cpuid", "perf", "time", "timeout", "nice",
+    "ionice", "stdbuf", "tee", "yes", "md5sum", "sha1sum", "sha256sum", "base64", "od", "hexdump", "strings",
+    "bc", "expr", "cd", "pwd", "set", "export", "read", "exit", "return", "local", "jq", "less", "more", ":",
+}
+# 包管理器中会修改系统的子命令
+PACKAGE_MANAGERS = {"apt", "apt-get", "yum", "dnf", "zypper", "pip", "pip3", "brew", "snap", "npm"}
+PACKAGE_CHANGES = {"install", "remove", "purge", "upgrade", "update", "uninstall", "erase", "autoremove",
+                   "dist-upgrade", "reinstall", "downgrade"}
+NETWORK_COMMANDS = {
+    "curl", "wget", "ping", "ping6", "traceroute", "tracepath", "mtr", "nc", "ncat", "netcat", "ssh", "scp",
+    "sftp", "rsync", "ftp", "telnet", "nmap", "dig", "nslookup", "host", "arping", "iperf", "iperf3",
+    "speedtest", "speedtest-cli", "ntpdate", "chronyc",
+}
+BENCHMARK_COMMANDS = {
+    "stress", "stress-ng", "sysbench", "fio", "openssl", "7z", "7za", "glmark2", "geekbench", "geekbench5",
+    "geekbench6", "memtester", "mbw", "phoronix-test-suite", "stream", "bonnie++", "iozone", "unixbench",
+    "coremark", "linpack", "hpl", "dd",
+}
+WRITE_COMMANDS = {
+    "rm", "rmdir", "mv", "cp", "touch", "mkdir", "ln", "chmod", "chown", "chgrp", "truncate", "install",
+    "tar", "unzip", "gzip", "gunzip", "split", "fallocate", "mktemp", "shred", "sync",
+}
+# 提权、改变系统状态或影响其他进程，直接拒绝（sudo等可通过配置允许）
+PRIVILEGE_COMMANDS = {"sudo", "su", "doas", "pkexec", "runuser"}
+SYSTEM_CHANGING_COMMANDS = {
+    "chroot", "umount", "modprobe", "insmod", "rmmod", "reboot", "shutdown", "halt", "poweroff", "init",
+    "telinit", "kexec", "swapoff", "mkswap", "useradd", "userdel", "usermod", "passwd", "crontab", "visudo",
+    "kill", "killall", "pkill", "renice", "iptables", "ip6tables", "nft", "setenforce",
+}
+DESTRUCTIVE_COMMANDS = {
+    "mkfs", "mke2fs", "fdisk", "sfdisk", "gdisk", "parted", "wipefs", "blkdiscard", "dmsetup", "lvremove",
+    "vgremove", "pvremove", "format", "diskpart",
+}
+SHELLS = {"sh", "bash", "zsh", "dash", "ksh", "fish"}
+INTERPRETERS = SHELLS | {"python", "python3", "perl", "ruby", "node"}
+# 包装命令：真正执行的是其后的命令
+WRAPPERS = {"timeout", "nice", "ionice", "stdbuf", "time", "env", "command", "exec", "nohup", "taskset",
+            "numactl", "xargs", "builtin"}
+SHELL_KEYWORDS = {"if", "then", "else", "elif", "fi", "while", "until", "for", "do", "done", "case", "esac",
+                  "in", "function", "{", "}", "!", "select"}
+# 只读的systemctl子命令
+SYSTEMCTL_READ_ONLY = {"status", "is-active", "is-enabled", "is-failed", "show", "cat", "list-units",
+                       "list-unit-files", "list-timers", "list-sockets", "list-dependencies", "get-default"}
+# 不会被写坏的重定向目标
+HARMLESS_TARGETS = {"/dev/null", "/dev/stdout", "/dev/stderr", "/dev/tty", "&1", "&2", "1", "2", "-"}
+BLOCK_DEVICE = re.compile(r"^/dev/(sd|hd|vd|xvd|nvme|mmcblk|md|dm-|mapper/|disk|rdisk|loop)")
+PROTECTED_PATHS = re.compile(r"^/(etc|boot|bin|sbin|lib|lib64|usr|proc/sys|sys|System|Library)(/|$)")
+ROOT_LEVEL = re.compile(r"^(/|/\*|~|~/|\$HOME|/[A-Za-z0-9_.-]+/?)$")
+# 函数定义后在函数体内通过管道或后台调用自身：:(){ :|:& };:
+FORK_BOMB = re.compile(r"(?P<name>[\w:.]+)\s*\(\s*\)\s*\{[^}]*(?<![\w:.])(?P=name)\s*[|&][^}]*\}")
+SUBSTITUTION = re.compile(r"\$\(([^()]*)\)|`([^`]*)`")
+# 进程替换 <(cmd) 和 >(cmd)：内部命令单独分析，原位置是一个可读或可写的文件路径
+PROCESS_SUBSTITUTION = re.compile(r"([<>])\(([^()]*)\)")
+PROCESS_PLACEHOLDER = "__process_substitution__"
+DURATION_FLAGS = re.compile(r"^--?(timeout|time|runtime|duration|t)(?:=(\d+))?$")
+INFINITE_SOURCES = {"/dev/zero", "/dev/urandom", "/dev/random"}
+AWK_COMMANDS = {"awk", "gawk", "mawk", "nawk"}
+# awk程序中执行命令和写文件的写法
+AWK_SYSTEM = re.compile(r"\bsystem\s*\(\s*(?:\"((?:[^\"\\]|\\.)*)\"\s*\))?")
+AWK_COMMAND_PIPE = re.compile(r"\|&?\s*(?:getline\b)?\s*\"|\"[^\"]*\"\s*\|\s*getline")
+AWK_OUTPUT_FILE = re.compile(r"(?:print|printf)[^;}]*?>>?\s*\"([^\"]+)\"")
+# 只写最后一个参数（或 -t 指定的目录），前面的参数是读取的来源
+COPY_COMMANDS = {"cp", "install", "ln"}
+RECURSIVE_WRITE_COMMANDS = {"chmod", "chown", "chgrp"}
+# 清空或覆盖文件内容的命令，以及带参数的选项（选项值不是目标路径）
+TRUNCATE_COMMANDS = {"truncate": {"-s", "--size", "-r", "--reference"}, "shred": {"-n", "--iterations", "-s", "--size"}}
+# 删除和清空文件只允许在这些目录下（相对路径在沙箱的私有工作目录下解析）
+DEFAULT_SCRATCH_ROOTS = ("/tmp", "/var/tmp", "/dev/shm")
+
+
+def _finding(severity: str, message: str) -> Dict[str, str]:
+    return {"severity": severity, "message": message}
+
+
+class _Simple:
+    """一条简单命令：参数、重定向目标、与下一条命令的连接符"""
+
+    def __init__(self):
+        self.argv: List[str] = []
+        self.redirects: List[Tuple[str, str]] = []
+        self.separator = ""
+
+
+def _split_commands(command: str) -> List[_Simple]:
+    """用shell词法分析把命令拆成简单命令，引号内的内容不会被误判为操作符"""
+    lexer = shlex.shlex(command.replace("\n", " ; "), posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    commands = [_Simple()]
+    pending_redirect: Optional[str] = None
+    for token in lexer:
+        current = commands[-1]
+        if pending_redirect is not None:
+            current.redirects.append((pending_redirect, token))
+            pending_redirect = None
+            continue
+        if token and all(c in "();<>|&" for c in token):
+            if "<" in token or ">" in token:
+                # 2>&1 之类的文件描述符编号不是参数
+                if current.argv and current.argv[-1].isdigit():
+                    current.argv.pop()
+                pending_redirect = token
+            elif token in ("(", ")"):
+                continue
+            else:
+                current.separator = token
+                commands.append(_Simple())
+            continue
+        current.argv.append(token)
+    return [simple for simple in commands if simple.argv or simple.redirects]
+
+
+def _strip_prefix(argv: List[str]) -> List[str]:
+    """去掉变量赋值、shell关键字和包装命令，返回实际执行的命令"""
+    argv = list(argv)
+    while argv:
+        head = argv[0]
+        if head in SHELL_KEYWORDS or re.match(r"^[A-Za-z_][A-Za-z0-9_]*=", head):
+            argv.pop(0)
+        elif os.path.basename(head) in WRAPPERS and len(argv) > 1:
+            name = os.path.basename(argv.pop(0))
+            while argv and argv[0].startswith("-"):
+                option = argv.pop(0)
+                # 带参数的选项
+                if option in ("-n", "-c", "-p", "-s", "-k", "-o", "-e", "-i", "-I", "-C", "--cpunodebind",
+                              "--membind", "--physcpubind") and argv:
+                    argv.pop(0)
+            if name == "timeout" and argv and re.match(r"^\d+(\.\d+)?[smhd]?$", argv[0]):
+                argv.pop(0)
+            if name in ("numactl", "taskset") and argv and re.match(r"^[\d,-]+$", argv[0]):
+                argv.pop(0)
+        else:
+            break
+    return argv
+
+
+def _declared_seconds(argv: List[str]) -> Optional[float]:
+    """从 --timeout=60、--time 30、fio --runtime=30、sleep 5 之类的参数估计运行时长"""
+    name = os.path.basename(argv[0])
+    if name == "sleep" and len(argv) > 1:
+        match = re.match(r"^(\d+(?:\.\d+)?)([smhd]?)$", argv[1])
+        if match:
+            return float(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+    if name not in BENCHMARK_COMMANDS:
+        return None
+    for index, arg in enumerate(argv[1:], start=1):
+        match = DURATION_FLAGS.match(arg)
+        if not match:
+            continue
+        value = match.group(2) or (argv[index + 1] if index + 1 < len(argv) else "")
+        value = re.match(r"^(\d+)([smh]?)$", value)
+        if value:
+            return float(value.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[value.group(2)]
+    return None
+
+
+class _Analysis:
+    def __init__(self, scratch_roots: Tuple[str, ...] = DEFAULT_SCRATCH_ROOTS):
+        self.scratch_roots = scratch_roots
+        self.classes: List[str] = []
+        self.findings: List[Dict[str, str]] = []
+        self.declared_seconds = 0.0
+
+    def add_class(self, name: str):
+        if name not in self.classes:
+            self.classes.append(name)
+
+    def add(self, severity: str, message: str):
+        finding = _finding(severity, message)
+        if finding not in self.findings:
+            self.findings.append(finding)
+
+
+def _check_target(analysis: _Analysis, target: str, action: str):
+    """检查写入目标（重定向或dd of=）"""
+    if target in HARMLESS_TARGETS:
+        return
+    if BLOCK_DEVICE.match(target):
+        analysis.add(CRITICAL, f"{action} to block device {target}")
+    elif PROTECTED_PATHS.match(target):
+        analysis.add(CRITICAL, f"{action} to system path {target}")
+    else:
+        analysis.add_class(WRITES)
+
+
+def _positional(args: List[str]) -> List[str]:
+    return [arg for arg in args if not arg.startswith("-")]
+
+
+def _check_recursive_target(analysis: _Analysis, targets: List[str], action: str):
+    """递归操作顶层目录或系统目录"""
+    if any(ROOT_LEVEL.match(target) or PROTECTED_PATHS.match(target) for target in targets):
+        analysis.add(CRITICAL, f"{action} of a top-level or system directory")
+
+
+def _outside_scratch(target: str, scratch_roots: Tuple[str, ...]) -> bool:
+    """删除或清空的目标是否可能落在临时目录之外，无法确定（变量、命令替换）时按在外处理"""
+    if target in HARMLESS_TARGETS or target == PROCESS_PLACEHOLDER:
+        # 进程替换是管道，写入它不会清空文件
+        return False
+    if target.startswith(("~", "$")) or "__substitution__" in target or PROCESS_PLACEHOLDER in target:
+        return True
+    if not target.startswith("/"):
+        # 相对路径在沙箱的私有工作目录下，只要不通过..跳出
+        return ".." in target.split("/")
+    path = os.path.normpath(target)
+    return not any(path.startswith(root.rstrip("/") + "/") for root in scratch_roots)
+
+
+def _check_scratch(analysis: _Analysis, targets: List[str], action: str):
+    """删除和清空文件只允许在临时目录下进行"""
+    for target in targets:
+        if _outside_scratch(target, analysis.scratch_roots):
+            analysis.add(CRITICAL, f"{action} outside the scratch directories: {target}")
+            return
+
+
+def _operands(args: List[str], options_with_values: Set[str]) -> List[str]:
+    """去掉选项及其参数后的操作数"""
+    operands = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in options_with_values:
+            skip = True
+        elif not arg.startswith("-"):
+            operands.append(arg)
+    return operands
+
+
+def _interpreter_reads_stdin(argv: List[str]) -> bool:
+    """解释器没有脚本参数，从标准输入读取要执行的代码"""
+    return bool(argv) and os.path.basename(argv[0]) in INTERPRETERS and not [
+        arg for arg in argv[1:] if not arg.startswith("-")
+    ]
+
+
+def _find_roots(args: List[str]) -> List[str]:
+    """find的起始路径：第一个表达式之前的参数"""
+    roots = []
+    for arg in args:
+        if arg.startswith("-") or arg in ("(", "!", "\\("):
+            break
+        roots.append(arg)
+    return roots
+
+
+def _tar_targets(args: List[str]) -> List[str]:
+    """tar只写归档文件（创建时）或解压目录（解压时），其余参数是读取的来源"""
+    bundle = args[0].lstrip("-") if args and not args[0].startswith("--") else ""
+    create = "c" in bundle or any(arg in ("-c", "--create") for arg in args)
+    archive = directory = None
+    for index, arg in enumerate(args):
+        value = args[index + 1] if index + 1 < len(args) else None
+        if arg.startswith("--file="):
+            archive = arg.split("=", 1)[1]
+        elif arg.startswith("--directory="):
+            directory = arg.split("=", 1)[1]
+        elif arg == "-C":
+            directory = value
+        elif (arg.startswith("-") or index == 0) and not arg.startswith("--") and arg.endswith("f"):
+            archive = value
+    target = archive if create else directory
+    return [target] if target else []
+
+
+def _check_write_command(analysis: _Analysis, name: str, args: List[str]):
+    """检查写入类命令的每个目标路径"""
+    analysis.add_class(WRITES)
+    positional = _positional(args)
+    if name in COPY_COMMANDS:
+        directory = next((args[i + 1] for i, arg in enumerate(args[:-1]) if arg == "-t"), None)
+        directory = directory or next((arg.split("=", 1)[1] for arg in args
+                                       if arg.startswith("--target-directory=")), None)
+        targets = [directory] if directory else positional[-1:] if len(positional) > 1 else []
+    elif name == "tar":
+        targets = _tar_targets(args)
+    else:
+        targets = positional
+    for target in targets:
+        _check_target(analysis, target, f"{name} write")
+    if name in TRUNCATE_COMMANDS:
+        _check_scratch(analysis, _operands(args, TRUNCATE_COMMANDS[name]), name.capitalize())
+    recursive = any(arg in ("-R", "--recursive") or re.match(r"^-[a-zA-Z]*R", arg) for arg in args)
+    if name in RECURSIVE_WRITE_COMMANDS and recursive:
+        _check_recursive_target(analysis, positional[1:], f"Recursive {name}")
+    elif name == "mv":
+        # 被移走的来源目录同样会消失
+        sources = positional if any(arg == "-t" or arg.startswith("--target-directory") for arg in args) \
+            else positional[:-1]
+        _check_recursive_target(analysis, sources, "Move")
+
+
+def _check_awk(analysis: _Analysis, args: List[str], depth: int):
+    """awk程序可以通过system()、管道和重定向执行命令或写文件"""
+    for program in _positional(args):
+        for match in AWK_SYSTEM.finditer(program):
+            if match.group(1) is not None:
+                _analyze_into(analysis, match.group(1).replace('\\"', '"'), depth + 1)
+            else:
+                analysis.add(WARNING, "awk system() call cannot be analyzed")
+        if AWK_COMMAND_PIPE.search(program):
+            analysis.add(WARNING, "awk pipes to or from a command")
+        for target in AWK_OUTPUT_FILE.findall(program):
+            _check_target(analysis, target, "awk write")
+
+
+def _analyze_into(analysis: _Analysis, command: str, depth: int = 0):
+    if depth > 3:
+        analysis.add(WARNING, "Command nesting too deep to analyze")
+        return
+    if FORK_BOMB.search(command):
+        analysis.add(CRITICAL, "Fork bomb: function recursively spawns itself")
+    # 命令替换和进程替换中的命令单独分析，原位置用占位符代替
+    for match in SUBSTITUTION.finditer(command):
+        _analyze_into(analysis, match.group(1) or match.group(2) or "", depth + 1)
+    command = SUBSTITUTION.sub("__substitution__", command)
+    for match in PROCESS_SUBSTITUTION.finditer(command):
+        _analyze_into(analysis, match.group(2), depth + 1)
+        # tee >(sh) 之类：写入进程替换的内容交给解释器执行
+        if match.group(1) == ">":
+            try:
+                inner = _split_commands(match.group(2))
+            except ValueError:
+                inner = []
+            if inner and _interpreter_reads_stdin(_strip_prefix(inner[0].argv)):
+                analysis.add(CRITICAL, "Output fed into an interpreter through process substitution")
+    command = PROCESS_SUBSTITUTION.sub(PROCESS_PLACEHOLDER, command)
+
+    try:
+        simples = _split_commands(command)
+    except ValueError as e:
+        analysis.add(CRITICAL, f"Command cannot be parsed: {e}")
+        return
+
+    for index, simple in enumerate(simples):
+        following = simples[index + 1] if index + 1 < len(simples) else None
+        piped_into = following if simple.separator in ("|", "|&") and following is not None else None
+        next_argv = _strip_prefix(piped_into.argv) if piped_into is not None else []
+        next_name = os.path.basename(next_argv[0]) if next_argv else ""
+
+        for operator, target in simple.redirects:
+            if ">" in operator:
+                _check_target(analysis, target, "Redirect")
+                # > 会先清空目标文件，>> 只追加，>& 复制文件描述符
+                if ">>" not in operator and not operator.endswith("&"):
+                    _check_scratch(analysis, [target], "Redirect truncates a file")
+        if simple.separator == "&":
+            analysis.add(WARNING, "Background process can outlive the test")
+
+        argv = _strip_prefix(simple.argv)
+        if not argv:
+            continue
+        name = os.path.basename(argv[0])
+        args = argv[1:]
+        analysis.declared_seconds = max(analysis.declared_seconds, _declared_seconds(argv) or 0.0)
+
+        if name in PRIVILEGE_COMMANDS:
+            analysis.add_class(PRIVILEGED)
+            if len(args) > 0:
+                # 提权执行的命令本身也要分析
+                inner = [arg for arg in args if not arg.startswith("-")]
+                if inner:
+                    _analyze_into(analysis, shlex.join(inner), depth + 1)
+            continue
+        if name in DESTRUCTIVE_COMMANDS or name.startswith("mkfs."):
+            analysis.add(CRITICAL, f"Destructive disk command: {name}")
+            continue
+        if name in SYSTEM_CHANGING_COMMANDS:
+            analysis.add_class(PRIVILEGED)
+            analysis.add(CRITICAL, f"Command changes system state or other processes: {name}")
+            continue
+        if name == "systemctl" and args and args[0] not in SYSTEMCTL_READ_ONLY and not args[0].startswith("-"):
+            analysis.add_class(PRIVILEGED)
+            analysis.add(CRITICAL, f"systemctl {args[0]} changes service state")
+            continue
+        if (name in PACKAGE_MANAGERS and any(arg in PACKAGE_CHANGES for arg in args)) or (
+            name in ("dpkg", "rpm") and any(re.match(r"^-[a-zA-Z]*[iUeFP]", arg) or arg in ("--install", "--erase",
+                                                                                          "--purge", "--remove")
+                                            for arg in args)
+        ):
+            analysis.add_class(PRIVILEGED)
+            analysis.add(CRITICAL, f"{name} changes installed packages")
+            continue
+        if name == "mount" and [arg for arg in args if not arg.startswith("-")]:
+            analysis.add_class(PRIVILEGED)
+            analysis.add(CRITICAL, "mount changes mounted filesystems")
+            continue
+        if name == "sysctl" and any(arg in ("-w", "--write", "-p", "--load") or "=" in arg for arg in args):
+            analysis.add_class(PRIVILEGED)
+            analysis.add(CRITICAL, "sysctl writes kernel parameters")
+            continue
+
+        if name in INTERPRETERS and ("-c" in args or "-e" in args):
+            flag = "-c" if "-c" in args else "-e"
+            position = args.index(flag) + 1
+            if name in SHELLS and position < len(args):
+                _analyze_into(analysis, args[position], depth + 1)
+            elif name not in SHELLS:
+                analysis.add(WARNING, f"Inline {name} code cannot be analyzed")
+            continue
+        # 解释器执行进程替换的输出（bash <(curl ...)、bash < <(curl ...)、source <(curl ...)），等同于管道执行
+        script = next((arg for arg in args if not arg.startswith("-")), None)
+        fed = script == PROCESS_PLACEHOLDER or (script is None and any(
+            "<" in operator and target == PROCESS_PLACEHOLDER for operator, target in simple.redirects
+        ))
+        if (name in INTERPRETERS or name in ("source", ".")) and fed:
+            analysis.add(CRITICAL, f"Output of process substitution executed by {name}")
+            continue
+        if name in INTERPRETERS and script is not None:
+            # 执行脚本文件，内容无法静态分析
+            analysis.add_class(UNKNOWN)
+            continue
+        if name in ("eval", "source", "."):
+            analysis.add(WARNING, f"Dynamic code execution via {name}")
+            continue
+
+        if name == "rm":
+            analysis.add_class(WRITES)
+            recursive = any(arg.startswith("-") and ("r" in arg or "R" in arg) or arg == "--recursive" for arg in args)
+            if recursive:
+                _check_recursive_target(analysis, _positional(args), "Recursive delete")
+            _check_scratch(analysis, _positional(args), "Delete")
+        elif name == "dd":
+            operands = dict(arg.split("=", 1) for arg in args if "=" in arg)
+            target = operands.get("of")
+            if target is None:
+                analysis.add_class(BENCHMARK)
+            elif target == "/dev/null":
+                analysis.add_class(BENCHMARK)
+            else:
+                _check_target(analysis, target, "dd write")
+                _check_scratch(analysis, [target], "dd overwrite")
+            if operands.get("if") in INFINITE_SOURCES and "count" not in operands:
+                analysis.add(CRITICAL if target not in HARMLESS_TARGETS and target is not None else WARNING,
+                             "dd from an infinite source without count=")
+        elif name == "sed" and any(arg.startswith("-i") or arg == "--in-place" for arg in args):
+            analysis.add_class(WRITES)
+        elif name == "find" and ("-delete" in args or "-exec" in args or "-execdir" in args):
+            if "-delete" in args:
+                analysis.add_class(WRITES)
+                _check_recursive_target(analysis, _find_roots(args), "Recursive delete")
+                _check_scratch(analysis, _find_roots(args), "Delete")
+            for flag in ("-exec", "-execdir"):
+                if flag in args:
+                    inner = args[args.index(flag) + 1:]
+                    inner = inner[:next((i for i, arg in enumerate(inner) if arg in (";", "+")), len(inner))]
+                    if inner:
+                        _analyze_into(analysis, shlex.join(inner), depth + 1)
+        elif name == "tee":
+            for target in _positional(args):
+                _check_target(analysis, target, "tee write")
+            if not any(arg in ("-a", "--append") for arg in args):
+                _check_scratch(analysis, _positional(args), "tee truncates a file")
+        elif name in WRITE_COMMANDS:
+            _check_write_command(analysis, name, args)
+        elif name in NETWORK_COMMANDS:
+            analysis.add_class(NETWORK)
+            if name in ("ping", "ping6") and not any(arg.startswith("-c") for arg in args):
+                analysis.add(WARNING, "ping without -c runs until the timeout")
+        elif name in BENCHMARK_COMMANDS:
+            if name == "openssl" and (not args or args[0] != "speed"):
+                analysis.add_class(READ_ONLY)
+            elif name in ("7z", "7za") and (not args or args[0] != "b"):
+                analysis.add_class(WRITES)
+            else:
+                analysis.add_class(BENCHMARK)
+        elif name in AWK_COMMANDS:
+            analysis.add_class(READ_ONLY)
+            _check_awk(analysis, args, depth)
+        elif name in READ_ONLY_COMMANDS or name == "__substitution__":
+            analysis.add_class(READ_ONLY)
+        else:
+            analysis.add_class(UNKNOWN)
+
+        # 无限输出：写入文件会填满磁盘，管道给head等有界消费者则没有问题
+        infinite = name == "yes" or (name == "cat" and any(arg in INFINITE_SOURCES for arg in args))
+        if infinite and next_name not in ("head", "dd"):
+            file_targets = [target for operator, target in simple.redirects
+                            if ">" in operator and target not in HARMLESS_TARGETS]
+            # 管道给tee或cat时，由它们写入文件
+            if next_name in ("tee", "cat"):
+                file_targets += [target for operator, target in piped_into.redirects
+                                 if ">" in operator and target not in HARMLESS_TARGETS]
+            if next_name == "tee":
+                file_targets += [target for target in _positional(next_argv[1:]) if target not in HARMLESS_TARGETS]
+            if file_targets:
+                analysis.add(CRITICAL, f"Unbounded output from {name} written to {file_targets[0]}")
+            elif piped_into is None:
+                analysis.add(WARNING, f"Unbounded output from {name}")
+        # 下载或生成的内容直接交给解释器执行
+        if piped_into is not None and _interpreter_reads_stdin(next_argv):
+            analysis.add(CRITICAL, f"Output piped into {next_name} for execution")
+        if name in ("true", ":") and simple.argv[0] in ("while", "until"):
+            analysis.add(WARNING, "Unbounded loop runs until the timeout")
+
+
+@lru_cache(maxsize=4096)
+def _analyze(
+    command: str,
+    scratch_roots: Tuple[str, ...] = DEFAULT_SCRATCH_ROOTS
+) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...], float]:
+    """分析结果只取决于命令文本和临时目录配置，相同命令（重复的计划、定时执行）直接复用"""
+    analysis = _Analysis(scratch_roots)
+    _analyze_into(analysis, command)
+    findings = tuple((finding["severity"], finding["message"]) for finding in analysis.findings)
+    return tuple(analysis.classes), findings, analysis.declared_seconds
+
+
+@lru_cache(maxsize=1)
+def _bwrap_usable() -> bool:
+    """bubblewrap是否已安装且能在当前环境创建命名空间（容器内可能被禁止）"""
+    if shutil.which("bwrap") is None:
+        return False
+    try:
+        probe = subprocess.run(["bwrap", "--ro-bind", "/", "/", "--dev", "/dev", "--proc", "/proc", "true"],
+                               capture_output=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return probe.returncode == 0
+
+
+class CommandValidator:
+    """执行前对测试命令做静态安全分析
+
+    用shell词法分析把命令拆成简单命令后分类（只读探测、基准测试、写入、网络、提权），
+    找出fork bomb、写块设备、无限输出写入文件、下载后交给shell执行、在临时目录之外删除或清空文件
+    等危险模式并估计开销：有critical发现的命令拒绝执行，写入、网络、未知命令和有warning的命令
+    在沙箱中执行，只读探测和基准测试正常执行。
+
+    沙箱总是提供ulimit资源上限和私有的工作目录（同时作为TMPDIR，执行后删除）；只有安装了
+    bubblewrap时才有文件系统隔离（根目录只读、私有/tmp、独立PID命名空间），否则命令仍能写入
+    当前用户有权限的任何位置，安全性依赖上面的静态分析。
+    """
+
+    MODES = ["enforce", "warn", "off"]
+    ISOLATION_MODES = ["auto", "bwrap", "none"]
+
+    def __init__(
+        self,
+        mode: str = "enforce",
+        allow_privileged: bool = False,
+        max_processes: int = 2048,
+        max_file_mb: int = 1024,
+        max_memory_mb: int = 0,
+        scratch_roots: Tuple[str, ...] = DEFAULT_SCRATCH_ROOTS,
+        isolation: str = "auto",
+        allow_network: bool = True
+    ):
+        self.mode = mode if mode in self.MODES else "enforce"
+        self.allow_privileged = allow_privileged
+        self.max_processes = max_processes
+        self.max_file_mb = max_file_mb
+        self.max_memory_mb = max_memory_mb
+        self.scratch_roots = tuple(root.rstrip("/") or "/" for root in scratch_roots if root)
+        self.allow_network = allow_network
+        isolation = isolation if isolation in self.ISOLATION_MODES else "auto"
+        if isolation == "none":
+            self.isolation = "none"
+        elif _bwrap_usable():
+            self.isolation = "bwrap"
+        else:
+            log = logger.warning if isolation == "bwrap" else logger.info
+            log("bubblewrap is not usable, sandbox has resource limits and a private working directory only")
+            self.isolation = "none"
+
+    @classmethod
+    def from_env(cls) -> "CommandValidator":
+        scratch_roots = os.getenv("SANDBOX_SCRATCH_ROOTS", ",".join(DEFAULT_SCRATCH_ROOTS))
+        return cls(
+            mode=os.getenv("COMMAND_VALIDATION", "enforce").lower(),
+            allow_privileged=os.getenv("COMMAND_VALIDATION_ALLOW_PRIVILEGED", "false").lower() == "true",
+            max_processes=int(os.getenv("SANDBOX_MAX_PROCESSES", "2048")),
+            max_file_mb=int(os.getenv("SANDBOX_MAX_FILE_MB", "1024")),
+            max_memory_mb=int(os.getenv("SANDBOX_MAX_MEMORY_MB", "0")),
+            scratch_roots=tuple(root.strip() for root in scratch_roots.split(",") if root.strip()),
+            isolation=os.getenv("SANDBOX_ISOLATION", "auto").lower(),
+            allow_network=os.getenv("SANDBOX_ALLOW_NETWORK", "true").lower() == "true"
+        )
+
+    @property
+    def enforcing(self) -> bool:
+        return self.mode == "enforce"
+
+    def analyze(self, command: str, timeout: Optional[int] = None) -> Dict[str, Any]:
+        """分析一条命令，返回分类、发现、开销估计和处理结果"""
+        classes, findings, declared_seconds = _analyze(command, self.scratch_roots)
+        findings = [_finding(severity, message) for severity, message in findings]
+        if PRIVILEGED in classes and not self.allow_privileged and not any(f["severity"] == CRITICAL for f in findings):
+            findings.append(_finding(CRITICAL, "Privileged command (set COMMAND_VALIDATION_ALLOW_PRIVILEGED to allow)"))
+        if timeout is not None and declared_seconds > timeout:
+            findings.append(_finding(INFO, f"Declared run time {declared_seconds:.0f}s exceeds timeout {timeout}s"))
+
+        if BENCHMARK in classes or declared_seconds >= 60 or any("Unbounded" in f["message"] for f in findings):
+            cost = "high"
+        elif classes and all(name == READ_ONLY for name in classes) and declared_seconds < 10:
+            cost = "low"
+        else:
+            cost = "medium"
+
+        if any(f["severity"] == CRITICAL for f in findings):
+            decision = REJECT
+        elif any(f["severity"] == WARNING for f in findings) or any(
+            name in (WRITES, NETWORK, UNKNOWN, PRIVILEGED) for name in classes
+        ):
+            decision = SANDBOX
+        else:
+            decision = ALLOW
+        return {
+            "classes": list(classes),
+            "findings": findings,
+            "cost": cost,
+            "declared_seconds": declared_seconds or None,
+            "decision": decision
+        }
+
+    def validate_items(self, test_items: List[TestItem]) -> List[Dict[str, Any]]:
+        """分析一批测试项目，在线程中调用"""
+        verdicts = []
+        for test_item in test_items:
+            verdict = self.analyze(test_item.command, test_item.timeout) if test_item.command else {
+                "classes": [READ_ONLY], "findings": [], "cost": "low", "declared_seconds": None, "decision": ALLOW
+            }
+            verdict["id"] = test_item.id
+            tracer.inc("command_validation_total", help_text="Validated test commands by decision",
+                       decision=verdict["decision"])
+            if verdict["decision"] != ALLOW:
+                logger.info("Command flagged by validation", extra=fields(
+                    test_id=test_item.id, decision=verdict["decision"],
+                    findings=[f["message"] for f in verdict["findings"]], classes=verdict["classes"]
+                ))
+            verdicts.append(verdict)
+        return verdicts
+
+    def sandbox_command(self, command: str) -> str:
+        """在单独的bash中设置资源上限，并在私有工作目录（有bubblewrap时在隔离环境）中执行命令
+
+        显式使用bash而不依赖调用方的shell：dash等不支持 ulimit -u，且 -f 的单位不同。
+        ulimit只作用于该bash及其子进程；命令通过位置参数传入，不需要再次转义。
+        """
+        lines = []
+        if self.max_processes > 0:
+            lines.append(f"ulimit -S -u {self.max_processes}")
+        if self.max_file_mb > 0:
+            # bash的 -f 和 -v 以1024字节为单位
+            lines.append(f"ulimit -S -f {self.max_file_mb * 1024}")
+        if self.max_memory_mb > 0:
+            lines.append(f"ulimit -S -v {self.max_memory_mb * 1024}")
+        # 超过硬限制时保持原有上限
+        lines = [f"{line} 2>/dev/null" for line in lines]
+        lines.append('__ss_work=$(mktemp -d "${TMPDIR:-/tmp}/sysscope_sandbox.XXXXXX") || exit 125')
+        lines.append('cd "$__ss_work" || exit 125')
+        inner = '/bin/bash --noprofile --norc -c "$1"'
+        if self.isolation == "bwrap":
+            # 根目录只读，/tmp和/var/tmp为私有tmpfs，只有工作目录可写回宿主机（执行后删除）
+            network = "" if self.allow_network else " --unshare-net"
+            inner = (
+                'bwrap --ro-bind / / --dev /dev --proc /proc --tmpfs /tmp --tmpfs /var/tmp '
+                '--bind "$__ss_work" "$__ss_work" --chdir "$__ss_work" '
+                f'--unshare-pid --die-with-parent{network} {inner}'
+            )
+        lines.append(f'TMPDIR="$__ss_work" {inner}')
+        lines.append("__ss_rc=$?")
+        lines.append('cd / && rm -rf "$__ss_work"')
+        lines.append('exit "$__ss_rc"')
+        script = "\n".join(lines)
+        return f"/bin/bash --noprofile --norc -c {shlex.quote(script)} sysscope-sandbox {shlex.quote(command)}"
@@ -0,0 +1,26 @@
+import heapq
+from typing import List, Tuple
+
+
+def makespan(durations: List[float], slots: int) -> float:
+    """按给定顺序把任务依次分配给最早空闲的执行槽，返回全部完成的时间"""
+    if not durations:
+        return 0.0
+    if slots <= 1:
+        return sum(durations)
+    finish = [0.0] * min(slots, len(durations))
+    for duration in durations:
+        heapq.heapreplace(finish, finish[0] + duration)
+    return max(finish)
+
+
+def predict(entries: List[Tuple[float, bool]], concurrency: int) -> float:
+    """预测一组 (预计时长, 是否独占) 任务的总耗时
+
+    独占任务（基准测试）单独串行执行，其余任务按最长优先在concurrency个执行槽上并行。
+    """
+    if concurrency <= 1:
+        return sum(duration for duration, _ in entries)
+    exclusive = sum(duration for duration, is_exclusive in entries if is_exclusive)
+    shared = sorted((duration for duration, is_exclusive in entries if not is_exclusive), reverse=True)
+    return exclusive + makespan(shared, concurrency)
@@ -0,0 +1,240 @@
+import os
+import json
+import math
+import hashlib
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from models.schemas import TestItem, TestResult, TestStatus
+from core.tracing import tracer
+from core.logger import get_logger, fields
+
+logger = get_logger("duration_history")
+
+# 不区分主机的汇总样本，本机样本不足时使用
+FLEET = "*"
+# 超时或卡住被终止的测试，实际时长至少为终止前运行的时间
+CUT_SHORT_ERRORS = ("Command timed out", "Command stalled", "Probe timed out")
+
+
+def quantile(values: List[float], q: float) -> float:
+    """最近秩法分位数，样本较少时偏向较大值"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def history_key(test_item: TestItem) -> str:
+    """按执行内容区分测试：同一命令（或探针）在不同计划中共用历史"""
+    content = f"{test_item.probe or ''}\n{test_item.command}"
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+
+class DurationHistory:
+    """按测试学习执行时长，自适应设置超时和卡住检测
+
+    每个成功的测试追加一行 {host, key, duration, max_silence} 到ndjson文件（多个worker
+    可同时追加），内存中每个 (主机, 测试) 只保留最近window个样本。样本足够时：
+    超时 = 时长分位数 × factor，卡住阈值 = 最长无输出间隔分位数 × factor，
+    均限制在 [floor, ceiling] 内；样本不足时沿用TestItem上的静态超时。
+
+    超时或卡住被终止的测试记为截断样本（censored，时长取终止时已运行的时间），同样参与
+    分位数计算，使学到的超时逐次增大；最近一个样本是截断样本时，超时取学到的值和静态
+    超时中较大的一个，且不使用学到的卡住阈值，避免学到的超时过小后测试再也无法完成。
+    """
+
+    # 文件超过这么多行时按window重写
+    COMPACT_LINES = 20000
+
+    def __init__(
+        self,
+        path: str,
+        window: int = 50,
+        min_samples: int = 5,
+        q: float = 0.99,
+        factor: float = 2.0,
+        floor: float = 5,
+        ceiling: float = 3600,
+        stall_floor: float = 10
+    ):
+        self.path = path
+        self.window = window
+        self.min_samples = min_samples
+        self.q = q
+        self.factor = factor
+        self.floor = floor
+        self.ceiling = ceiling
+        self.stall_floor = stall_floor
+        self._samples: Dict[Tuple[str, str], "deque[Tuple[float, float, bool]]"] = {}
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._lines = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "DurationHistory":
+        return cls(
+            path=os.getenv("DURATION_HISTORY_PATH", "data/duration_history.ndjson"),
+            window=int(os.getenv("ADAPTIVE_TIMEOUT_WINDOW", "50")),
+            min_samples=int(os.getenv("ADAPTIVE_TIMEOUT_MIN_SAMPLES", "5")),
+            q=float(os.getenv("ADAPTIVE_TIMEOUT_QUANTILE", "0.99")),
+            factor=float(os.getenv("ADAPTIVE_TIMEOUT_FACTOR", "2.0")),
+            floor=float(os.getenv("ADAPTIVE_TIMEOUT_FLOOR", "5")),
+            ceiling=float(os.getenv("ADAPTIVE_TIMEOUT_CEILING", "3600")),
+            stall_floor=float(os.getenv("STALL_TIMEOUT_FLOOR", "10"))
+        )
+
+    def _add(self, host: str, key: str, duration: float, max_silence: float, censored: bool = False):
+        for owner in (host, FLEET):
+            samples = self._samples.setdefault((owner, key), deque(maxlen=self.window))
+            samples.append((duration, max_silence, censored))
+
+    def refresh(self):
+        """读取其他worker追加的样本，文件被重写后重新加载"""
+        if not os.path.exists(self.path):
+            return
+        with self._lock:
+            stat = os.stat(self.path)
+            size = stat.st_size
+            # 其他worker重写文件后inode改变
+            if stat.st_ino != self._inode or size < self._offset:
+                self._inode = stat.st_ino
+                self._samples.clear()
+                self._offset = 0
+                self._lines = 0
+            if size == self._offset:
+                return
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+            # 只处理完整的行，正在追加的行留到下次
+            complete = data.rfind(b"\n") + 1
+            for line in data[:complete].splitlines():
+                try:
+                    entry = json.loads(line)
+                    self._add(entry["host"], entry["key"], float(entry["duration"]),
+                              float(entry.get("max_silence") or 0), bool(entry.get("censored")))
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self._lines += 1
+            self._offset += complete
+            if self._lines > self.COMPACT_LINES:
+                self._compact()
+
+    def _compact(self):
+        """只保留每个 (主机, 测试) 最近window个样本"""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for (host, key), samples in self._samples.items():
+                if host == FLEET:
+                    continue
+                for duration, max_silence, censored in samples:
+                    entry = {"host": host, "key": key, "duration": duration, "max_silence": max_silence}
+                    if censored:
+                        entry["censored"] = True
+                    f.write(json.dumps(entry) + "\n")
+        # 重写期间其他worker追加的少量样本会丢失，不影响学习结果
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self._inode = stat.st_ino
+        self._offset = stat.st_size
+        self._lines = sum(len(samples) for (host, _), samples in self._samples.items() if host != FLEET)
+        logger.info("Duration history compacted", extra=fields(samples=self._lines))
+
+    def _samples_for(self, hostname: str, key: str, min_samples: Optional[int] = None) -> List[Tuple[float, float, bool]]:
+        """本机样本足够时使用本机的，否则使用所有主机的"""
+        min_samples = self.min_samples if min_samples is None else min_samples
+        with self._lock:
+            for owner in (hostname, FLEET):
+                samples = self._samples.get((owner, key))
+                if samples is not None and len(samples) >= min_samples:
+                    return list(samples)
+        return []
+
+    def estimate(self, test_item: TestItem, hostname: str) -> Optional[float]:
+        """预计时长（历史时长的中位数），没有任何历史时返回None"""
+        samples = self._samples_for(hostname, history_key(test_item), min_samples=1)
+        if not samples:
+            return None
+        return quantile([duration for duration, _, _ in samples], 0.5)
+
+    def adapt(self, test_item: TestItem, hostname: str) -> TestItem:
+        """返回按历史调整了timeout和stall_timeout的测试项目，样本不足时原样返回"""
+        samples = self._samples_for(hostname, history_key(test_item))
+        if not samples:
+            tracer.inc("adaptive_timeouts_total", help_text="Timeout resolution by source", source="static")
+            return test_item
+        timeout = quantile([duration for duration, _, _ in samples], self.q) * self.factor
+        timeout = math.ceil(min(self.ceiling, max(self.floor, timeout)))
+        # 上次被超时或卡住检测终止：学到的阈值可能偏小，本次至少给出静态超时
+        backoff = samples[-1][2]
+        if backoff:
+            timeout = max(timeout, test_item.timeout)
+        update = {"timeout": timeout}
+        if test_item.stall_timeout is None and not backoff:
+            stall = quantile([silence for _, silence, _ in samples], self.q) * self.factor
+            stall = math.ceil(max(self.stall_floor, stall))
+            # 卡住阈值不小于超时时没有意义
+            if stall < timeout:
+                update["stall_timeout"] = stall
+        tracer.inc("adaptive_timeouts_total", help_text="Timeout resolution by source",
+                   source="backoff" if backoff else "learned")
+        return test_item.model_copy(update=update)
+
+    def _append(self, line: str):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+    async def record(self, test_item: TestItem, result: TestResult, hostname: str):
+        """追加一次执行的时长，下次refresh时载入
+
+        成功的执行记为正常样本，超时或卡住被终止的记为截断样本，其他失败的时长不代表正常耗时，不计入。
+        """
+        if result.duration is None:
+            return
+        censored = result.status == TestStatus.FAILED and (result.error or "").startswith(CUT_SHORT_ERRORS)
+        if result.status != TestStatus.COMPLETED and not censored:
+            return
+        duration = result.duration
+        if censored and not (result.error or "").startswith("Command stalled"):
+            # 超时终止时至少运行了timeout秒
+            duration = max(duration, test_item.timeout)
+        max_silence = result.max_silence if result.max_silence is not None else duration
+        entry = {
+            "host": hostname,
+            "key": history_key(test_item),
+            "duration": round(duration, 4),
+            "max_silence": round(max_silence, 4),
+            "recorded_at": datetime.now().isoformat()
+        }
+        if censored:
+            entry["censored"] = True
+            tracer.inc("duration_samples_censored_total", help_text="Runs recorded as cut short by a timeout or stall")
+        line = json.dumps(entry)
+        await asyncio.to_thread(self._append, line)
+
+    def describe(self, hostname: Optional[str] = None) -> List[Dict[str, Any]]:
+        """各测试的样本数、时长分位数和当前会使用的超时"""
+        with self._lock:
+            items = [(owner, key, list(samples)) for (owner, key), samples in self._samples.items()
+                     if owner == (hostname or FLEET)]
+        described = []
+        for owner, key, samples in items:
+            durations = [duration for duration, _, _ in samples]
+            enough = len(samples) >= self.min_samples
+            described.append({
+                "host": owner,
+                "key": key,
+                "samples": len(samples),
+                "p50_seconds": round(quantile(durations, 0.5), 3),
+                "p99_seconds": round(quantile(durations, 0.99), 3),
+                "max_silence_seconds": round(max(silence for _, silence, _ in samples), 3),
+                "censored": sum(1 for _, _, censored in samples if censored),
+                "timeout": math.ceil(min(self.ceiling, max(self.floor, quantile(durations, self.q) * self.factor)))
+                if enough else None
+            })
+        return described
@@ -0,0 +1,204 @@
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from models.schemas import TestPlan, TestResult, TestStatus
+from core.shared_state import SharedState, WORKER_ID
+from core.critical_path import predict
+
+JOBS_NAMESPACE = "jobs"
+# 执行结束后任务记录保留的时间
+JOB_HISTORY_TTL = 24 * 3600
+ACTIVE_STATES = ("running", "analyzing")
+
+
+def _worker_lease(worker_id: str) -> str:
+    return f"worker:{worker_id}"
+
+
+class JobTracker:
+    """执行任务状态和逐项进度，保存在共享状态中，任一worker都能查询
+
+    任务摘要保存在jobs命名空间，逐项进度保存在 job_items:<execution_id> 命名空间；
+    每个worker定期续期自己的存活租约，执行中的任务只有在所属worker存活时才算活跃。
+    """
+
+    def __init__(self, state: SharedState, worker_id: str = WORKER_ID):
+        self.state = state
+        self.worker_id = worker_id
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def _items_namespace(execution_id: str) -> str:
+        return f"job_items:{execution_id}"
+
+    async def heartbeat(self, ttl: float):
+        """续期当前worker的存活租约"""
+        await self.state.acquire_lease(_worker_lease(self.worker_id), self.worker_id, ttl)
+
+    async def retire(self):
+        await self.state.release_lease(_worker_lease(self.worker_id), self.worker_id)
+
+    async def start(
+        self,
+        execution_id: str,
+        test_plan: TestPlan,
+        completed: Optional[List[TestResult]] = None,
+        schedule: Optional[List[Dict[str, Any]]] = None,
+        concurrency: int = 1
+    ):
+        """登记一次执行（或继续执行），已完成的结果计入进度
+
+        传入TestEngine.plan_schedule的结果时按执行顺序排列项目，并记录每项的预计时长用于预测ETA。
+        """
+        if schedule is None:
+            schedule = [
+                {"item": item, "estimate": None, "exclusive": False} for item in test_plan.test_items if item.enabled
+            ]
+        items = {
+            entry["item"].id: {
+                "name": entry["item"].name,
+                "status": TestStatus.PENDING.value,
+                "progress": 0,
+                "result": None,
+                "order": index,
+                "estimate": entry["estimate"],
+                "exclusive": entry["exclusive"]
+            }
+            for index, entry in enumerate(schedule)
+        }
+        await self.state.clear(self._items_namespace(execution_id))
+        await self.state.set_many(self._items_namespace(execution_id), items, JOB_HISTORY_TTL)
+        job = {
+            "execution_id": execution_id,
+            "test_plan_id": test_plan.id,
+            "test_plan_name": test_plan.name,
+            "hostname": test_plan.system_info.hostname,
+            "state": "running",
+            "owner": self.worker_id,
+            "total": len(items),
+            "concurrency": concurrency,
+            "completed": 0,
+            "passed": 0,
+            "failed": 0,
+            "started_at": datetime.now().isoformat(),
+            "updated_at": datetime.now().isoformat()
+        }
+        await self.state.set(JOBS_NAMESPACE, execution_id, job, JOB_HISTORY_TTL)
+        for result in completed or []:
+            await self.record_result(execution_id, result)
+
+    async def record_result(self, execution_id: str, result: TestResult):
+        """记录一个测试结果，更新逐项进度和任务计数"""
+        lock = self._locks.setdefault(execution_id, asyncio.Lock())
+        async with lock:
+            job = await self.state.get(JOBS_NAMESPACE, execution_id)
+            if job is None:
+                return
+            passed = result.status == TestStatus.COMPLETED
+            namespace = self._items_namespace(execution_id)
+            # 按拓扑放置拆分出的结果不在计划项目中，排在最后
+            existing = await self.state.get(namespace, result.test_item_id)
+            await self.state.set(namespace, result.test_item_id, {
+                **(existing or {}),
+                "name": result.test_item_name,
+                "status": result.status.value,
+                "progress": 100,
+                "result": "通过" if passed else ("跳过" if result.status == TestStatus.SKIPPED else "失败"),
+                "order": existing["order"] if existing else job["total"] + job["completed"],
+                "duration": result.duration
+            }, JOB_HISTORY_TTL)
+            job["completed"] += 1
+            if passed:
+                job["passed"] += 1
+            elif result.status != TestStatus.SKIPPED:
+                job["failed"] += 1
+            job["updated_at"] = datetime.now().isoformat()
+            await self.state.set(JOBS_NAMESPACE, execution_id, job, JOB_HISTORY_TTL)
+
+    async def set_item_state(self, execution_id: str, item_id: str, state: str):
+        """计划项目开始（running）或结束（done）
+
+        按拓扑拆分执行的项目没有同名结果，结束时在这里标记为完成。
+        """
+        namespace = self._items_namespace(execution_id)
+        item = await self.state.get(namespace, item_id)
+        if item is None:
+            return
+        if state == "running":
+            item.update(status=TestStatus.RUNNING.value, started_at=time.time())
+        elif item["status"] in (TestStatus.PENDING.value, TestStatus.RUNNING.value):
+            item.update(status=TestStatus.COMPLETED.value, progress=100, result="已拆分执行")
+        else:
+            return
+        await self.state.set(namespace, item_id, item, JOB_HISTORY_TTL)
+
+    async def eta(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        """按剩余项目的预计时长预测完成时间，执行中的项目扣除已运行的时间"""
+        job = await self.get(execution_id, include_items=True)
+        if job is None:
+            return None
+        now = time.time()
+        remaining = []
+        for item in job["items"]:
+            if item.get("estimate") is None:
+                continue
+            if item["status"] == TestStatus.PENDING.value:
+                remaining.append((item["estimate"], item["exclusive"]))
+            elif item["status"] == TestStatus.RUNNING.value:
+                # 已超出预计时长的项目按即将完成处理
+                remaining.append((max(0.0, item["estimate"] - (now - item["started_at"])), item["exclusive"]))
+        remaining_seconds = predict(remaining, job.get("concurrency", 1)) if job["state"] == "running" else 0.0
+        # 已结束的任务按最后一次更新计算耗时
+        ended = datetime.now() if job["state"] in ACTIVE_STATES else datetime.fromisoformat(job["updated_at"])
+        elapsed = (ended - datetime.fromisoformat(job["started_at"])).total_seconds()
+        return {
+            "execution_id": execution_id,
+            "state": job["state"],
+            "completed": job["completed"],
+            "total": job["total"],
+            "elapsed_seconds": round(elapsed, 3),
+            "remaining_seconds": round(remaining_seconds, 3),
+            "estimated_completion": (datetime.now() + timedelta(seconds=remaining_seconds)).isoformat()
+        }
+
+    async def set_state(self, execution_id: str, state: str):
+        """更新任务状态: running, analyzing, completed, failed, interrupted"""
+        lock = self._locks.setdefault(execution_id, asyncio.Lock())
+        async with lock:
+            job = await self.state.get(JOBS_NAMESPACE, execution_id)
+            if job is None:
+                return
+            job["state"] = state
+            job["updated_at"] = datetime.now().isoformat()
+            await self.state.set(JOBS_NAMESPACE, execution_id, job, JOB_HISTORY_TTL)
+        if state not in ACTIVE_STATES:
+            self._locks.pop(execution_id, None)
+
+    async def get(self, execution_id: str, include_items: bool = False) -> Optional[Dict[str, Any]]:
+        job = await self.state.get(JOBS_NAMESPACE, execution_id)
+        if job is not None and include_items:
+            items = await self.state.items(self._items_namespace(execution_id))
+            job["items"] = sorted((dict(item, id=item_id) for item_id, item in items.items()),
+                                  key=lambda item: item["order"])
+        return job
+
+    async def list_jobs(self) -> List[Dict[str, Any]]:
+        """按开始时间倒序列出任务"""
+        jobs = list((await self.state.items(JOBS_NAMESPACE)).values())
+        for job in jobs:
+            job["active"] = await self._owner_alive(job) and job["state"] in ACTIVE_STATES
+        return sorted(jobs, key=lambda job: job["started_at"], reverse=True)
+
+    async def _owner_alive(self, job: Dict[str, Any]) -> bool:
+        owner = job.get("owner")
+        if owner == self.worker_id:
+            return True
+        return await self.state.lease_owner(_worker_lease(owner)) == owner
+
+    async def is_active(self, execution_id: str) -> bool:
+        """任务处于执行或分析中，且所属worker仍然存活"""
+        job = await self.state.get(JOBS_NAMESPACE, execution_id)
+        if job is None or job["state"] not in ACTIVE_STATES:
+            return False
+        return await self._owner_alive(job)
@@ -0,0 +1,293 @@
+import os
+import glob
+import time
+from typing import Dict, List, Any, Optional
+
+# Linux下直接读取 /proc 和 /sys 获取系统信息，不启动任何子进程
+
+PROC_ROOT = "/proc"
+SYS_ROOT = "/sys"
+
+
+def read_text(path: str, default: Optional[str] = None) -> Optional[str]:
+    """读取文本文件并去除首尾空白，读取失败时返回default"""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read().strip()
+    except (OSError, ValueError):
+        return default
+
+
+def read_int(path: str, default: Optional[int] = None) -> Optional[int]:
+    """读取只包含整数的文件"""
+    value = read_text(path)
+    try:
+        return int(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+def parse_cpu_list(cpu_list: Optional[str]) -> List[int]:
+    """解析形如 0-3,8,10-11 的CPU列表"""
+    cpus = []
+    if not cpu_list:
+        return cpus
+    for part in cpu_list.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def parse_size(value: Optional[str]) -> Optional[int]:
+    """解析sysfs中形如 32K、1024K、8M 的容量为字节数"""
+    if not value:
+        return None
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip()
+    try:
+        if value[-1].upper() in units:
+            return int(value[:-1]) * units[value[-1].upper()]
+        return int(value)
+    except (ValueError, IndexError):
+        return None
+
+
+def read_cpuinfo() -> List[Dict[str, str]]:
+    """解析 /proc/cpuinfo，每个逻辑CPU一个字典"""
+    content = read_text(os.path.join(PROC_ROOT, "cpuinfo"), "")
+    processors = []
+    for block in content.split("\n\n"):
+        entry = {}
+        for line in block.splitlines():
+            if ':' not in line:
+                continue
+            key, value = line.split(':', 1)
+            entry[key.strip()] = value.strip()
+        if entry:
+            processors.append(entry)
+    return processors
+
+
+def read_meminfo() -> Dict[str, int]:
+    """解析 /proc/meminfo，数值统一换算为字节"""
+    content = read_text(os.path.join(PROC_ROOT, "meminfo"), "")
+    meminfo = {}
+    for line in content.splitlines():
+        if ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        parts = value.split()
+        if not parts:
+            continue
+        try:
+            amount = int(parts[0])
+        except ValueError:
+            continue
+        if len(parts) > 1 and parts[1].lower() == 'kb':
+            amount *= 1024
+        meminfo[key.strip()] = amount
+    return meminfo
+
+
+def read_os_release() -> Dict[str, str]:
+    """解析 /etc/os-release"""
+    content = read_text("/etc/os-release") or read_text("/usr/lib/os-release", "")
+    release = {}
+    for line in content.splitlines():
+        if '=' not in line or line.startswith('#'):
+            continue
+        key, value = line.split('=', 1)
+        release[key.strip()] = value.strip().strip('"')
+    return release
+
+
+def read_boot_time() -> Optional[float]:
+    """从 /proc/stat 读取启动时间戳"""
+    content = read_text(os.path.join(PROC_ROOT, "stat"), "")
+    for line in content.splitlines():
+        if line.startswith("btime "):
+            return float(line.split()[1])
+    return None
+
+
+def read_uptime() -> Optional[float]:
+    """读取系统运行时间（秒）"""
+    content = read_text(os.path.join(PROC_ROOT, "uptime"))
+    return float(content.split()[0]) if content else None
+
+
+def read_loadavg() -> Optional[List[float]]:
+    """读取1/5/15分钟平均负载"""
+    content = read_text(os.path.join(PROC_ROOT, "loadavg"))
+    return [float(value) for value in content.split()[:3]] if content else None
+
+
+def list_cpus() -> List[int]:
+    """列出在线的逻辑CPU编号"""
+    online = read_text(os.path.join(SYS_ROOT, "devices/system/cpu/online"))
+    if online:
+        return parse_cpu_list(online)
+    paths = glob.glob(os.path.join(SYS_ROOT, "devices/system/cpu/cpu[0-9]*"))
+    return sorted(int(os.path.basename(path)[3:]) for path in paths)
+
+
+def read_cpu_caches(cpu: int = 0) -> List[Dict[str, Any]]:
+    """读取指定CPU的缓存层级信息"""
+    caches = []
+    base = os.path.join(SYS_ROOT, f"devices/system/cpu/cpu{cpu}/cache")
+    for index_dir in sorted(glob.glob(os.path.join(base, "index[0-9]*"))):
+        caches.append({
+            "level": read_int(os.path.join(index_dir, "level")),
+            "type": read_text(os.path.join(index_dir, "type")),
+            "size": parse_size(read_text(os.path.join(index_dir, "size"))),
+            "ways_of_associativity": read_int(os.path.join(index_dir, "ways_of_associativity")),
+            "coherency_line_size": read_int(os.path.join(index_dir, "coherency_line_size")),
+            "shared_cpu_list": read_text(os.path.join(index_dir, "shared_cpu_list"))
+        })
+    return caches
+
+
+def read_cpu_topology() -> Dict[str, Any]:
+    """读取每个逻辑CPU的socket/core编号以及系统内所有缓存实例"""
+    cpus = []
+    caches = {}
+    for cpu in list_cpus():
+        base = os.path.join(SYS_ROOT, f"devices/system/cpu/cpu{cpu}/topology")
+        cpus.append({
+            "cpu": cpu,
+            "socket": read_int(os.path.join(base, "physical_package_id"), 0),
+            "core_id": read_int(os.path.join(base, "core_id"), cpu),
+            "thread_siblings": parse_cpu_list(read_text(os.path.join(base, "thread_siblings_list")))
+        })
+        # 相同shared_cpu_list的缓存是同一个实例，按(level, type, shared_cpu_list)去重
+        for cache in read_cpu_caches(cpu):
+            key = (cache["level"], cache["type"], cache["shared_cpu_list"])
+            caches.setdefault(key, cache)
+    return {"cpus": cpus, "caches": list(caches.values())}
+
+
+def read_cpu_frequencies() -> Dict[int, Dict[str, Any]]:
+    """读取各逻辑CPU的cpufreq信息（kHz）"""
+    frequencies = {}
+    for cpu in list_cpus():
+        base = os.path.join(SYS_ROOT, f"devices/system/cpu/cpu{cpu}/cpufreq")
+        if not os.path.isdir(base):
+            continue
+        frequencies[cpu] = {
+            "current_khz": read_int(os.path.join(base, "scaling_cur_freq")),
+            "min_khz": read_int(os.path.join(base, "cpuinfo_min_freq")),
+            "max_khz": read_int(os.path.join(base, "cpuinfo_max_freq")),
+            "governor": read_text(os.path.join(base, "scaling_governor"))
+        }
+    return frequencies
+
+
+def read_numa_nodes() -> List[Dict[str, Any]]:
+    """读取NUMA节点的CPU列表和内存容量"""
+    nodes = []
+    for node_dir in sorted(glob.glob(os.path.join(SYS_ROOT, "devices/system/node/node[0-9]*")),
+                           key=lambda path: int(os.path.basename(path)[4:])):
+        node_id = int(os.path.basename(node_dir)[4:])
+        cpulist = read_text(os.path.join(node_dir, "cpulist"), "")
+        memory = {}
+        for line in read_text(os.path.join(node_dir, "meminfo"), "").splitlines():
+            # 格式: Node 0 MemTotal:       32768000 kB
+            parts = line.split()
+            if len(parts) >= 4 and parts[3].isdigit():
+                scale = 1024 if parts[-1].lower() == 'kb' else 1
+                memory[parts[2].rstrip(':')] = int(parts[3]) * scale
+        nodes.append({
+            "id": node_id,
+            "cpulist": cpulist,
+            "cpus": parse_cpu_list(cpulist),
+            "memory_total": memory.get("MemTotal"),
+            "memory_free": memory.get("MemFree")
+        })
+    return nodes
+
+
+def read_block_devices() -> List[Dict[str, Any]]:
+    """读取 /sys/block 下的块设备信息（跳过loop和ram设备）"""
+    devices = []
+    for device_dir in sorted(glob.glob(os.path.join(SYS_ROOT, "block/*"))):
+        name = os.path.basename(device_dir)
+        if name.startswith(('loop', 'ram')):
+            continue
+        sectors = read_int(os.path.join(device_dir, "size"), 0)
+        scheduler = read_text(os.path.join(device_dir, "queue/scheduler"))
+        if scheduler and '[' in scheduler:
+            scheduler = scheduler[scheduler.index('[') + 1:scheduler.index(']')]
+        devices.append({
+            "name": name,
+            # /sys/block/*/size 始终以512字节扇区为单位
+            "size": sectors * 512,
+            "rotational": read_int(os.path.join(device_dir, "queue/rotational")) == 1,
+            "removable": read_int(os.path.join(device_dir, "removable")) == 1,
+            "model": read_text(os.path.join(device_dir, "device/model")),
+            "vendor": read_text(os.path.join(device_dir, "device/vendor")),
+            "scheduler": scheduler,
+            "logical_block_size": read_int(os.path.join(device_dir, "queue/logical_block_size"))
+        })
+    return devices
+
+
+def read_dmi_info() -> Dict[str, Optional[str]]:
+    """读取DMI硬件信息（部分字段需要root权限）"""
+    base = os.path.join(SYS_ROOT, "class/dmi/id")
+    return {
+        "sys_vendor": read_text(os.path.join(base, "sys_vendor")),
+        "product_name": read_text(os.path.join(base, "product_name")),
+        "product_serial": read_text(os.path.join(base, "product_serial")),
+        "bios_version": read_text(os.path.join(base, "bios_version")),
+        "board_name": read_text(os.path.join(base, "board_name"))
+    }
+
+
+def get_detailed_system_info() -> Dict[str, Any]:
+    """汇总Linux详细系统信息"""
+    cpuinfo = read_cpuinfo()
+    meminfo = read_meminfo()
+    os_release = read_os_release()
+    dmi = read_dmi_info()
+    boot_time = read_boot_time()
+
+    physical_cores = {
+        (cpu.get("physical id", "0"), cpu.get("core id", cpu.get("processor")))
+        for cpu in cpuinfo
+    }
+    sockets = {cpu.get("physical id", "0") for cpu in cpuinfo}
+    cpu_brand = next((cpu["model name"] for cpu in cpuinfo if "model name" in cpu), None)
+
+    return {
+        "os_name": os_release.get("PRETTY_NAME") or os_release.get("NAME"),
+        "os_version": os_release.get("VERSION_ID"),
+        "kernel_version": read_text(os.path.join(PROC_ROOT, "version")),
+        "hardware_vendor": dmi["sys_vendor"],
+        "hardware_model": dmi["product_name"],
+        "hardware_serial": dmi["product_serial"],
+        "bios_version": dmi["bios_version"],
+        "cpu_brand": cpu_brand,
+        "cpu_cores": len(list_cpus()) or len(cpuinfo),
+        "cpu_physical_cores": len(physical_cores),
+        "cpu_sockets": len(sockets),
+        "cpu_flags": cpuinfo[0].get("flags", "").split() if cpuinfo else [],
+        "cpu_caches": read_cpu_caches(0),
+        "cpu_frequencies": read_cpu_frequencies(),
+        "numa_nodes": read_numa_nodes(),
+        "memory_size": meminfo.get("MemTotal"),
+        "memory": {
+            key: meminfo.get(key)
+            for key in ["MemTotal", "MemFree", "MemAvailable", "Buffers", "Cached",
+                        "SwapTotal", "SwapFree", "HugePages_Total", "Hugepagesize"]
+        },
+        "block_devices": read_block_devices(),
+        "boot_time": boot_time,
+        "uptime": read_uptime() or (time.time() - boot_time if boot_time else None),
+        "load_average": read_loadavg()
+    }
@@ -1,123 +1,138 @@
 import os
-import json
 import asyncio
-import aiohttp
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Callable, Awaitable, AsyncIterator
 from datetime import datetime
 from models.schemas import SystemInfo, TestPlan, TestItem, TestExecutionResult, TestResult, LLMConfig, TestCategory
+from core.probes import list_probes
+from core.llm_providers import LLMProvider, ProviderHTTPError, create_provider, default_base_url
+from core.llm_routing import LLMRouter, DEFAULT_ROUTE
+from core.blob_store import AnalysisCache
+from core.plan_parser import IncrementalPlanParser, PlanParseError, parse_plan_json
+from core.tracing import tracer
+from core.logger import get_logger, register_secret, log_payload, fields
+
+logger = get_logger("llm")
 
 class LLMClient:
-    """LLM客户端，用于与自定义API交互"""
+    """LLM客户端，通过可插拔的provider调用OpenAI兼容接口、本地推理服务或mock"""
     
-    def __init__(self, config: Optional[LLMConfig] = None):
+    def __init__(self, config: Optional[LLMConfig] = None, provider: Optional[LLMProvider] = None):
         self.config = config or self._load_config()
-        self._setup_client()
-        # 添加连接池和超时设置
-        self._session = None
-        self._timeout = aiohttp.ClientTimeout(total=60, connect=10)
+        register_secret(self.config.api_key)
+        self.provider = provider or create_provider(self.config)
+        # 按调用类型（plan/analysis/summary）和提示词大小选择模型、端点和并发池
+        self.router = LLMRouter.from_env(self.config, self.provider)
+        logger.info("LLM provider selected", extra=fields(provider=self.provider.name, model=self.config.model))
+        for name, route in self.router.routes.items():
+            if route.name != DEFAULT_ROUTE:
+                logger.info("LLM route configured", extra=fields(route=name, **route.describe()))
     
     def _load_config(self) -> LLMConfig:
-        """从环境变量加载配置"""
-        api_key = os.getenv("LLM_API_KEY")
-        if not api_key:
-            raise ValueError("LLM_API_KEY environment variable is required. Please set it in your config.env file.")
-        
+        """从环境变量加载配置，缺少API Key时不报错，在第一次调用需要Key的provider时才报错"""
+        provider = os.getenv("LLM_PROVIDER", "火山引擎")
         return LLMConfig(
-            provider=os.getenv("LLM_PROVIDER", "火山引擎"),
+            provider=provider,
             model=os.getenv("LLM_MODEL", "doubao-seed-1-6-flash-250615"),
-            api_key=api_key,
-            base_url=os.getenv("LLM_BASE_URL", "https://ark.cn-beijing.volces.com/api/v3"),
+            api_key=os.getenv("LLM_API_KEY") or None,
+            base_url=os.getenv("LLM_BASE_URL") or default_base_url(provider),
             max_tokens=int(os.getenv("LLM_MAX_TOKENS", "4000")),
             temperature=float(os.getenv("LLM_TEMPERATURE", "0.7"))
         )
     
-    def _setup_client(self):
-        """设置API客户端"""
-        if not self.config.api_key:
-            raise ValueError("LLM API key is required")
-        
-        if not self.config.base_url:
-            raise ValueError("LLM base URL is required")
+    @staticmethod
+    def _request_status(provider: LLMProvider) -> str:
+        status = getattr(provider, "last_status", None)
+        return str(status) if status is not None else "ok"
     
-    async def _get_session(self) -> aiohttp.ClientSession:
-        """获取或创建HTTP会话，实现连接池管理"""
-        if self._session is None or self._session.closed:
-            connector = aiohttp.TCPConnector(limit=10, limit_per_host=5)
-            self._session = aiohttp.ClientSession(
-                connector=connector,
-                timeout=self._timeout
-            )
-        return self._session
-    
-    async def _call_llm(self, prompt: str) -> str:
-        """调用LLM API"""
-        print("[LLM] _call_llm called")
-        print("[LLM] Requesting LLM API at:", self.config.base_url)
+    @tracer.traced("llm.call")
+    async def _call_llm(self, prompt: str, call_type: str = DEFAULT_ROUTE) -> str:
+        """调用LLM，call_type决定使用的路由"""
+        route = self.router.route(call_type, prompt)
+        provider, model = route.provider, route.config.model
+        span = tracer.current_span()
+        span.set_attributes(route=route.name, provider=provider.name, model=model, prompt_chars=len(prompt))
         try:
-            url = f"{self.config.base_url}/chat/completions"
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.config.api_key}"
-            }
-            payload = {
-                "model": self.config.model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "你是一个专业的系统测试工程师，擅长分析系统信息和测试结果。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "max_tokens": self.config.max_tokens,
-                "temperature": self.config.temperature
-            }
-            print("[LLM] Request URL:", url)
-            print("[LLM] Request payload:", json.dumps(payload, ensure_ascii=False))
+            async with route.semaphore:
+                logger.debug("LLM request", extra=fields(route=route.name, provider=provider.name, model=model,
+                                                         prompt_chars=len(prompt)))
+                log_payload(logger, "LLM request prompt", prompt)
+                
+                result, usage = await provider.complete(
+                    prompt, model, route.config.max_tokens, route.config.temperature
+                )
+                status = self._request_status(provider)
             
-            # 使用连接池管理的会话
-            session = await self._get_session()
-            async with session.post(url, headers=headers, json=payload) as response:
-                print(f"[LLM] Response status: {response.status}")
-                response_text = await response.text()
-                print(f"[LLM] Raw response text: {response_text}")
-                if response.status != 200:
-                    raise Exception(f"API request failed with status {response.status}: {response_text}")
-                data = json.loads(response_text)
-                if 'choices' in data and len(data['choices']) > 0:
-                    result = data['choices'][0]['message']['content'].strip()
-                    print("[LLM] Parsed LLM result:", result)
-                    return result
-                else:
-                    raise Exception("Invalid response format from API")
+            logger.debug("LLM response", extra=fields(response_chars=len(result)))
+            log_payload(logger, "LLM raw response", result)
+            span.set_attribute("status", status)
+            tracer.inc("llm_requests_total", help_text="LLM API requests by status",
+                       route=route.name, provider=provider.name, model=model, status=status)
+            self._record_usage(usage, model)
+            return result
         except asyncio.TimeoutError:
-            print("[LLM] Request timeout")
+            tracer.inc("llm_requests_total", help_text="LLM API requests by status",
+                       route=route.name, provider=provider.name, model=model, status="timeout")
+            logger.warning("LLM request timeout", extra=fields(route=route.name, model=model))
             raise Exception("LLM API request timeout")
         except Exception as e:
-            print("[LLM] Exception in _call_llm:", str(e))
+            status = str(e.status) if isinstance(e, ProviderHTTPError) else "error"
+            tracer.inc("llm_requests_total", help_text="LLM API requests by status",
+                       route=route.name, provider=provider.name, model=model, status=status)
+            logger.error("LLM call failed", extra=fields(route=route.name, model=model, error=str(e)))
             raise Exception(f"LLM API call failed: {str(e)}")
     
+    async def _stream_llm(self, prompt: str, call_type: str = DEFAULT_ROUTE) -> AsyncIterator[str]:
+        """流式调用LLM，逐段产出增量文本"""
+        route = self.router.route(call_type, prompt)
+        provider, model = route.provider, route.config.model
+        with tracer.span("llm.stream", route=route.name, provider=provider.name, model=model,
+                         prompt_chars=len(prompt)) as span:
+            logger.debug("LLM stream request", extra=fields(route=route.name, provider=provider.name, model=model,
+                                                            prompt_chars=len(prompt)))
+            completion_chars = 0
+            try:
+                async with route.semaphore:
+                    async for chunk in provider.stream(
+                        prompt, model, route.config.max_tokens, route.config.temperature
+                    ):
+                        completion_chars += len(chunk)
+                        yield chunk
+            except asyncio.TimeoutError:
+                logger.warning("LLM stream timeout", extra=fields(route=route.name, model=model))
+                raise Exception("LLM API request timeout")
+            finally:
+                span.set_attribute("completion_chars", completion_chars)
+            tracer.inc("llm_requests_total", help_text="LLM API requests by status",
+                       route=route.name, provider=provider.name, model=model, status=self._request_status(provider))
+    
+    def _record_usage(self, usage: Dict[str, Any], model: str):
+        """把API返回的token用量记录到当前span和指标中"""
+        span = tracer.current_span()
+        for kind in ['prompt', 'completion']:
+            tokens = usage.get(f"{kind}_tokens")
+            if tokens is not None:
+                span.set_attribute(f"{kind}_tokens", tokens)
+                tracer.inc("llm_tokens_total", tokens, help_text="LLM tokens consumed",
+                           model=model, type=kind)
+    
+    @tracer.traced("llm.generate_test_plan")
     async def generate_test_plan(self, system_info: SystemInfo) -> TestPlan:
         """根据系统信息生成测试计划"""
         try:
-            print("[LLM] Building prompt for test plan...")
             prompt = self._build_test_plan_prompt(system_info)
-            print("[LLM] Prompt:", prompt)
-            response = await self._call_llm(prompt)
-            print("[LLM] LLM response:", response)
+            log_payload(logger, "Test plan prompt", prompt)
+            response = await self._call_llm(prompt, "plan")
             test_plan = self._parse_test_plan_response(response, system_info)
-            print("[LLM] Parsed test plan:", test_plan)
+            logger.info("Test plan generated", extra=fields(plan_id=test_plan.id, test_items=len(test_plan.test_items)))
             return test_plan
         except Exception as e:
-            print("[LLM] Exception in generate_test_plan:", str(e))
+            logger.error("Failed to generate test plan", extra=fields(error=str(e)))
             raise Exception(f"Failed to generate test plan: {str(e)}")
     
     def _build_test_plan_prompt(self, system_info: SystemInfo) -> str:
         """构建测试计划生成提示词"""
         return f"""
-你是一个专业的系统测试工程师，需要为以下macOS系统生成一个全面的测试计划。
+你是一个专业的系统测试工程师，需要为以下{system_info.system}系统生成一个全面的测试计划。
 
 系统信息：
 - 平台: {system_info.platform}
@@ -125,6 +140,7 @@ class LLMClient:
 - 版本: {system_info.release}
 - 处理器: {system_info.processor}
 - CPU核心数: {system_info.cpu_count}
+- CPU拓扑: {self._describe_topology(system_info)}
 - 内存: {system_info.memory_total // (1024**3)} GB
 - 主机名: {system_info.hostname}
 - 用户名: {system_info.username}
@@ -145,11 +161,15 @@ class LLMClient:
 - 预期输出
 - 超时时间（秒）
 - 优先级（1-5，5最高）
+- 可选的原生探针ID（probe），可用的探针有：{', '.join(list_probes())}。
+  使用探针时将在进程内直接采集数据，command作为探针不可用时的回退命令
+- 可选的拓扑放置方式（placement）：per_core 在每个物理核心上分别绑定执行，
+  per_numa_node 在每个NUMA节点上分别绑定执行，适用于需要比较各核心/节点算力的测试
 
 请以JSON格式返回，格式如下：
 {{
-    "name": "macOS系统全面测试计划",
-    "description": "针对当前macOS系统的全面测试计划",
+    "name": "{system_info.system}系统全面测试计划",
+    "description": "针对当前{system_info.system}系统的全面测试计划",
     "test_items": [
         {{
             "id": "unique_id",
@@ -159,73 +179,146 @@ class LLMClient:
             "command": "要执行的命令",
             "expected_output": "预期输出描述",
             "timeout": 30,
-            "priority": 1
+            "priority": 1,
+            "probe": "可选，原生探针ID",
+            "placement": "可选，none|per_core|per_numa_node"
         }}
     ]
 }}
 """
     
+    def _describe_topology(self, system_info: SystemInfo) -> str:
+        """生成CPU拓扑的简短描述"""
+        topology = system_info.cpu_topology
+        if not topology:
+            return "未知"
+        return (f"{topology.sockets} 个Socket, {topology.physical_cores} 个物理核心, "
+                f"{topology.logical_cpus} 个逻辑CPU, {len(topology.numa_nodes)} 个NUMA节点")
+    
     def _parse_test_plan_response(self, response: str, system_info: SystemInfo) -> TestPlan:
-        """解析LLM返回的测试计划"""
+        """解析LLM返回的测试计划，容忍前后的说明文字，输出被截断时恢复已完整的测试项目"""
         try:
-            if response.startswith('```json'):
-                response = response.replace('```json', '').replace('```', '').strip()
-            elif response.startswith('```'):
-                response = response.replace('```', '').strip()
-            
-            data = json.loads(response)
+            data, complete = parse_plan_json(response)
+            if not complete:
+                logger.warning("Test plan response truncated, recovered complete items",
+                               extra=fields(recovered_items=len(data.get('test_items', []))))
+            tracer.inc("plan_parse_total", help_text="Parsed test plan responses by outcome",
+                       result="complete" if complete else "recovered")
             
             test_items = []
             for i, item_data in enumerate(data.get('test_items', [])):
-                try:
-                    # 验证类别是否有效
-                    category = item_data.get('category', 'custom')
-                    if category not in [cat.value for cat in TestCategory]:
-                        print(f"[LLM] Warning: Invalid category '{category}' for test item {i}, using 'custom' instead")
-                        category = 'custom'
-                    
-                    test_item = TestItem(
-                        id=item_data.get('id', f"test_{len(test_items)}"),
-                        name=item_data.get('name', ''),
-                        description=item_data.get('description', ''),
-                        category=category,
-                        command=item_data.get('command', ''),
-                        expected_output=item_data.get('expected_output'),
-                        timeout=item_data.get('timeout', 30),
-                        priority=item_data.get('priority', 1)
-                    )
+                test_item = self._build_test_item(item_data, i, len(test_items))
+                if test_item is not None:
                     test_items.append(test_item)
-                except Exception as e:
-                    print(f"[LLM] Error parsing test item {i}: {str(e)}")
-                    print(f"[LLM] Test item data: {item_data}")
-                    continue
             
-            test_plan = TestPlan(
-                id=f"plan_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                name=data.get('name', '系统测试计划'),
-                description=data.get('description', ''),
-                system_info=system_info,
-                test_items=test_items
-            )
+            return self._build_test_plan(data, test_items, system_info)
             
-            return test_plan
-            
-        except json.JSONDecodeError as e:
+        except PlanParseError as e:
+            tracer.inc("plan_parse_total", help_text="Parsed test plan responses by outcome", result="failed")
             raise Exception(f"Failed to parse LLM response as JSON: {str(e)}")
         except Exception as e:
             raise Exception(f"Failed to parse test plan: {str(e)}")
     
-    async def analyze_test_results(self, test_results: TestExecutionResult) -> TestExecutionResult:
-        """分析测试结果并生成总结"""
+    def _build_test_item(self, item_data: Dict[str, Any], index: int, position: int) -> Optional[TestItem]:
+        """把LLM返回的单个测试项目转换为TestItem，无法解析时返回None"""
+        try:
+            # 验证类别是否有效
+            category = item_data.get('category', 'custom')
+            if category not in [cat.value for cat in TestCategory]:
+                logger.warning("Invalid test item category, using 'custom' instead",
+                               extra=fields(index=index, category=category))
+                category = 'custom'
+            
+            return TestItem(
+                id=item_data.get('id', f"test_{position}"),
+                name=item_data.get('name', ''),
+                description=item_data.get('description', ''),
+                category=category,
+                command=item_data.get('command', ''),
+                expected_output=item_data.get('expected_output'),
+                timeout=item_data.get('timeout', 30),
+                priority=item_data.get('priority', 1),
+                probe=item_data.get('probe') or None,
+                placement=item_data.get('placement') or None
+            )
+        except Exception as e:
+            logger.warning("Error parsing test item", extra=fields(index=index, error=str(e)))
+            log_payload(logger, "Unparsable test item", item_data)
+            return None
+    
+    @staticmethod
+    def _build_test_plan(data: Dict[str, Any], test_items: List[TestItem], system_info: SystemInfo) -> TestPlan:
+        return TestPlan(
+            id=f"plan_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            name=data.get('name') or '系统测试计划',
+            description=data.get('description') or '',
+            system_info=system_info,
+            test_items=test_items
+        )
+    
+    async def generate_test_plan_stream(self, system_info: SystemInfo) -> AsyncIterator[Dict[str, Any]]:
+        """流式生成测试计划
+
+        每当响应中的一个测试项目完整到达就产出 {"type": "item", "item": TestItem}，
+        结束时产出 {"type": "plan", "plan": TestPlan, "complete": bool}。
+        """
+        with tracer.span("llm.generate_test_plan_stream") as span:
+            prompt = self._build_test_plan_prompt(system_info)
+            log_payload(logger, "Test plan prompt", prompt)
+            parser = IncrementalPlanParser()
+            test_items: List[TestItem] = []
+            
+            async for chunk in self._stream_llm(prompt, "plan"):
+                for item_data in parser.feed(chunk):
+                    test_item = self._build_test_item(item_data, len(parser.items) - 1, len(test_items))
+                    if test_item is not None:
+                        test_items.append(test_item)
+                        yield {"type": "item", "item": test_item}
+            
+            try:
+                data, complete = parser.finish()
+            except PlanParseError as e:
+                tracer.inc("plan_parse_total", help_text="Parsed test plan responses by outcome", result="failed")
+                raise Exception(f"Failed to parse LLM response as JSON: {str(e)}")
+            tracer.inc("plan_parse_total", help_text="Parsed test plan responses by outcome",
+                       result="complete" if complete else "recovered")
+            span.set_attributes(test_items=len(test_items), complete=complete)
+            
+            test_plan = self._build_test_plan(data, test_items, system_info)
+            logger.info("Test plan streamed", extra=fields(plan_id=test_plan.id, test_items=len(test_items), complete=complete))
+            yield {"type": "plan", "plan": test_plan, "complete": complete}
+    
+    @tracer.traced("llm.analyze_test_results")
+    async def analyze_test_results(
+        self,
+        test_results: TestExecutionResult,
+        on_analyzed: Optional[Callable[[TestResult], Awaitable[None]]] = None,
+        cache: Optional[AnalysisCache] = None
+    ) -> TestExecutionResult:
+        """分析测试结果并生成总结
+
+        单项分析在analysis路由的并发池内并行执行，已有分析的结果（从检查点恢复）不再重复分析；
+        内容相同（名称、状态、退出码和原始日志一致）的结果只分析一次，设置了cache时还会复用
+        其他主机或之前执行的分析。单项失败不会中断其他分析，全部结束后再抛出第一个错误，
+        已完成的分析都已通过on_analyzed保存。
+        """
         try:
+            groups: Dict[str, List[TestResult]] = {}
             for test_result in test_results.test_results:
-                if test_result.raw_log:
-                    analysis_prompt = self._build_analysis_prompt(test_result)
-                    analysis = await self._call_llm(analysis_prompt)
-                    test_result.analyzed_summary = analysis
+                if test_result.raw_log and not test_result.analyzed_summary:
+                    groups.setdefault(AnalysisCache.key_for(test_result), []).append(test_result)
+            outcomes = await asyncio.gather(
+                *(self._analyze_group(key, results, on_analyzed, cache) for key, results in groups.items()),
+                return_exceptions=True
+            )
+            errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+            if errors:
+                logger.error("Per-test analysis failed", extra=fields(failed=len(errors), total=len(groups)))
+                raise errors[0]
             
             overall_prompt = self._build_overall_summary_prompt(test_results)
-            overall_summary = await self._call_llm(overall_prompt)
+            with tracer.span("llm.overall_summary", execution_id=test_results.execution_id):
+                overall_summary = await self._call_llm(overall_prompt, "summary")
             test_results.overall_summary = overall_summary
             
             return test_results
@@ -233,6 +326,27 @@ class LLMClient:
         except Exception as e:
             raise Exception(f"Failed to analyze test results: {str(e)}")
     
+    async def _analyze_group(
+        self,
+        key: str,
+        results: List[TestResult],
+        on_analyzed: Optional[Callable[[TestResult], Awaitable[None]]],
+        cache: Optional[AnalysisCache]
+    ):
+        """分析一组内容相同的结果，分析一次后共用"""
+        first = results[0]
+        analysis = await cache.get(key) if cache is not None else None
+        if analysis is None:
+            with tracer.span("llm.analyze_test", test_id=first.test_item_id, duplicates=len(results)):
+                analysis_prompt = self._build_analysis_prompt(first)
+                analysis = await self._call_llm(analysis_prompt, "analysis")
+            if cache is not None:
+                await cache.put(key, analysis)
+        for test_result in results:
+            test_result.analyzed_summary = analysis
+            if on_analyzed is not None:
+                await on_analyzed(test_result)
+    
     def _build_analysis_prompt(self, test_result: TestResult) -> str:
         """构建单个测试结果分析提示词"""
         return f"""
@@ -295,6 +409,5 @@ class LLMClient:
 """
     
     async def close(self):
-        """关闭HTTP会话"""
-        if self._session and not self._session.closed:
-            await self._session.close()
+        """关闭所有路由provider持有的连接"""
+        await self.router.close()
@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import aiohttp
+from abc import ABC, abstractmethod
+from aiohttp import web
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from models.schemas import LLMConfig
+from core.probes import list_probes
+
+DEFAULT_SYSTEM_PROMPT = "你是一个专业的系统测试工程师，擅长分析系统信息和测试结果。"
+
+
+class LLMProvider(ABC):
+    """LLM后端接口
+
+    complete返回(文本, token用量)，stream逐段产出增量文本。
+    """
+
+    name = "base"
+    # 未配置base_url时使用的地址
+    default_base_url: Optional[str] = None
+
+    def __init__(self, config: LLMConfig):
+        self.config = config
+
+    @abstractmethod
+    async def complete(self, prompt: str, model: str, max_tokens: int, temperature: float) -> Tuple[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stream(self, prompt: str, model: str, max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class ProviderHTTPError(Exception):
+    """LLM API返回非200状态"""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f"API request failed with status {status}: {body}")
+        self.status = status
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """OpenAI兼容的 /chat/completions HTTP接口"""
+
+    name = "openai_compatible"
+    default_base_url = "https://ark.cn-beijing.volces.com/api/v3"
+    requires_api_key = True
+
+    def __init__(self, config: LLMConfig, timeout: Optional[aiohttp.ClientTimeout] = None):
+        super().__init__(config)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._timeout = timeout or aiohttp.ClientTimeout(total=60, connect=10)
+        # 最近一次请求的HTTP状态，供调用方记录指标
+        self.last_status: Optional[int] = None
+
+    def _check_config(self):
+        """在第一次调用时校验配置，缺少配置不影响服务启动"""
+        if self.requires_api_key and not self.config.api_key:
+            raise ValueError("LLM_API_KEY is required for this provider. Please set it in your config.env file.")
+        if not self.config.base_url:
+            raise ValueError("LLM base URL is required")
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """获取或创建HTTP会话，实现连接池管理"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=10, limit_per_host=5)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+        return self._session
+
+    def _build_request(self, prompt: str, model: str, max_tokens: int, temperature: float, stream: bool = False):
+        """构建chat/completions请求的URL、请求头和请求体"""
+        url = f"{self.config.base_url.rstrip('/')}/chat/completions"
+        headers = {"Content-Type": "application/json"}
+        if self.config.api_key:
+            headers["Authorization"] = f"Bearer {self.config.api_key}"
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": self.config.system_prompt or DEFAULT_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if stream:
+            payload["stream"] = True
+        return url, headers, payload
+
+    async def complete(self, prompt: str, model: str, max_tokens: int, temperature: float) -> Tuple[str, Dict[str, Any]]:
+        self._check_config()
+        url, headers, payload = self._build_request(prompt, model, max_tokens, temperature)
+        session = await self._get_session()
+        async with session.post(url, headers=headers, json=payload) as response:
+            response_text = await response.text()
+            self.last_status = response.status
+            if response.status != 200:
+                raise ProviderHTTPError(response.status, response_text)
+            data = json.loads(response_text)
+            if 'choices' in data and len(data['choices']) > 0:
+                return data['choices'][0]['message']['content'].strip(), data.get('usage') or {}
+            raise Exception("Invalid response format from API")
+
+    async def stream(self, prompt: str, model: str, max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        self._check_config()
+        url, headers, payload = self._build_request(prompt, model, max_tokens, temperature, stream=True)
+        session = await self._get_session()
+        async with session.post(url, headers=headers, json=payload) as response:
+            self.last_status = response.status
+            if response.status != 200:
+                raise ProviderHTTPError(response.status, await response.text())
+            async for raw_line in response.content:
+                line = raw_line.decode('utf-8', errors='replace').strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    event = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                for choice in event.get('choices') or []:
+                    content = (choice.get('delta') or {}).get('content')
+                    if content:
+                        yield content
+
+    async def close(self):
+        """关闭HTTP会话"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+
+class LocalProvider(OpenAICompatibleProvider):
+    """本地推理服务（llama.cpp server、vLLM、Ollama等的OpenAI兼容接口），不需要API Key"""
+
+    name = "local"
+    default_base_url = "http://127.0.0.1:8080/v1"
+    requires_api_key = False
+
+    def __init__(self, config: LLMConfig):
+        if not config.base_url:
+            config = config.model_copy(update={"base_url": self.default_base_url})
+        # 本地模型生成较慢，放宽总超时
+        super().__init__(config, aiohttp.ClientTimeout(total=600, connect=5))
+
+
+class MockProvider(LLMProvider):
+    """确定性的本地替身，不访问网络
+
+    按提示词类型返回固定结构的内容：测试计划返回由原生探针组成的JSON计划，
+    单项分析和整体总结返回基于提示词哈希的固定文本。用于离线运行和压测服务自身。
+    """
+
+    name = "mock"
+
+    def __init__(self, config: LLMConfig):
+        super().__init__(config)
+        self.latency = float(os.getenv("LLM_MOCK_LATENCY_MS", "0")) / 1000
+        self.plan_items = int(os.getenv("LLM_MOCK_PLAN_ITEMS", "0"))
+
+    def respond(self, prompt: str) -> str:
+        """根据提示词生成确定性的响应文本"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+        if '"test_items"' in prompt:
+            return json.dumps(self._mock_plan(), ensure_ascii=False, indent=2)
+        if "全面的总结报告" in prompt:
+            return f"## 整体总结\n\n系统整体运行正常，未发现严重问题。（mock {digest}）"
+        return f"测试执行完成，输出符合预期，未发现异常。（mock {digest}）"
+
+    def _mock_plan(self) -> Dict[str, Any]:
+        probes = list_probes()
+        count = self.plan_items or len(probes)
+        items = []
+        for i in range(count):
+            probe = probes[i % len(probes)]
+            items.append({
+                "id": f"mock_{probe}_{i}" if count > len(probes) else f"mock_{probe}",
+                "name": f"Mock {probe}",
+                "description": f"Mock test using probe {probe}",
+                "category": "system_info",
+                "command": "uname -a",
+                "expected_output": "",
+                "timeout": 30,
+                "priority": 1,
+                "probe": probe
+            })
+        return {"name": "Mock测试计划", "description": "由mock provider生成的确定性测试计划", "test_items": items}
+
+    @staticmethod
+    def _usage(prompt: str, text: str) -> Dict[str, Any]:
+        # 粗略按4个字符一个token估算
+        return {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4}
+
+    async def complete(self, prompt: str, model: str, max_tokens: int, temperature: float) -> Tuple[str, Dict[str, Any]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = self.respond(prompt)
+        return text, self._usage(prompt, text)
+
+    async def stream(self, prompt: str, model: str, max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        text = self.respond(prompt)
+        chunk_size = 64
+        chunks = max(1, (len(text) + chunk_size - 1) // chunk_size)
+        for i in range(0, len(text), chunk_size):
+            if self.latency:
+                await asyncio.sleep(self.latency / chunks)
+            yield text[i:i + chunk_size]
+
+
+PROVIDERS = {
+    "mock": MockProvider,
+    "local": LocalProvider
+}
+
+
+def provider_class(provider: Optional[str]) -> type:
+    """按provider名称选择后端，未知名称（openai、custom、各云厂商）均按OpenAI兼容接口处理"""
+    return PROVIDERS.get((provider or "").lower(), OpenAICompatibleProvider)
+
+
+def default_base_url(provider: Optional[str]) -> Optional[str]:
+    """provider未配置base_url时的默认地址，本地推理服务不能回落到云端地址"""
+    return provider_class(provider).default_base_url
+
+
+def create_provider(config: LLMConfig) -> LLMProvider:
+    """按LLMConfig.provider创建后端"""
+    return provider_class(config.provider)(config)
+
+
+def create_mock_app(config: Optional[LLMConfig] = None) -> web.Application:
+    """OpenAI兼容的mock服务，可作为独立进程供其他实例或压测使用"""
+    provider = MockProvider(config or LLMConfig(provider="mock", model="mock"))
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        messages: List[Dict[str, Any]] = body.get("messages") or []
+        prompt = messages[-1].get("content", "") if messages else ""
+        model = body.get("model", "mock")
+
+        if not body.get("stream"):
+            text, usage = await provider.complete(prompt, model, body.get("max_tokens", 0), body.get("temperature", 0))
+            return web.json_response({
+                "id": f"mock-{int(time.time() * 1000)}",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        async for chunk in provider.stream(prompt, model, body.get("max_tokens", 0), body.get("temperature", 0)):
+            event = {"object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": chunk}}]}
+            await response.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    app = web.Application()
+    app.router.add_post("/chat/completions", chat_completions)
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SysScope mock LLM server (OpenAI compatible)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+    web.run_app(create_mock_app(), host=args.host, port=args.port)
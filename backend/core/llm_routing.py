@@ -0,0 +1,125 @@
+import os
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+from models.schemas import LLMConfig
+from core.llm_providers import LLMProvider, create_provider, provider_class, default_base_url
+from core.logger import register_secret
+
+# 调用类型：计划生成、单项分析、整体总结
+CALL_TYPES = ["plan", "analysis", "summary"]
+DEFAULT_ROUTE = "default"
+
+
+class LLMRoute:
+    """一条路由：模型、端点、生成参数以及独立的并发池"""
+
+    def __init__(
+        self,
+        name: str,
+        config: LLMConfig,
+        provider: LLMProvider,
+        concurrency: int = 4,
+        max_prompt_chars: int = 0,
+        overflow: Optional[str] = None
+    ):
+        self.name = name
+        self.config = config
+        self.provider = provider
+        self.concurrency = max(1, concurrency)
+        # 提示词超过max_prompt_chars时改用overflow路由（0表示不限制）
+        self.max_prompt_chars = max_prompt_chars
+        self.overflow = overflow
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider.name,
+            "model": self.config.model,
+            "base_url": self.config.base_url,
+            "max_tokens": self.config.max_tokens,
+            "temperature": self.config.temperature,
+            "concurrency": self.concurrency,
+            "max_prompt_chars": self.max_prompt_chars,
+            "overflow": self.overflow
+        }
+
+
+class LLMRouter:
+    """按调用类型和提示词大小选择路由
+
+    每种调用类型通过 LLM_<TYPE>_* 环境变量覆盖默认配置，例如：
+    LLM_ANALYSIS_MODEL=small-model、LLM_ANALYSIS_CONCURRENCY=16、
+    LLM_ANALYSIS_MAX_PROMPT_CHARS=20000（超过时使用LLM_ANALYSIS_OVERFLOW_ROUTE，默认default）。
+    连接参数相同的路由共用同一个provider，从而共享HTTP连接池。
+    """
+
+    def __init__(self, routes: Dict[str, LLMRoute]):
+        self.routes = routes
+
+    @classmethod
+    def from_env(cls, default_config: LLMConfig, default_provider: LLMProvider) -> "LLMRouter":
+        providers: Dict[Tuple, LLMProvider] = {cls._provider_key(default_config): default_provider}
+        routes = {
+            DEFAULT_ROUTE: LLMRoute(
+                DEFAULT_ROUTE, default_config, default_provider,
+                concurrency=int(os.getenv("LLM_CONCURRENCY", "4")),
+                max_prompt_chars=int(os.getenv("LLM_MAX_PROMPT_CHARS", "0"))
+            )
+        }
+
+        for call_type in CALL_TYPES:
+            prefix = f"LLM_{call_type.upper()}_"
+            overrides = {}
+            for field, cast in (("provider", str), ("model", str), ("base_url", str), ("api_key", str),
+                                ("max_tokens", int), ("temperature", float)):
+                value = os.getenv(prefix + field.upper())
+                if value:
+                    overrides[field] = cast(value)
+            # 只覆盖provider时不沿用默认配置的地址（例如local不能发往云端），改用该provider的默认地址
+            if "provider" in overrides and "base_url" not in overrides and \
+                    provider_class(overrides["provider"]) is not provider_class(default_config.provider):
+                overrides["base_url"] = default_base_url(overrides["provider"])
+            config = default_config.model_copy(update=overrides)
+            register_secret(config.api_key)
+
+            key = cls._provider_key(config)
+            if key not in providers:
+                providers[key] = create_provider(config)
+
+            routes[call_type] = LLMRoute(
+                call_type, config, providers[key],
+                concurrency=int(os.getenv(prefix + "CONCURRENCY", os.getenv("LLM_CONCURRENCY", "4"))),
+                max_prompt_chars=int(os.getenv(prefix + "MAX_PROMPT_CHARS", "0")),
+                overflow=os.getenv(prefix + "OVERFLOW_ROUTE", DEFAULT_ROUTE)
+            )
+        return cls(routes)
+
+    @staticmethod
+    def _provider_key(config: LLMConfig) -> Tuple:
+        return ((config.provider or "").lower(), config.base_url, config.api_key)
+
+    def route(self, call_type: str, prompt: str) -> LLMRoute:
+        """选择路由，提示词过长时沿overflow链切换（最多切换一次每条路由，避免循环）"""
+        route = self.routes.get(call_type) or self.routes[DEFAULT_ROUTE]
+        visited = {route.name}
+        while route.max_prompt_chars and len(prompt) > route.max_prompt_chars and route.overflow:
+            next_route = self.routes.get(route.overflow)
+            if next_route is None or next_route.name in visited:
+                break
+            visited.add(next_route.name)
+            route = next_route
+        return route
+
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        return {name: route.describe() for name, route in self.routes.items()}
+
+    def providers(self) -> List[LLMProvider]:
+        unique = []
+        for route in self.routes.values():
+            if all(route.provider is not provider for provider in unique):
+                unique.append(route.provider)
+        return unique
+
+    async def close(self):
+        for provider in self.providers():
+            await provider.close()
@@ -0,0 +1,197 @@
+import os
+import sys
+import copy
+import json
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, Set
+
+ROOT_LOGGER = "sysscope"
+
+_secrets: Set[str] = set()
+_setup_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def register_secret(value: Optional[str]):
+    """登记需要在日志中脱敏的敏感值（如API Key）"""
+    if value and len(value) >= 4:
+        _secrets.add(value)
+
+
+def redact(text: str) -> str:
+    """把已登记的敏感值替换为掩码"""
+    for secret in _secrets:
+        if secret in text:
+            text = text.replace(secret, f"{secret[:3]}***")
+    return text
+
+
+def truncate(text: str, limit: Optional[int] = None, keep_tail: bool = False) -> str:
+    """截断过长的文本，保留开头（keep_tail时保留结尾）部分并注明被截断的长度"""
+    limit = limit if limit is not None else int(os.getenv("LOG_MAX_PAYLOAD_CHARS", "2000"))
+    if limit <= 0 or len(text) <= limit:
+        return text
+    if keep_tail:
+        return f"[truncated {len(text) - limit} chars]...{text[-limit:]}"
+    return f"{text[:limit]}...[truncated {len(text) - limit} chars]"
+
+
+def fields(**values) -> Dict[str, Any]:
+    """构建结构化日志字段，用法: logger.info("msg", extra=fields(key=value))"""
+    return {"fields": values}
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = redact(record.exc_text)
+        if record.stack_info:
+            entry["stack"] = redact(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """可读的文本格式，结构化字段以key=value追加在消息后"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        record_fields = getattr(record, "fields", None)
+        if record_fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in record_fields.items())
+        return redact(line)
+
+
+def setup_logging():
+    """初始化日志：业务线程只入队，由后台监听线程负责格式化和写出"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+        formatter = JsonFormatter() if os.getenv("LOG_FORMAT", "text").lower() == "json" else TextFormatter()
+
+        handlers = []
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(formatter)
+        handlers.append(console)
+
+        log_file = os.getenv("LOG_FILE")
+        if log_file:
+            try:
+                directory = os.path.dirname(log_file)
+                if directory and not os.path.exists(directory):
+                    os.makedirs(directory)
+                if int(os.getenv("WORKERS", "1")) > 1:
+                    # 多个worker进程各自轮转同一个文件会互相覆盖，改为由logrotate等外部工具轮转，
+                    # 文件被移走后各worker重新打开
+                    file_handler = logging.handlers.WatchedFileHandler(log_file, encoding="utf-8")
+                else:
+                    file_handler = logging.handlers.RotatingFileHandler(
+                        log_file,
+                        maxBytes=int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024))),
+                        backupCount=int(os.getenv("LOG_FILE_BACKUP_COUNT", "5")),
+                        encoding="utf-8"
+                    )
+                file_handler.setFormatter(formatter)
+                handlers.append(file_handler)
+            except OSError as e:
+                print(f"[LOG] 无法打开日志文件 {log_file}: {e}")
+
+        log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        queue_handler = _DroppingQueueHandler(log_queue, int(os.getenv("LOG_MAX_MESSAGE_CHARS", "4000")))
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(level)
+        root.handlers = [queue_handler]
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """停止后台监听线程并刷新剩余日志"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列已满时丢弃日志而不是阻塞事件循环；入队前截断并脱敏消息、异常堆栈和字段"""
+
+    dropped = 0
+
+    def __init__(self, log_queue: queue.Queue, max_chars: int):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+
+    def _clean(self, text: str, keep_tail: bool = False) -> str:
+        return redact(truncate(text, self.max_chars, keep_tail))
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 不调用基类prepare：它会把堆栈拼进msg并清空exc_info，导致堆栈无法脱敏，格式化器也拿不到异常
+        record = copy.copy(record)
+        record.msg = self._clean(record.getMessage())
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        if record.exc_text:
+            # 堆栈最有用的是结尾的异常类型和最内层调用，截断时保留结尾
+            record.exc_text = self._clean(record.exc_text, keep_tail=True)
+        if record.stack_info:
+            record.stack_info = self._clean(record.stack_info, keep_tail=True)
+        record_fields = getattr(record, "fields", None)
+        if record_fields:
+            record.fields = {
+                key: self._clean(value) if isinstance(value, str) else value
+                for key, value in record_fields.items()
+            }
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取sysscope命名空间下的logger"""
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Any, level: int = logging.DEBUG):
+    """按级别和采样率记录大块载荷，未启用时不做任何序列化"""
+    if not logger.isEnabledFor(level):
+        return
+    sample_rate = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False, default=str)
+    logger.log(level, message, extra=fields(payload=truncate(text), payload_chars=len(text)))
@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from core.tracing import tracer
+from core.logger import get_logger, fields
+
+logger = get_logger("loop_watchdog")
+
+# 事件循环延迟直方图的桶（秒），比默认桶更细，覆盖毫秒级抖动
+LAG_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+# 归类阻塞位置时优先取项目内的栈帧
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _blocking_site(stack: traceback.StackSummary) -> str:
+    """阻塞位置：从最内层向外找到的第一个项目内栈帧，找不到时使用最内层栈帧"""
+    for frame in reversed(stack):
+        if frame.filename.startswith(PROJECT_ROOT) and "site-packages" not in frame.filename:
+            return f"{os.path.relpath(frame.filename, PROJECT_ROOT)}:{frame.lineno} in {frame.name}"
+    if stack:
+        frame = stack[-1]
+        return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+class LoopWatchdog:
+    """事件循环延迟监测和阻塞调用检测
+
+    事件循环中的采样任务每隔interval记录一次心跳并测量调度延迟；独立的监视线程
+    发现心跳停止超过threshold时，通过sys._current_frames()抓取事件循环线程当前的
+    调用栈，恢复后记录阻塞时长，并按阻塞位置汇总次数和累计时长。
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.2, max_events: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_events = max_events
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._lags: "deque[float]" = deque(maxlen=1200)
+        self._events: "deque[Dict[str, Any]]" = deque(maxlen=max_events)
+        self._hotspots: Dict[str, Dict[str, Any]] = {}
+        self._current: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "LoopWatchdog":
+        return cls(
+            interval=float(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", "50")) / 1000,
+            threshold=float(os.getenv("LOOP_WATCHDOG_THRESHOLD_MS", "200")) / 1000,
+            max_events=int(os.getenv("LOOP_WATCHDOG_MAX_EVENTS", "50"))
+        )
+
+    def start(self):
+        """在事件循环中调用，启动采样任务和监视线程"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Event loop watchdog started",
+                    extra=fields(interval_ms=self.interval * 1000, threshold_ms=self.threshold * 1000))
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join, 1.0)
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._beat()
+            self._lags.append(lag)
+            tracer.observe("event_loop_lag_seconds", lag, help_text="Event loop scheduling lag",
+                           buckets=LAG_BUCKETS)
+
+    def _beat(self):
+        with self._lock:
+            self._last_beat = time.monotonic()
+            event, self._current = self._current, None
+        if event is not None:
+            self._finish_event(event)
+
+    def _watch(self):
+        check_interval = min(self.interval, self.threshold / 2)
+        while not self._stop.wait(check_interval):
+            with self._lock:
+                stalled = time.monotonic() - self._last_beat
+                if stalled < self.threshold or self._current is not None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                stack = traceback.extract_stack(frame)
+                self._current = {
+                    "detected_at": datetime.now().isoformat(),
+                    "site": _blocking_site(stack),
+                    "stack": traceback.format_list(stack),
+                    "started": self._last_beat
+                }
+
+    def _finish_event(self, event: Dict[str, Any]):
+        duration = time.monotonic() - event.pop("started")
+        event["blocked_seconds"] = round(duration, 4)
+        self._events.append(event)
+        hotspot = self._hotspots.setdefault(event["site"], {"site": event["site"], "count": 0, "total_seconds": 0.0,
+                                                            "max_seconds": 0.0})
+        hotspot["count"] += 1
+        hotspot["total_seconds"] = round(hotspot["total_seconds"] + duration, 4)
+        hotspot["max_seconds"] = round(max(hotspot["max_seconds"], duration), 4)
+        tracer.inc("event_loop_blocked_total", help_text="Event loop stalls longer than the watchdog threshold")
+        tracer.observe("event_loop_blocked_seconds", duration, help_text="Duration of detected event loop stalls",
+                       buckets=LAG_BUCKETS)
+        logger.warning("Event loop blocked", extra=fields(site=event["site"], blocked_seconds=event["blocked_seconds"]))
+
+    def snapshot(self, include_stacks: bool = True) -> Dict[str, Any]:
+        """当前的延迟统计、阻塞位置汇总和最近的阻塞事件"""
+        lags = sorted(self._lags)
+
+        def pct(p: float) -> float:
+            return round(lags[min(len(lags) - 1, int(p / 100 * len(lags)))] * 1000, 3) if lags else 0.0
+
+        events: List[Dict[str, Any]] = list(self._events)
+        if not include_stacks:
+            events = [{k: v for k, v in event.items() if k != "stack"} for event in events]
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "running": self._task is not None and not self._task.done(),
+            "lag_ms": {"samples": len(lags), "p50": pct(50), "p99": pct(99), "max": pct(100)},
+            "blocked_total": sum(h["count"] for h in self._hotspots.values()),
+            "hotspots": sorted(self._hotspots.values(), key=lambda h: h["total_seconds"], reverse=True),
+            "recent_events": list(reversed(events))
+        }
+
+    def reset(self):
+        with self._lock:
+            self._lags.clear()
+            self._events.clear()
+            self._hotspots.clear()
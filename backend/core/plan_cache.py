@@ -0,0 +1,157 @@
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Tuple, Callable, Awaitable, Optional
+from models.schemas import SystemInfo, TestPlan
+from core.result_diff import system_facts
+from core.logger import get_logger, fields
+from core.tracing import tracer
+from core.coalescing import SingleFlight
+from core.shared_state import SharedState
+
+logger = get_logger("plan_cache")
+
+SHARED_NAMESPACE = "plan_cache"
+
+
+def system_fingerprint(system_info: SystemInfo) -> str:
+    """系统指纹：影响测试计划生成的稳定系统事实的哈希"""
+    facts = system_facts(system_info)
+    facts["platform"] = system_info.platform
+    facts["username"] = system_info.username
+    payload = json.dumps(facts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class PlanCache:
+    """按系统指纹缓存生成的测试计划
+
+    prefetch在后台预先生成计划（例如在获取系统信息时），get优先返回缓存，
+    其次等待同一指纹正在进行的生成，同一指纹同时只会有一次LLM调用。
+    设置了共享状态时，进程内缓存未命中会再查找其他worker生成的计划。
+    """
+
+    def __init__(
+        self,
+        generator: Callable[[SystemInfo], Awaitable[TestPlan]],
+        ttl_seconds: float = 3600,
+        max_entries: int = 32,
+        shared: Optional[SharedState] = None
+    ):
+        self.generator = generator
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries: "OrderedDict[str, Tuple[float, TestPlan]]" = OrderedDict()
+        self._flight = SingleFlight("plan_generation")
+        # 每个指纹的生成代数，refresh后旧的生成结果不再写入缓存
+        self._generations: Dict[str, int] = {}
+
+    def _cached(self, fingerprint: str):
+        entry = self._entries.get(fingerprint)
+        if entry is None:
+            return None
+        created, plan = entry
+        if time.monotonic() - created > self.ttl_seconds:
+            del self._entries[fingerprint]
+            return None
+        self._entries.move_to_end(fingerprint)
+        return plan
+
+    def _start(self, fingerprint: str, system_info: SystemInfo, refresh: bool = False) -> asyncio.Task:
+        if refresh:
+            self._generations[fingerprint] = self._generations.get(fingerprint, 0) + 1
+        generation = self._generations.get(fingerprint, 0)
+        return self._flight.start(
+            fingerprint, lambda: self._generate(fingerprint, system_info, generation, refresh), fresh=refresh
+        )
+
+    async def _generate(self, fingerprint: str, system_info: SystemInfo, generation: int, refresh: bool) -> TestPlan:
+        if not refresh:
+            plan = await self._shared_get(fingerprint)
+            if plan is not None:
+                return plan
+        with tracer.span("plan_cache.generate", fingerprint=fingerprint, refresh=refresh):
+            plan = await self.generator(system_info)
+        # 生成期间有refresh请求时，这次的结果已经过时，只返回给等待者
+        if self._generations.get(fingerprint, 0) == generation:
+            await self._publish(fingerprint, plan)
+        return plan
+
+    async def _shared_get(self, fingerprint: str) -> Optional[TestPlan]:
+        """从共享状态读取其他worker生成的计划，命中时写入进程内缓存"""
+        if self.shared is None:
+            return None
+        data = await self.shared.get(SHARED_NAMESPACE, fingerprint)
+        if data is None:
+            return None
+        plan = TestPlan.model_validate(data)
+        self._store(fingerprint, plan)
+        return plan
+
+    async def _publish(self, fingerprint: str, plan: TestPlan):
+        self._store(fingerprint, plan)
+        if self.shared is not None:
+            await self.shared.set(SHARED_NAMESPACE, fingerprint, plan.model_dump(mode="json"), self.ttl_seconds)
+
+    def _store(self, fingerprint: str, plan: TestPlan):
+        self._entries[fingerprint] = (time.monotonic(), plan)
+        self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def put(self, system_info: SystemInfo, plan: TestPlan):
+        """写入在缓存之外生成的计划（例如流式生成的结果）"""
+        await self._publish(system_fingerprint(system_info), plan.model_copy(deep=True))
+
+    def prefetch(self, system_info: SystemInfo) -> bool:
+        """后台预生成计划，已缓存或正在生成时不做任何事，返回是否启动了新的生成"""
+        fingerprint = system_fingerprint(system_info)
+        if self._cached(fingerprint) is not None or self._flight.inflight(fingerprint):
+            return False
+        task = self._start(fingerprint, system_info)
+        task.add_done_callback(self._log_prefetch_failure)
+        tracer.inc("plan_prefetch_total", help_text="Speculative plan generations started")
+        logger.info("Plan prefetch started", extra=fields(fingerprint=fingerprint))
+        return True
+
+    @staticmethod
+    def _log_prefetch_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Plan prefetch failed", extra=fields(error=str(task.exception())))
+
+    async def get(self, system_info: SystemInfo, refresh: bool = False) -> TestPlan:
+        """获取计划：缓存命中直接返回，否则加入（或启动）同一指纹的生成
+
+        refresh时丢弃缓存并启动新的生成，不加入已在进行的（可能基于旧缓存状态的）生成。
+        """
+        fingerprint = system_fingerprint(system_info)
+        if refresh:
+            self._entries.pop(fingerprint, None)
+            if self.shared is not None:
+                await self.shared.delete(SHARED_NAMESPACE, fingerprint)
+        else:
+            plan = self._cached(fingerprint)
+            result = "hit"
+            if plan is None and not self._flight.inflight(fingerprint):
+                plan = await self._shared_get(fingerprint)
+                result = "shared_hit"
+            if plan is not None:
+                tracer.inc("plan_cache_requests_total", help_text="Plan requests by cache outcome", result=result)
+                return plan.model_copy(deep=True)
+
+        if refresh:
+            result = "refresh"
+        else:
+            result = "inflight" if self._flight.inflight(fingerprint) else "miss"
+        tracer.inc("plan_cache_requests_total", help_text="Plan requests by cache outcome", result=result)
+        # shield: 某个请求被取消时不影响其他等待者和缓存写入
+        plan = await asyncio.shield(self._start(fingerprint, system_info, refresh))
+        return plan.model_copy(deep=True)
+
+    async def invalidate(self):
+        self._entries.clear()
+        if self.shared is not None:
+            await self.shared.clear(SHARED_NAMESPACE)
@@ -0,0 +1,142 @@
+import json
+from typing import Dict, Any, List, Optional, Tuple
+
+
+class PlanParseError(ValueError):
+    """LLM返回的内容中找不到可用的测试计划"""
+
+
+class IncrementalPlanParser:
+    """增量解析LLM返回的测试计划JSON
+
+    按字符扫描，忽略JSON对象前后的说明文字和代码块标记；test_items数组中的每个
+    元素一闭合就立即解析并返回，因此既能用于流式响应，也能在输出被max_tokens
+    截断时恢复已经完整的测试项目。
+    """
+
+    ITEMS_KEY = "test_items"
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._object_start = -1
+        self._object_end = -1
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._expect_value = False
+        self._items_depth = -1
+        self._item_start = -1
+        self.items: List[Dict[str, Any]] = []
+        self.fields: Dict[str, Any] = {}
+        self.skipped_items = 0
+
+    @property
+    def complete(self) -> bool:
+        return self._object_end >= 0
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """追加一段文本，返回本次新解析出的完整测试项目"""
+        self._buffer += chunk
+        new_items = []
+        buffer = self._buffer
+        while self._pos < len(buffer) and not self.complete:
+            char = buffer[self._pos]
+            if self._in_string:
+                self._scan_string_char(char)
+            elif self._object_start < 0:
+                if char == '{':
+                    self._object_start = self._pos
+                    self._depth = 1
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in '{[':
+                if char == '[' and self._depth == 1 and self._current_key == self.ITEMS_KEY:
+                    self._items_depth = 2
+                elif char == '{' and self._depth == self._items_depth:
+                    self._item_start = self._pos
+                self._depth += 1
+                self._expect_value = False
+            elif char in '}]':
+                self._depth -= 1
+                if char == '}' and self._depth == self._items_depth and self._item_start >= 0:
+                    item = self._parse_item(buffer[self._item_start:self._pos + 1])
+                    if item is not None:
+                        self.items.append(item)
+                        new_items.append(item)
+                    self._item_start = -1
+                elif char == ']' and self._depth == 1 and self._items_depth == 2:
+                    self._items_depth = -1
+                if self._depth == 0:
+                    self._object_end = self._pos
+            elif char == ':' and self._depth == 1:
+                self._current_key = self._last_string
+                self._expect_value = True
+            elif char == ',' and self._depth == 1:
+                self._expect_value = False
+            self._pos += 1
+        return new_items
+
+    def _scan_string_char(self, char: str):
+        if self._escape:
+            self._escape = False
+        elif char == '\\':
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            raw = self._buffer[self._string_start:self._pos + 1]
+            if self._depth == 1:
+                try:
+                    value = json.loads(raw)
+                except json.JSONDecodeError:
+                    value = None
+                if self._expect_value and self._current_key:
+                    # 顶层字符串字段（name、description等）
+                    self.fields[self._current_key] = value
+                    self._expect_value = False
+                else:
+                    self._last_string = value
+
+    def _parse_item(self, text: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            self.skipped_items += 1
+            return None
+        if not isinstance(item, dict):
+            self.skipped_items += 1
+            return None
+        return item
+
+    def finish(self) -> Tuple[Dict[str, Any], bool]:
+        """结束解析，返回(计划数据, 是否完整)
+
+        JSON完整时返回原始对象；被截断时返回顶层字段加上已恢复的测试项目。
+        """
+        if self.complete:
+            try:
+                data = json.loads(self._buffer[self._object_start:self._object_end + 1])
+                if isinstance(data, dict):
+                    return data, True
+            except json.JSONDecodeError:
+                pass
+
+        if self._object_start < 0:
+            raise PlanParseError("No JSON object found in LLM response")
+        if not self.items:
+            raise PlanParseError("LLM response is truncated before any complete test item")
+
+        data = dict(self.fields)
+        data[self.ITEMS_KEY] = list(self.items)
+        return data, False
+
+
+def parse_plan_json(text: str) -> Tuple[Dict[str, Any], bool]:
+    """从完整的LLM响应文本中提取测试计划数据，返回(数据, 是否完整)"""
+    parser = IncrementalPlanParser()
+    parser.feed(text)
+    return parser.finish()
@@ -0,0 +1,243 @@
+import os
+import platform
+import time
+import psutil
+from datetime import datetime
+from typing import Dict, Any, List, Callable, Tuple
+from core import linux_sysfs
+
+# 原生探针返回 (结构化数据, 渲染后的文本输出)
+ProbeFunc = Callable[[], Tuple[Dict[str, Any], str]]
+
+PROBES: Dict[str, ProbeFunc] = {}
+
+
+def register_probe(probe_id: str):
+    """注册原生探针的装饰器"""
+    def decorator(func: ProbeFunc) -> ProbeFunc:
+        PROBES[probe_id] = func
+        return func
+    return decorator
+
+
+def get_probe(probe_id: str) -> ProbeFunc:
+    """按ID获取探针，不存在时抛出KeyError"""
+    return PROBES[probe_id]
+
+
+def list_probes() -> List[str]:
+    """列出所有已注册的探针ID"""
+    return sorted(PROBES.keys())
+
+
+def run_probe(probe_id: str) -> Dict[str, Any]:
+    """在当前线程中执行探针，返回与TestEngine._run_command兼容的结果结构"""
+    data, output = get_probe(probe_id)()
+    return {
+        'output': output,
+        'error': None,
+        'exit_code': 0,
+        'raw_log': output,
+        'data': data
+    }
+
+
+def _format_bytes(value: float) -> str:
+    """以类似 df -h 的方式格式化字节数"""
+    for unit in ['B', 'K', 'M', 'G', 'T']:
+        if abs(value) < 1024:
+            return f"{value:.1f}{unit}" if unit != 'B' else f"{int(value)}{unit}"
+        value /= 1024
+    return f"{value:.1f}P"
+
+
+def _format_table(headers: List[str], rows: List[List[Any]]) -> str:
+    """将行数据渲染为左对齐的文本表格"""
+    cells = [headers] + [[str(cell) for cell in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    lines = ["  ".join(cell.ljust(widths[i]) for i, cell in enumerate(row)).rstrip() for row in cells]
+    return "\n".join(lines) + "\n"
+
+
+@register_probe("cpu_info")
+def probe_cpu_info() -> Tuple[Dict[str, Any], str]:
+    """CPU型号、核心数和频率"""
+    frequency = psutil.cpu_freq()
+    processor = platform.processor()
+    cpuinfo = linux_sysfs.read_cpuinfo() if platform.system() == "Linux" else []
+    processor = next((cpu["model name"] for cpu in cpuinfo if "model name" in cpu), processor)
+    data = {
+        "processor": processor or platform.machine(),
+        "machine": platform.machine(),
+        "logical_cpus": psutil.cpu_count(),
+        "physical_cores": psutil.cpu_count(logical=False),
+        "frequency_mhz": {
+            "current": frequency.current,
+            "min": frequency.min,
+            "max": frequency.max
+        } if frequency else None
+    }
+
+    lines = [
+        f"Processor:      {data['processor']}",
+        f"Architecture:   {data['machine']}",
+        f"Logical CPUs:   {data['logical_cpus']}",
+        f"Physical cores: {data['physical_cores']}",
+    ]
+    if frequency:
+        lines.append(f"Frequency:      {frequency.current:.0f} MHz (min {frequency.min:.0f}, max {frequency.max:.0f})")
+    return data, "\n".join(lines) + "\n"
+
+
+@register_probe("memory_info")
+def probe_memory_info() -> Tuple[Dict[str, Any], str]:
+    """物理内存和交换分区使用情况"""
+    memory = psutil.virtual_memory()
+    swap = psutil.swap_memory()
+    data = {
+        "memory": memory._asdict(),
+        "swap": swap._asdict()
+    }
+
+    rows = [
+        ["Mem:", _format_bytes(memory.total), _format_bytes(memory.total - memory.available),
+         _format_bytes(memory.available), f"{memory.percent}%"],
+        ["Swap:", _format_bytes(swap.total), _format_bytes(swap.used),
+         _format_bytes(swap.free), f"{swap.percent}%"],
+    ]
+    return data, _format_table(["", "total", "used", "available", "use%"], rows)
+
+
+@register_probe("disk_usage")
+def probe_disk_usage() -> Tuple[Dict[str, Any], str]:
+    """各挂载点的磁盘空间使用情况"""
+    partitions = []
+    for partition in psutil.disk_partitions():
+        try:
+            usage = psutil.disk_usage(partition.mountpoint)
+        except (PermissionError, OSError):
+            continue
+        partitions.append({
+            "device": partition.device,
+            "mountpoint": partition.mountpoint,
+            "fstype": partition.fstype,
+            "total": usage.total,
+            "used": usage.used,
+            "free": usage.free,
+            "percent": usage.percent
+        })
+
+    rows = [
+        [p["device"], _format_bytes(p["total"]), _format_bytes(p["used"]),
+         _format_bytes(p["free"]), f"{p['percent']:.0f}%", p["mountpoint"]]
+        for p in partitions
+    ]
+    output = _format_table(["Filesystem", "Size", "Used", "Avail", "Use%", "Mounted on"], rows)
+    return {"partitions": partitions}, output
+
+
+@register_probe("network_interfaces")
+def probe_network_interfaces() -> Tuple[Dict[str, Any], str]:
+    """网络接口地址、状态和收发统计"""
+    addresses = psutil.net_if_addrs()
+    stats = psutil.net_if_stats()
+    counters = psutil.net_io_counters(pernic=True)
+
+    interfaces = []
+    lines = []
+    for name, addrs in addresses.items():
+        interface = {
+            "name": name,
+            "addresses": [
+                {"family": getattr(addr.family, 'name', str(addr.family)), "address": addr.address, "netmask": addr.netmask}
+                for addr in addrs
+            ],
+            "isup": stats[name].isup if name in stats else None,
+            "speed": stats[name].speed if name in stats else None,
+            "mtu": stats[name].mtu if name in stats else None,
+            "io": counters[name]._asdict() if name in counters else None
+        }
+        interfaces.append(interface)
+
+        state = "UP" if interface["isup"] else "DOWN"
+        lines.append(f"{name}: state {state} mtu {interface['mtu']} speed {interface['speed']}Mb/s")
+        for addr in interface["addresses"]:
+            lines.append(f"    {addr['family']} {addr['address']} netmask {addr['netmask']}")
+        if interface["io"]:
+            io = interface["io"]
+            lines.append(f"    RX bytes {io['bytes_recv']} packets {io['packets_recv']} errors {io['errin']} dropped {io['dropin']}")
+            lines.append(f"    TX bytes {io['bytes_sent']} packets {io['packets_sent']} errors {io['errout']} dropped {io['dropout']}")
+
+    return {"interfaces": interfaces}, "\n".join(lines) + "\n"
+
+
+@register_probe("process_top")
+def probe_process_top(limit: int = 20) -> Tuple[Dict[str, Any], str]:
+    """按内存占用排序的进程列表"""
+    processes = []
+    for proc in psutil.process_iter(['pid', 'username', 'name', 'memory_percent', 'memory_info', 'status']):
+        info = proc.info
+        processes.append({
+            "pid": info['pid'],
+            "user": info['username'],
+            "name": info['name'],
+            "memory_percent": round(info['memory_percent'] or 0.0, 2),
+            "rss": info['memory_info'].rss if info['memory_info'] else 0,
+            "status": info['status']
+        })
+
+    processes.sort(key=lambda p: p["memory_percent"], reverse=True)
+    top = processes[:limit]
+    rows = [
+        [p["user"], p["pid"], f"{p['memory_percent']:.1f}", _format_bytes(p["rss"]), p["status"], p["name"]]
+        for p in top
+    ]
+    output = _format_table(["USER", "PID", "%MEM", "RSS", "STAT", "COMMAND"], rows)
+    return {"process_count": len(processes), "processes": top}, output
+
+
+@register_probe("load_average")
+def probe_load_average() -> Tuple[Dict[str, Any], str]:
+    """运行时间、系统负载和CPU使用率"""
+    boot_time = psutil.boot_time()
+    uptime_seconds = time.time() - boot_time
+    load_1, load_5, load_15 = os.getloadavg() if hasattr(os, 'getloadavg') else psutil.getloadavg()
+    cpu_times = psutil.cpu_times_percent(interval=0.2)
+
+    data = {
+        "boot_time": datetime.fromtimestamp(boot_time).isoformat(),
+        "uptime_seconds": int(uptime_seconds),
+        "users": len(psutil.users()),
+        "load_average": [load_1, load_5, load_15],
+        "cpu_percent": {
+            "user": cpu_times.user,
+            "system": cpu_times.system,
+            "idle": cpu_times.idle
+        }
+    }
+
+    days, remainder = divmod(int(uptime_seconds), 86400)
+    hours, remainder = divmod(remainder, 3600)
+    minutes = remainder // 60
+    output = (
+        f"up {days} days, {hours:02d}:{minutes:02d}, {data['users']} users, "
+        f"load averages: {load_1:.2f} {load_5:.2f} {load_15:.2f}\n"
+        f"CPU usage: {cpu_times.user:.2f}% user, {cpu_times.system:.2f}% sys, {cpu_times.idle:.2f}% idle\n"
+    )
+    return data, output
+
+
+@register_probe("block_devices")
+def probe_block_devices() -> Tuple[Dict[str, Any], str]:
+    """块设备容量、类型和IO调度器（仅Linux，读取/sys/block）"""
+    if not os.path.isdir(os.path.join(linux_sysfs.SYS_ROOT, "block")):
+        raise RuntimeError("/sys/block is not available on this platform")
+
+    devices = linux_sysfs.read_block_devices()
+    rows = [
+        [d["name"], _format_bytes(d["size"]), "HDD" if d["rotational"] else "SSD",
+         d["scheduler"] or "-", d["model"] or "-"]
+        for d in devices
+    ]
+    output = _format_table(["NAME", "SIZE", "TYPE", "SCHED", "MODEL"], rows)
+    return {"devices": devices}, output
@@ -1,246 +1,211 @@
 import os
-import json
+import asyncio
+import aiofiles
 from datetime import datetime
-from typing import Dict, Any, Optional
-from models.schemas import TestExecutionResult, ReportConfig
+from typing import Dict, Any, Optional, List, Callable
+from models.schemas import TestExecutionResult, TestResult, TestPlan, ReportConfig
+from core.report_renderers import ReportRenderer, get_renderer
+from core.tracing import tracer
+
+# 部分报告文件名为 <execution_id>.partial<扩展名>，恢复执行时复用同一个文件
+PARTIAL_MARKER = ".partial"
+
+class ReportWriter:
+    """异步追加写入报告文件"""
+    
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.bytes_written = 0
+        self._file = None
+    
+    async def open(self):
+        self._file = await aiofiles.open(self.filepath, 'w', encoding='utf-8')
+    
+    async def write(self, chunk: str):
+        if chunk:
+            await self._file.write(chunk)
+            self.bytes_written += len(chunk)
+    
+    async def flush(self):
+        await self._file.flush()
+    
+    async def close(self):
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+    
+    async def __aenter__(self) -> "ReportWriter":
+        await self.open()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+class PartialReport:
+    """执行过程中的部分报告，每完成一个测试就追加一段"""
+    
+    def __init__(self, writer: ReportWriter, renderer: ReportRenderer):
+        self.writer = writer
+        self.renderer = renderer
+    
+    @property
+    def filepath(self) -> str:
+        return self.writer.filepath
+    
+    async def append_result(self, result: TestResult):
+        """追加一个测试结果并立即刷新到磁盘"""
+        await self.writer.write(self.renderer.result(result))
+        await self.writer.flush()
+    
+    async def close(self):
+        """执行中断时关闭部分报告并保留文件，恢复执行时重新打开"""
+        await self.writer.close()
+    
+    async def discard(self):
+        """最终报告生成后删除部分报告"""
+        await self.writer.close()
+        try:
+            await asyncio.to_thread(os.remove, self.filepath)
+        except FileNotFoundError:
+            pass
 
 class ReportGenerator:
     """报告生成器"""
     
     def __init__(self, config: Optional[ReportConfig] = None):
-        self.config = config or ReportConfig()
+        self.config = config or self._load_config()
+        # 提前校验输出格式
+        get_renderer(self.config.output_format, self.config)
         self._ensure_output_directory()
     
+    def _load_config(self) -> ReportConfig:
+        """从环境变量加载配置"""
+        def env_bool(name: str, default: bool) -> bool:
+            return os.getenv(name, str(default)).lower() == "true"
+        
+        return ReportConfig(
+            output_format=os.getenv("REPORT_OUTPUT_FORMAT", "markdown"),
+            output_path=os.getenv("REPORT_OUTPUT_PATH", "reports"),
+            filename_pattern=os.getenv("REPORT_FILENAME_PATTERN", "report_{timestamp}_{system_name}"),
+            include_system_info=env_bool("REPORT_INCLUDE_SYSTEM_INFO", True),
+            include_raw_logs=env_bool("REPORT_INCLUDE_RAW_LOGS", False),
+            include_analysis=env_bool("REPORT_INCLUDE_ANALYSIS", True)
+        )
+    
     def _ensure_output_directory(self):
         """确保输出目录存在"""
         if not os.path.exists(self.config.output_path):
             os.makedirs(self.config.output_path)
     
+    @tracer.traced("report.generate")
     async def generate_report(self, test_results: TestExecutionResult) -> str:
-        """生成测试报告"""
+        """生成测试报告，按片段流式写入文件"""
         try:
+            renderer = get_renderer(self.config.output_format, self.config)
             filename = self._generate_filename(test_results)
-            filepath = os.path.join(self.config.output_path, f"{filename}.md")
+            filepath = os.path.join(self.config.output_path, f"{filename}{renderer.extension}")
             
-            content = self._generate_markdown_content(test_results)
+            async with ReportWriter(filepath) as writer:
+                await writer.write(renderer.begin(test_results))
+                
+                # 系统信息
+                if self.config.include_system_info:
+                    await writer.write(renderer.system_info(test_results.system_info))
+                
+                # 测试结果详情（按类别分组）
+                await writer.write(renderer.begin_results())
+                for category, results in self._group_by_category(test_results.test_results).items():
+                    await writer.write(renderer.category(category))
+                    for result in results:
+                        await writer.write(renderer.result(result))
+                await writer.write(renderer.end_results())
+                
+                # 拓扑放置对比、整体分析、建议和总结
+                await writer.write(renderer.closing(test_results))
+                await writer.write(renderer.end())
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
+            tracer.current_span().set_attributes(
+                execution_id=test_results.execution_id, tests=test_results.total_tests,
+                format=self.config.output_format, bytes=writer.bytes_written
+            )
             
             return filepath
-            
+        
         except Exception as e:
             raise Exception(f"Failed to generate report: {str(e)}")
     
+    def partial_report_path(self, execution_id: str, extension: str) -> str:
+        """按执行ID确定部分报告路径，同一次执行（包括恢复后）始终使用同一个文件"""
+        if os.path.basename(execution_id) != execution_id:
+            raise ValueError(f"Invalid execution id: {execution_id}")
+        return os.path.join(self.config.output_path, f"{execution_id}{PARTIAL_MARKER}{extension}")
+    
+    async def open_partial_report(
+        self,
+        test_plan: TestPlan,
+        execution_id: str,
+        completed_results: Optional[List[TestResult]] = None
+    ) -> PartialReport:
+        """在执行开始（或恢复）时打开部分报告，测试完成后通过append_result追加
+        
+        恢复执行时重写文件并回放检查点中已完成的结果，已完成的项目不会再触发on_result。
+        """
+        renderer = get_renderer(self.config.output_format, self.config)
+        writer = ReportWriter(self.partial_report_path(execution_id, renderer.extension))
+        await writer.open()
+        await writer.write(renderer.begin_partial(test_plan))
+        if self.config.include_system_info:
+            await writer.write(renderer.system_info(test_plan.system_info))
+        await writer.write(renderer.begin_results())
+        for result in completed_results or []:
+            await writer.write(renderer.result(result))
+        await writer.flush()
+        return PartialReport(writer, renderer)
+    
+    def remove_stale_partial_reports(self, is_resumable: Callable[[str], bool]) -> List[str]:
+        """删除已没有可恢复检查点的执行留下的部分报告（如进程被强制结束），返回删除的路径"""
+        removed = []
+        for name in os.listdir(self.config.output_path):
+            stem, extension = os.path.splitext(name)
+            if not stem.endswith(PARTIAL_MARKER):
+                continue
+            execution_id = stem[:-len(PARTIAL_MARKER)]
+            if not execution_id or is_resumable(execution_id):
+                continue
+            path = os.path.join(self.config.output_path, name)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed.append(path)
+        return removed
+    
     def _generate_filename(self, test_results: TestExecutionResult) -> str:
         """生成文件名"""
+        return self._format_filename(test_results.system_info.hostname, test_results.execution_id)
+    
+    def _format_filename(self, hostname: str, execution_id: str) -> str:
+        """按文件名模板格式化"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        system_name = test_results.system_info.hostname.replace(' ', '_')
+        system_name = hostname.replace(' ', '_')
         
         filename = self.config.filename_pattern.format(
             timestamp=timestamp,
             system_name=system_name,
-            execution_id=test_results.execution_id
+            execution_id=execution_id
         )
         
         return filename
     
-    def _generate_markdown_content(self, test_results: TestExecutionResult) -> str:
-        """生成Markdown格式的报告内容"""
-        content = []
-        
-        # 标题
-        content.append("# 系统测试报告")
-        content.append("")
-        
-        # 基本信息
-        content.append("## 基本信息")
-        content.append("")
-        content.append(f"- **报告生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        content.append(f"- **执行ID**: {test_results.execution_id}")
-        content.append(f"- **测试计划ID**: {test_results.test_plan_id}")
-        content.append(f"- **开始时间**: {test_results.started_at.strftime('%Y-%m-%d %H:%M:%S')}")
-        content.append(f"- **完成时间**: {test_results.completed_at.strftime('%Y-%m-%d %H:%M:%S')}")
-        content.append(f"- **总执行时间**: {test_results.execution_time:.2f} 秒")
-        content.append("")
-        
-        # 执行统计
-        content.append("## 执行统计")
-        content.append("")
-        content.append(f"- **总测试数**: {test_results.total_tests}")
-        content.append(f"- **通过**: {test_results.passed_tests} ✅")
-        content.append(f"- **失败**: {test_results.failed_tests} ❌")
-        content.append(f"- **跳过**: {test_results.skipped_tests} ⏭️")
-        content.append(f"- **成功率**: {(test_results.passed_tests / test_results.total_tests * 100):.1f}%" if test_results.total_tests > 0 else "- **成功率**: 0%")
-        content.append("")
-        
-        # 系统信息
-        if self.config.include_system_info:
-            content.extend(self._generate_system_info_section(test_results.system_info))
-        
-        # 测试结果详情
-        content.extend(self._generate_test_results_section(test_results))
-        
-        # 整体分析
-        if test_results.overall_summary and self.config.include_analysis:
-            content.extend(self._generate_analysis_section(test_results))
-        
-        # 建议和总结
-        content.extend(self._generate_recommendations_section(test_results))
-        
-        return "\n".join(content)
-    
-    def _generate_system_info_section(self, system_info) -> list:
-        """生成系统信息部分"""
-        content = []
-        content.append("## 系统信息")
-        content.append("")
-        
-        content.append("### 基本系统信息")
-        content.append(f"- **平台**: {system_info.platform}")
-        content.append(f"- **系统**: {system_info.system}")
-        content.append(f"- **版本**: {system_info.release}")
-        content.append(f"- **机器类型**: {system_info.machine}")
-        content.append(f"- **处理器**: {system_info.processor}")
-        content.append(f"- **CPU核心数**: {system_info.cpu_count}")
-        content.append(f"- **主机名**: {system_info.hostname}")
-        content.append(f"- **用户名**: {system_info.username}")
-        content.append("")
-        
-        # 内存信息
-        memory_total_gb = system_info.memory_total / (1024**3)
-        memory_available_gb = system_info.memory_available / (1024**3)
-        memory_used_gb = memory_total_gb - memory_available_gb
-        memory_usage_percent = (memory_used_gb / memory_total_gb) * 100
-        
-        content.append("### 内存信息")
-        content.append(f"- **总内存**: {memory_total_gb:.1f} GB")
-        content.append(f"- **可用内存**: {memory_available_gb:.1f} GB")
-        content.append(f"- **已用内存**: {memory_used_gb:.1f} GB")
-        content.append(f"- **内存使用率**: {memory_usage_percent:.1f}%")
-        content.append("")
-        
-        return content
-    
-    def _generate_test_results_section(self, test_results: TestExecutionResult) -> list:
-        """生成测试结果详情部分"""
-        content = []
-        content.append("## 测试结果详情")
-        content.append("")
-        
-        # 按类别分组
+    def _group_by_category(self, results: List[TestResult]) -> Dict[str, List[TestResult]]:
+        """按推断的类别分组测试结果"""
         categories = {}
-        for result in test_results.test_results:
+        for result in results:
             category = self._infer_category(result.test_item_name)
             if category not in categories:
                 categories[category] = []
             categories[category].append(result)
-        
-        # 按类别输出结果
-        for category, results in categories.items():
-            content.append(f"### {category}")
-            content.append("")
-            
-            for result in results:
-                # 状态图标
-                status_icon = {
-                    "completed": "✅",
-                    "failed": "❌",
-                    "skipped": "⏭️",
-                    "running": "🔄",
-                    "pending": "⏳"
-                }.get(result.status.value, "❓")
-                
-                content.append(f"#### {status_icon} {result.test_item_name}")
-                content.append("")
-                
-                # 基本信息
-                content.append(f"- **状态**: {result.status.value}")
-                content.append(f"- **执行时间**: {result.duration:.2f} 秒")
-                if result.exit_code is not None:
-                    content.append(f"- **退出代码**: {result.exit_code}")
-                content.append("")
-                
-                # 输出结果
-                if result.output:
-                    content.append("**输出**:")
-                    content.append("```")
-                    content.append(result.output.strip())
-                    content.append("```")
-                    content.append("")
-                
-                # 错误信息
-                if result.error:
-                    content.append("**错误**:")
-                    content.append("```")
-                    content.append(result.error.strip())
-                    content.append("```")
-                    content.append("")
-                
-                # LLM分析结果
-                if result.analyzed_summary and self.config.include_analysis:
-                    content.append("**分析**:")
-                    content.append(result.analyzed_summary)
-                    content.append("")
-        
-        return content
-    
-    def _generate_analysis_section(self, test_results: TestExecutionResult) -> list:
-        """生成分析部分"""
-        content = []
-        content.append("## 整体分析")
-        content.append("")
-        
-        if test_results.overall_summary:
-            content.append(test_results.overall_summary)
-            content.append("")
-        
-        return content
-    
-    def _generate_recommendations_section(self, test_results: TestExecutionResult) -> list:
-        """生成建议和总结部分"""
-        content = []
-        content.append("## 建议和总结")
-        content.append("")
-        
-        # 基于测试结果生成建议
-        failed_tests = [r for r in test_results.test_results if r.status.value == "failed"]
-        
-        if failed_tests:
-            content.append("### 需要关注的问题")
-            content.append("")
-            for test in failed_tests:
-                content.append(f"- **{test.test_item_name}**: 测试失败，建议检查相关配置")
-            content.append("")
-        
-        # 性能建议
-        memory_usage = (test_results.system_info.memory_total - test_results.system_info.memory_available) / test_results.system_info.memory_total
-        if memory_usage > 0.8:
-            content.append("### 性能建议")
-            content.append("")
-            content.append("- 内存使用率较高，建议关闭不必要的应用程序")
-            content.append("- 考虑增加系统内存或优化内存使用")
-            content.append("")
-        
-        # 安全建议
-        content.append("### 安全建议")
-        content.append("")
-        content.append("- 定期更新系统和应用程序")
-        content.append("- 启用防火墙和安全功能")
-        content.append("- 定期备份重要数据")
-        content.append("- 使用强密码和双因素认证")
-        content.append("")
-        
-        # 维护建议
-        content.append("### 维护建议")
-        content.append("")
-        content.append("- 定期清理临时文件和缓存")
-        content.append("- 监控磁盘空间使用情况")
-        content.append("- 定期检查系统日志")
-        content.append("- 保持软件版本更新")
-        content.append("")
-        
-        return content
+        return categories
     
     def _infer_category(self, test_name: str) -> str:
         """从测试名称推断类别"""
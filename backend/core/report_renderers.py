@@ -0,0 +1,581 @@
+import re
+import json
+import html
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+import markdown
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+from models.schemas import TestExecutionResult, TestResult, TestPlan, SystemInfo, ReportConfig, ExecutionDiff, ValueChange
+
+
+class ReportRenderer(ABC):
+    """报告渲染器基类
+
+    报告按片段逐段渲染并追加写入文件：开头、系统信息、每个测试结果、结尾各自独立，
+    因此既可以在测试执行过程中追加部分结果，也不需要在内存中拼接完整报告。
+    """
+
+    extension = ".txt"
+    media_type = "text/plain"
+
+    def __init__(self, config: ReportConfig):
+        self.config = config
+
+    @abstractmethod
+    def begin(self, test_results: TestExecutionResult) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def begin_partial(self, test_plan: TestPlan) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def system_info(self, system_info: SystemInfo) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def begin_results(self) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def category(self, name: str) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def result(self, result: TestResult) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def end_results(self) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def closing(self, test_results: TestExecutionResult) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def end(self) -> str:
+        raise NotImplementedError
+
+
+class MarkdownRenderer(ReportRenderer):
+    """Markdown报告渲染器"""
+
+    extension = ".md"
+    media_type = "text/markdown"
+
+    STATUS_ICONS = {
+        "completed": "✅",
+        "failed": "❌",
+        "skipped": "⏭️",
+        "running": "🔄",
+        "pending": "⏳"
+    }
+
+    @staticmethod
+    def _join(content: List[str]) -> str:
+        return "\n".join(content) + "\n" if content else ""
+
+    def begin(self, test_results: TestExecutionResult) -> str:
+        content = []
+
+        # 标题
+        content.append("# 系统测试报告")
+        content.append("")
+
+        # 基本信息
+        content.append("## 基本信息")
+        content.append("")
+        content.append(f"- **报告生成时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        content.append(f"- **执行ID**: {test_results.execution_id}")
+        content.append(f"- **测试计划ID**: {test_results.test_plan_id}")
+        content.append(f"- **开始时间**: {test_results.started_at.strftime('%Y-%m-%d %H:%M:%S')}")
+        content.append(f"- **完成时间**: {test_results.completed_at.strftime('%Y-%m-%d %H:%M:%S')}")
+        content.append(f"- **总执行时间**: {test_results.execution_time:.2f} 秒")
+        content.append("")
+
+        # 执行统计
+        content.append("## 执行统计")
+        content.append("")
+        content.append(f"- **总测试数**: {test_results.total_tests}")
+        content.append(f"- **通过**: {test_results.passed_tests} ✅")
+        content.append(f"- **失败**: {test_results.failed_tests} ❌")
+        content.append(f"- **跳过**: {test_results.skipped_tests} ⏭️")
+        content.append(f"- **成功率**: {(test_results.passed_tests / test_results.total_tests * 100):.1f}%" if test_results.total_tests > 0 else "- **成功率**: 0%")
+        content.append("")
+
+        return self._join(content)
+
+    def begin_partial(self, test_plan: TestPlan) -> str:
+        content = []
+        content.append("# 系统测试报告（执行中）")
+        content.append("")
+        content.append("## 基本信息")
+        content.append("")
+        content.append(f"- **开始时间**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        content.append(f"- **测试计划ID**: {test_plan.id}")
+        content.append(f"- **测试计划**: {test_plan.name}")
+        content.append(f"- **测试项目数**: {len([item for item in test_plan.test_items if item.enabled])}")
+        content.append("")
+        return self._join(content)
+
+    def system_info(self, system_info: SystemInfo) -> str:
+        content = []
+        content.append("## 系统信息")
+        content.append("")
+
+        content.append("### 基本系统信息")
+        content.append(f"- **平台**: {system_info.platform}")
+        content.append(f"- **系统**: {system_info.system}")
+        content.append(f"- **版本**: {system_info.release}")
+        content.append(f"- **机器类型**: {system_info.machine}")
+        content.append(f"- **处理器**: {system_info.processor}")
+        content.append(f"- **CPU核心数**: {system_info.cpu_count}")
+        content.append(f"- **主机名**: {system_info.hostname}")
+        content.append(f"- **用户名**: {system_info.username}")
+        content.append("")
+
+        # CPU拓扑
+        topology = system_info.cpu_topology
+        if topology:
+            content.append("### CPU拓扑")
+            content.append(f"- **Socket数**: {topology.sockets}")
+            content.append(f"- **物理核心数**: {topology.physical_cores}")
+            content.append(f"- **逻辑CPU数**: {topology.logical_cpus}")
+            content.append(f"- **每核心线程数**: {topology.threads_per_core}")
+            content.append(f"- **NUMA节点数**: {len(topology.numa_nodes)}")
+            for node in topology.numa_nodes:
+                memory = f"{node.memory_total / (1024**3):.1f} GB" if node.memory_total else "未知"
+                content.append(f"  - 节点 {node.id}: {len(node.cpus)} 个CPU, 内存 {memory}")
+            for cache in topology.caches:
+                size = f"{cache.size // 1024} KB" if cache.size else "未知"
+                content.append(f"- **L{cache.level} {cache.type}缓存**: {size} × {cache.instances}")
+            content.append("")
+
+        # 内存信息
+        memory_total_gb = system_info.memory_total / (1024**3)
+        memory_available_gb = system_info.memory_available / (1024**3)
+        memory_used_gb = memory_total_gb - memory_available_gb
+        memory_usage_percent = (memory_used_gb / memory_total_gb) * 100
+
+        content.append("### 内存信息")
+        content.append(f"- **总内存**: {memory_total_gb:.1f} GB")
+        content.append(f"- **可用内存**: {memory_available_gb:.1f} GB")
+        content.append(f"- **已用内存**: {memory_used_gb:.1f} GB")
+        content.append(f"- **内存使用率**: {memory_usage_percent:.1f}%")
+        content.append("")
+
+        return self._join(content)
+
+    def begin_results(self) -> str:
+        return self._join(["## 测试结果详情", ""])
+
+    def category(self, name: str) -> str:
+        return self._join([f"### {name}", ""])
+
+    def result(self, result: TestResult) -> str:
+        content = []
+        status_icon = self.STATUS_ICONS.get(result.status.value, "❓")
+
+        content.append(f"#### {status_icon} {result.test_item_name}")
+        content.append("")
+
+        # 基本信息
+        content.append(f"- **状态**: {result.status.value}")
+        if result.duration is not None:
+            content.append(f"- **执行时间**: {result.duration:.2f} 秒")
+        if result.exit_code is not None:
+            content.append(f"- **退出代码**: {result.exit_code}")
+        if result.triage:
+            content.append(f"- **预分类**: {result.triage}")
+        content.append("")
+
+        # 输出结果
+        if result.output:
+            content.append("**输出**:")
+            content.append("```")
+            content.append(result.output.strip())
+            content.append("```")
+            content.append("")
+
+        # 错误信息
+        if result.error:
+            content.append("**错误**:")
+            content.append("```")
+            content.append(result.error.strip())
+            content.append("```")
+            content.append("")
+
+        # 原始日志
+        if self.config.include_raw_logs and result.raw_log and result.raw_log != result.output:
+            content.append("**原始日志**:")
+            content.append("```")
+            content.append(result.raw_log.strip())
+            content.append("```")
+            content.append("")
+
+        # LLM分析结果
+        if result.analyzed_summary and self.config.include_analysis:
+            content.append("**分析**:")
+            content.append(result.analyzed_summary)
+            content.append("")
+
+        return self._join(content)
+
+    def end_results(self) -> str:
+        return ""
+
+    def closing(self, test_results: TestExecutionResult) -> str:
+        content = []
+
+        # 拓扑放置对比
+        content.extend(self._placement_section(test_results))
+
+        # 整体分析
+        if test_results.overall_summary and self.config.include_analysis:
+            content.append("## 整体分析")
+            content.append("")
+            content.append(test_results.overall_summary)
+            content.append("")
+
+        # 建议和总结
+        content.extend(self._recommendations_section(test_results))
+
+        return self._join(content)
+
+    def end(self) -> str:
+        return ""
+
+    def _placement_section(self, test_results: TestExecutionResult) -> List[str]:
+        """生成按核心/NUMA节点绑定执行的结果对比部分"""
+        groups = {}
+        for result in test_results.test_results:
+            if result.placement:
+                groups.setdefault(result.placement.get("group", result.test_item_id), []).append(result)
+
+        if not groups:
+            return []
+
+        content = []
+        content.append("## 拓扑放置结果")
+        content.append("")
+
+        for group, results in groups.items():
+            content.append(f"### {group}")
+            content.append("")
+            content.append("| 位置 | CPU | 状态 | 执行时间(秒) |")
+            content.append("|------|-----|------|--------------|")
+            for result in results:
+                placement = result.placement
+                if placement.get("mode") == "per_numa_node":
+                    location = f"NUMA node {placement.get('node')}"
+                else:
+                    location = f"socket {placement.get('socket')} core {placement.get('core')}"
+                cpus = ",".join(str(cpu) for cpu in placement.get("cpus", []))
+                duration = f"{result.duration:.2f}" if result.duration is not None else "-"
+                content.append(f"| {location} | {cpus} | {result.status.value} | {duration} |")
+            content.append("")
+
+            # 各位置耗时差异过大通常意味着NUMA/BIOS配置问题或核心降频
+            durations = [r.duration for r in results if r.status.value == "completed" and r.duration]
+            if len(durations) > 1:
+                spread = max(durations) / min(durations)
+                content.append(f"- **最慢/最快耗时比**: {spread:.2f}")
+                if spread > 1.2:
+                    content.append("- ⚠️ 不同位置之间性能差异超过20%，建议检查NUMA、内存通道和BIOS电源配置")
+                content.append("")
+
+        return content
+
+    def _recommendations_section(self, test_results: TestExecutionResult) -> List[str]:
+        """生成建议和总结部分"""
+        content = []
+        content.append("## 建议和总结")
+        content.append("")
+
+        # 基于测试结果生成建议
+        failed_tests = [r for r in test_results.test_results if r.status.value == "failed"]
+
+        if failed_tests:
+            content.append("### 需要关注的问题")
+            content.append("")
+            for test in failed_tests:
+                content.append(f"- **{test.test_item_name}**: 测试失败，建议检查相关配置")
+            content.append("")
+
+        # 性能建议
+        memory_usage = (test_results.system_info.memory_total - test_results.system_info.memory_available) / test_results.system_info.memory_total
+        if memory_usage > 0.8:
+            content.append("### 性能建议")
+            content.append("")
+            content.append("- 内存使用率较高，建议关闭不必要的应用程序")
+            content.append("- 考虑增加系统内存或优化内存使用")
+            content.append("")
+
+        # 安全建议
+        content.append("### 安全建议")
+        content.append("")
+        content.append("- 定期更新系统和应用程序")
+        content.append("- 启用防火墙和安全功能")
+        content.append("- 定期备份重要数据")
+        content.append("- 使用强密码和双因素认证")
+        content.append("")
+
+        # 维护建议
+        content.append("### 维护建议")
+        content.append("")
+        content.append("- 定期清理临时文件和缓存")
+        content.append("- 监控磁盘空间使用情况")
+        content.append("- 定期检查系统日志")
+        content.append("- 保持软件版本更新")
+        content.append("")
+
+        return content
+
+
+# 报告中允许的链接协议，其余（javascript:、data:等）替换为空链接
+SAFE_URL_SCHEMES = {"http", "https", "ftp", "mailto"}
+
+
+def _safe_url(url: str) -> bool:
+    # 浏览器会忽略协议中的空白和控制字符（java\tscript:）
+    cleaned = re.sub(r"[\x00-\x20]", "", html.unescape(url))
+    match = re.match(r"^([a-zA-Z][a-zA-Z0-9+.-]*):", cleaned)
+    return match is None or match.group(1).lower() in SAFE_URL_SCHEMES
+
+
+class _SafeLinks(Treeprocessor):
+    def run(self, root):
+        for element in root.iter():
+            for attribute in ("href", "src"):
+                value = element.get(attribute)
+                if value is not None and not _safe_url(value):
+                    element.set(attribute, "#")
+
+
+class _EscapeHTML(Extension):
+    """把Markdown中的原始HTML当作文本转义，并去掉不安全协议的链接"""
+
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        md.treeprocessors.register(_SafeLinks(md), 'safe_links', 0)
+
+
+class HTMLRenderer(MarkdownRenderer):
+    """HTML报告渲染器，逐段把Markdown片段转换为HTML
+
+    片段中包含命令输出和LLM分析等不可信内容，其中的原始HTML一律转义，不会被浏览器执行。
+    """
+
+    extension = ".html"
+    media_type = "text/html"
+
+    DEFAULT_STYLES = {
+        "body": {"font-family": "-apple-system, 'PingFang SC', 'Microsoft YaHei', sans-serif",
+                 "max-width": "960px", "margin": "0 auto", "padding": "24px", "line-height": "1.6"},
+        "pre": {"background": "#f6f8fa", "padding": "12px", "overflow-x": "auto"},
+        "table": {"border-collapse": "collapse"},
+        "th, td": {"border": "1px solid #d0d7de", "padding": "4px 8px"}
+    }
+
+    def _convert(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        return markdown.markdown(chunk, extensions=['fenced_code', 'tables', _EscapeHTML()]) + "\n"
+
+    def _styles(self) -> str:
+        styles = dict(self.DEFAULT_STYLES)
+        styles.update(self.config.custom_styles)
+        rules = []
+        for selector, properties in styles.items():
+            if isinstance(properties, dict):
+                body = "; ".join(f"{key}: {value}" for key, value in properties.items())
+                rules.append(f"{selector} {{ {body} }}")
+            else:
+                rules.append(f"{selector} {{ {properties} }}")
+        return "\n".join(rules)
+
+    def _document_head(self, title: str) -> str:
+        return (
+            "<!DOCTYPE html>\n<html lang=\"zh-CN\">\n<head>\n<meta charset=\"utf-8\">\n"
+            f"<title>{html.escape(title)}</title>\n<style>\n{self._styles()}\n</style>\n</head>\n<body>\n"
+        )
+
+    def begin(self, test_results: TestExecutionResult) -> str:
+        return self._document_head(f"系统测试报告 {test_results.execution_id}") + self._convert(super().begin(test_results))
+
+    def begin_partial(self, test_plan: TestPlan) -> str:
+        return self._document_head(f"系统测试报告 {test_plan.id}") + self._convert(super().begin_partial(test_plan))
+
+    def system_info(self, system_info: SystemInfo) -> str:
+        return self._convert(super().system_info(system_info))
+
+    def begin_results(self) -> str:
+        return self._convert(super().begin_results())
+
+    def category(self, name: str) -> str:
+        return self._convert(super().category(name))
+
+    def result(self, result: TestResult) -> str:
+        return self._convert(super().result(result))
+
+    def closing(self, test_results: TestExecutionResult) -> str:
+        return self._convert(super().closing(test_results))
+
+    def end(self) -> str:
+        return "</body>\n</html>\n"
+
+
+class JSONRenderer(ReportRenderer):
+    """JSON报告渲染器，test_results数组按结果逐个写出"""
+
+    extension = ".json"
+    media_type = "application/json"
+
+    def __init__(self, config: ReportConfig):
+        super().__init__(config)
+        self._results_written = 0
+
+    @staticmethod
+    def _field(key: str, value: Any) -> str:
+        return f"{json.dumps(key)}: {json.dumps(value, ensure_ascii=False, default=str)},\n"
+
+    def begin(self, test_results: TestExecutionResult) -> str:
+        summary = test_results.model_dump(
+            mode="json", exclude={"test_results", "system_info", "overall_summary"}
+        )
+        return "{\n" + self._field("report_generated_at", datetime.now().isoformat()) + "".join(
+            self._field(key, value) for key, value in summary.items()
+        )
+
+    def begin_partial(self, test_plan: TestPlan) -> str:
+        return "{\n" + self._field("status", "running") + self._field("test_plan_id", test_plan.id) + \
+            self._field("started_at", datetime.now().isoformat())
+
+    def system_info(self, system_info: SystemInfo) -> str:
+        return self._field("system_info", system_info.model_dump(mode="json"))
+
+    def begin_results(self) -> str:
+        return '"test_results": [\n'
+
+    def category(self, name: str) -> str:
+        return ""
+
+    def result(self, result: TestResult) -> str:
+        exclude = set()
+        if not self.config.include_raw_logs:
+            exclude.add("raw_log")
+        if not self.config.include_analysis:
+            exclude.add("analyzed_summary")
+        separator = ",\n" if self._results_written else ""
+        self._results_written += 1
+        return separator + json.dumps(result.model_dump(mode="json", exclude=exclude), ensure_ascii=False)
+
+    def end_results(self) -> str:
+        return "\n],\n"
+
+    def closing(self, test_results: TestExecutionResult) -> str:
+        if test_results.overall_summary and self.config.include_analysis:
+            return self._field("overall_summary", test_results.overall_summary)
+        return ""
+
+    def end(self) -> str:
+        return '"format": "sysscope-report/v1"\n}\n'
+
+
+RENDERERS = {
+    "markdown": MarkdownRenderer,
+    "html": HTMLRenderer,
+    "json": JSONRenderer
+}
+
+
+def get_renderer(output_format: str, config: ReportConfig) -> ReportRenderer:
+    """按输出格式创建渲染器，每份报告使用独立的实例"""
+    renderer_class = RENDERERS.get((output_format or "markdown").lower())
+    if renderer_class is None:
+        raise ValueError(f"Unsupported report format: {output_format}. Supported: {', '.join(RENDERERS)}")
+    return renderer_class(config)
+
+
+def media_type_for(filename: str) -> Optional[str]:
+    """根据报告文件扩展名返回媒体类型"""
+    for renderer_class in RENDERERS.values():
+        if filename.endswith(renderer_class.extension):
+            return renderer_class.media_type
+    return None
+
+
+def _format_change(change: ValueChange) -> str:
+    """格式化一个值的变化"""
+    text = f"{change.base} → {change.target}"
+    if change.delta is not None:
+        text += f" ({change.delta:+.4g}"
+        text += f", {change.delta_percent:+.1f}%)" if change.delta_percent is not None else ")"
+    return text
+
+
+def render_diff_markdown(diff: ExecutionDiff) -> str:
+    """把两次执行的差异渲染为Markdown"""
+    icons = MarkdownRenderer.STATUS_ICONS
+    content = []
+    content.append("# 执行差异报告")
+    content.append("")
+    content.append(f"- **基准执行**: {diff.base_execution_id} ({diff.base_started_at.strftime('%Y-%m-%d %H:%M:%S')})")
+    content.append(f"- **对比执行**: {diff.target_execution_id} ({diff.target_started_at.strftime('%Y-%m-%d %H:%M:%S')})")
+    content.append("")
+
+    content.append("## 执行统计")
+    content.append("")
+    for change in diff.summary_changes:
+        content.append(f"- **{change.name}**: {_format_change(change)}")
+    content.append("")
+
+    if diff.tests_added or diff.tests_removed:
+        content.append("## 测试项变化")
+        content.append("")
+        for test_id in diff.tests_added:
+            content.append(f"- ➕ {test_id}")
+        for test_id in diff.tests_removed:
+            content.append(f"- ➖ {test_id}")
+        content.append("")
+
+    status_changes = [test_diff for test_diff in diff.test_diffs if test_diff.status_changed]
+    if status_changes:
+        content.append("## 状态变化")
+        content.append("")
+        for test_diff in status_changes:
+            base_icon = icons.get(test_diff.base_status.value, "❓")
+            target_icon = icons.get(test_diff.target_status.value, "❓")
+            content.append(f"- **{test_diff.test_item_name}**: {base_icon} {test_diff.base_status.value} → {target_icon} {test_diff.target_status.value}")
+        content.append("")
+
+    content.append("## 耗时与指标变化")
+    content.append("")
+    content.append("| 测试项目 | 耗时 (秒) | 指标变化数 |")
+    content.append("|---|---|---|")
+    for test_diff in diff.test_diffs:
+        duration = _format_change(test_diff.duration) if test_diff.duration else "-"
+        content.append(f"| {test_diff.test_item_name} | {duration} | {len(test_diff.metric_changes)} |")
+    content.append("")
+
+    for test_diff in diff.test_diffs:
+        if not test_diff.metric_changes:
+            continue
+        content.append(f"### {test_diff.test_item_name}")
+        content.append("")
+        for change in test_diff.metric_changes:
+            content.append(f"- `{change.name}`: {_format_change(change)}")
+        content.append("")
+
+    if diff.system_changes:
+        content.append("## 系统信息变化")
+        content.append("")
+        for change in diff.system_changes:
+            content.append(f"- **{change.name}**: {_format_change(change)}")
+        content.append("")
+
+    return "\n".join(content) + "\n"
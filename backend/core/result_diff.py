@@ -0,0 +1,144 @@
+from typing import Dict, Any, List
+from models.schemas import (
+    TestExecutionResult, TestResult, SystemInfo, ExecutionDiff, TestResultDiff, ValueChange
+)
+from core.tracing import tracer
+
+# 列表元素中用作稳定key的字段，避免按下标对齐时因顺序变化产生误报
+LIST_ITEM_KEYS = ("name", "mountpoint", "device", "pid", "id")
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def value_change(name: str, base: Any, target: Any) -> ValueChange:
+    """构建一个值的变化，两端都是数值时计算差值和百分比"""
+    change = ValueChange(name=name, base=base, target=target)
+    if _is_number(base) and _is_number(target):
+        change.delta = target - base
+        if base:
+            change.delta_percent = round((target - base) / abs(base) * 100, 2)
+    return change
+
+
+def flatten_metrics(data: Any, prefix: str = "") -> Dict[str, float]:
+    """把structured_data中的数值叶子展开为 a.b[key].c 形式的路径"""
+    metrics: Dict[str, float] = {}
+    if _is_number(data):
+        metrics[prefix] = data
+    elif isinstance(data, dict):
+        for key, value in data.items():
+            metrics.update(flatten_metrics(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(data, list):
+        for index, value in enumerate(data):
+            key = str(index)
+            if isinstance(value, dict):
+                key = next((str(value[k]) for k in LIST_ITEM_KEYS if k in value), key)
+            metrics.update(flatten_metrics(value, f"{prefix}[{key}]"))
+    return metrics
+
+
+def system_facts(system_info: SystemInfo) -> Dict[str, Any]:
+    """提取用于对比的系统事实，忽略可用内存、已用磁盘等每次都会变化的值"""
+    facts: Dict[str, Any] = {
+        "system": system_info.system,
+        "release": system_info.release,
+        "version": system_info.version,
+        "machine": system_info.machine,
+        "processor": system_info.processor,
+        "cpu_count": system_info.cpu_count,
+        "memory_total": system_info.memory_total,
+        "hostname": system_info.hostname
+    }
+
+    topology = system_info.cpu_topology
+    if topology:
+        facts["cpu_topology.sockets"] = topology.sockets
+        facts["cpu_topology.physical_cores"] = topology.physical_cores
+        facts["cpu_topology.logical_cpus"] = topology.logical_cpus
+        facts["cpu_topology.numa_nodes"] = len(topology.numa_nodes)
+
+    for mountpoint, usage in system_info.disk_usage.items():
+        if isinstance(usage, dict):
+            facts[f"disks[{mountpoint}].total"] = usage.get("total")
+            facts[f"disks[{mountpoint}].device"] = usage.get("device")
+            facts[f"disks[{mountpoint}].fstype"] = usage.get("fstype")
+
+    for interface in system_info.network_interfaces:
+        name = interface.get("name")
+        if not name:
+            continue
+        addresses = sorted(str(addr.get("address")) for addr in interface.get("addresses", []))
+        facts[f"network[{name}].addresses"] = ", ".join(addresses)
+        stats = interface.get("stats") or {}
+        for key in ("isup", "speed", "mtu"):
+            if key in stats:
+                facts[f"network[{name}].{key}"] = stats[key]
+
+    return facts
+
+
+def diff_system_info(base: SystemInfo, target: SystemInfo) -> List[ValueChange]:
+    """对比两次执行的系统信息，新增或消失的磁盘/网卡对应一端为None"""
+    base_facts, target_facts = system_facts(base), system_facts(target)
+    changes = []
+    for name in sorted(set(base_facts) | set(target_facts)):
+        base_value, target_value = base_facts.get(name), target_facts.get(name)
+        if base_value != target_value:
+            changes.append(value_change(name, base_value, target_value))
+    return changes
+
+
+def diff_test_result(base: TestResult, target: TestResult) -> TestResultDiff:
+    """对比同一测试项在两次执行中的状态、耗时和指标"""
+    diff = TestResultDiff(
+        test_item_id=target.test_item_id,
+        test_item_name=target.test_item_name,
+        base_status=base.status,
+        target_status=target.status,
+        status_changed=base.status != target.status
+    )
+    if base.duration is not None and target.duration is not None:
+        diff.duration = value_change("duration", base.duration, target.duration)
+
+    base_metrics = flatten_metrics(base.structured_data or {})
+    target_metrics = flatten_metrics(target.structured_data or {})
+    for name in sorted(set(base_metrics) & set(target_metrics)):
+        if base_metrics[name] != target_metrics[name]:
+            diff.metric_changes.append(value_change(name, base_metrics[name], target_metrics[name]))
+    return diff
+
+
+@tracer.traced("result_diff.diff")
+def diff_executions(base: TestExecutionResult, target: TestExecutionResult) -> ExecutionDiff:
+    """计算两次执行的结构化差异"""
+    base_results = {result.test_item_id: result for result in base.test_results}
+    target_results = {result.test_item_id: result for result in target.test_results}
+
+    test_diffs = [
+        diff_test_result(base_results[test_id], result)
+        for test_id, result in target_results.items() if test_id in base_results
+    ]
+    # 状态变化排在前面，其余按耗时变化幅度排序
+    test_diffs.sort(key=lambda diff: (
+        not diff.status_changed,
+        -abs(diff.duration.delta) if diff.duration and diff.duration.delta is not None else 0
+    ))
+
+    summary_changes = [
+        value_change(name, getattr(base, name), getattr(target, name))
+        for name in ("total_tests", "passed_tests", "failed_tests", "skipped_tests", "execution_time")
+    ]
+
+    return ExecutionDiff(
+        base_execution_id=base.execution_id,
+        target_execution_id=target.execution_id,
+        base_started_at=base.started_at,
+        target_started_at=target.started_at,
+        tests_added=[test_id for test_id in target_results if test_id not in base_results],
+        tests_removed=[test_id for test_id in base_results if test_id not in target_results],
+        test_diffs=test_diffs,
+        summary_changes=summary_changes,
+        system_changes=diff_system_info(base.system_info, target.system_info)
+    )
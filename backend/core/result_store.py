@@ -0,0 +1,244 @@
+import os
+import io
+import csv
+import json
+import fcntl
+import asyncio
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterator
+from models.schemas import TestExecutionResult, TestResult
+from core.retention import open_maybe_compressed, exists_maybe_compressed, ARCHIVE_SUFFIX
+from core.blob_store import BlobStore, referenced_hashes
+
+# CSV导出的列，一行对应一个TestResult
+CSV_COLUMNS = [
+    "execution_id", "test_plan_id", "hostname", "test_item_id", "test_item_name", "status",
+    "start_time", "end_time", "duration", "exit_code", "output_bytes", "error", "triage"
+]
+
+
+class ResultStore:
+    """结构化执行结果存储
+
+    每次执行在结果目录下写出 <execution_id>.json（完整结果）、
+    <execution_id>.ndjson（每行一个TestResult）和 <execution_id>.csv，
+    并在 index.ndjson 中追加一行摘要，用于按时间范围查询和导出。
+    被保留策略压缩为 .gz 的文件在读取时透明解压。
+    output和raw_log保存在按内容寻址的BlobStore中，结果文件只引用哈希，读取时还原。
+    """
+
+    FORMATS = ["json", "ndjson", "csv"]
+
+    def __init__(self, base_path: str, blobs: Optional[BlobStore] = None):
+        self.base_path = base_path
+        self.index_path = os.path.join(base_path, "index.ndjson")
+        # 索引重写会替换文件，跨进程锁加在独立的锁文件上
+        self.index_lock_path = self.index_path + ".lock"
+        self._lock = threading.Lock()
+        if not os.path.exists(self.base_path):
+            os.makedirs(self.base_path)
+        self.blobs = blobs or BlobStore(os.path.join(base_path, "blobs"))
+
+    @contextmanager
+    def _index_lock(self):
+        """索引的追加和重写互斥：线程锁覆盖本进程，flock覆盖WORKERS大于1时的其他worker"""
+        with self._lock:
+            with open(self.index_lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def path_for(self, execution_id: str, fmt: str) -> str:
+        """结果文件路径"""
+        if os.path.basename(execution_id) != execution_id:
+            raise ValueError(f"Invalid execution id: {execution_id}")
+        return os.path.join(self.base_path, f"{execution_id}.{fmt}")
+
+    async def save(self, test_results: TestExecutionResult) -> Dict[str, str]:
+        """在线程中写出所有格式并更新索引，返回各格式的文件路径"""
+        return await asyncio.to_thread(self._save, test_results)
+
+    def _save(self, test_results: TestExecutionResult) -> Dict[str, str]:
+        execution_id = test_results.execution_id
+        hostname = test_results.system_info.hostname
+        paths = {fmt: self.path_for(execution_id, fmt) for fmt in self.FORMATS}
+        stored = test_results.model_copy(update={"test_results": self.blobs.store_results(test_results.test_results)})
+
+        with open(paths["json"], 'w', encoding='utf-8') as f:
+            f.write(stored.model_dump_json())
+
+        with open(paths["ndjson"], 'w', encoding='utf-8') as f:
+            for result in stored.test_results:
+                f.write(self._result_line(result, test_results))
+
+        with open(paths["csv"], 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for result in test_results.test_results:
+                writer.writerow(self._csv_row(result, test_results))
+
+        entry = {
+            "execution_id": execution_id,
+            "test_plan_id": test_results.test_plan_id,
+            "hostname": hostname,
+            "started_at": test_results.started_at.isoformat(),
+            "completed_at": test_results.completed_at.isoformat(),
+            "total_tests": test_results.total_tests,
+            "passed_tests": test_results.passed_tests,
+            "failed_tests": test_results.failed_tests,
+            "skipped_tests": test_results.skipped_tests,
+            "execution_time": test_results.execution_time
+        }
+        with self._index_lock():
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        return paths
+
+    @staticmethod
+    def _result_line(result: TestResult, test_results: TestExecutionResult) -> str:
+        record = result.model_dump(mode="json")
+        record["execution_id"] = test_results.execution_id
+        record["test_plan_id"] = test_results.test_plan_id
+        record["hostname"] = test_results.system_info.hostname
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    @staticmethod
+    def _csv_row(result: TestResult, test_results: TestExecutionResult) -> List[Any]:
+        return [
+            test_results.execution_id,
+            test_results.test_plan_id,
+            test_results.system_info.hostname,
+            result.test_item_id,
+            result.test_item_name,
+            result.status.value,
+            result.start_time.isoformat(),
+            result.end_time.isoformat() if result.end_time else "",
+            result.duration if result.duration is not None else "",
+            result.exit_code if result.exit_code is not None else "",
+            len(result.output.encode('utf-8')),
+            result.error or "",
+            result.triage or ""
+        ]
+
+    def list_executions(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        hostname: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """按开始时间范围和主机名筛选索引中的执行记录（按时间升序）"""
+        if not os.path.exists(self.index_path):
+            return []
+
+        entries = []
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                started_at = datetime.fromisoformat(entry["started_at"])
+                if start and started_at < start:
+                    continue
+                if end and started_at > end:
+                    continue
+                if hostname and entry.get("hostname") != hostname:
+                    continue
+                entries.append(entry)
+
+        entries.sort(key=lambda entry: entry["started_at"])
+        return entries
+
+    def load(self, execution_id: str) -> TestExecutionResult:
+        """加载一次执行的完整结构化结果"""
+        path = self.path_for(execution_id, "json")
+        if not exists_maybe_compressed(path):
+            raise FileNotFoundError(f"Execution not found: {execution_id}")
+        with open_maybe_compressed(path, 'r', encoding='utf-8') as f:
+            execution = TestExecutionResult.model_validate_json(f.read())
+        self.blobs.load_results(execution.test_results)
+        return execution
+
+    def _hydrate_line(self, line: bytes) -> bytes:
+        """ndjson导出时把哈希引用还原为内容"""
+        record = json.loads(line)
+        for field, hash_field in (("output", "output_hash"), ("raw_log", "raw_log_hash")):
+            if record.get(hash_field) and not record.get(field):
+                try:
+                    record[field] = self.blobs.get(record[hash_field])
+                except FileNotFoundError:
+                    continue
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+
+    def remove_from_index(self, execution_ids: List[str]) -> int:
+        """从索引中删除已被保留策略清理的执行，返回删除的条目数"""
+        removed_ids = set(execution_ids)
+        if not removed_ids or not os.path.exists(self.index_path):
+            return 0
+
+        def keep(line: str) -> bool:
+            try:
+                return json.loads(line).get("execution_id") not in removed_ids
+            except json.JSONDecodeError:
+                return bool(line.strip())
+
+        # 持有跨进程锁完成读取、写临时文件和替换，其他worker的追加会等到替换之后写入新文件
+        with self._index_lock():
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+            kept = [line for line in lines if keep(line)]
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as out:
+                out.writelines(kept)
+            os.replace(tmp_path, self.index_path)
+        return len(lines) - len(kept)
+
+    def collect_blobs(self, grace_seconds: float = 3600) -> int:
+        """清理不再被任何执行结果引用的blob（执行结果被保留策略删除之后）"""
+        referenced = set()
+        for name in os.listdir(self.base_path):
+            original = name[:-len(ARCHIVE_SUFFIX)] if name.endswith(ARCHIVE_SUFFIX) else name
+            if not original.endswith(".json"):
+                continue
+            try:
+                with open_maybe_compressed(os.path.join(self.base_path, original), 'r', encoding='utf-8') as f:
+                    execution = TestExecutionResult.model_validate_json(f.read())
+            except (OSError, ValueError):
+                # 无法确认引用关系时不做清理
+                return 0
+            referenced |= referenced_hashes(execution.test_results)
+        return self.blobs.collect_garbage(referenced, grace_seconds)
+
+    def iter_export(
+        self,
+        fmt: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        hostname: Optional[str] = None
+    ) -> Iterator[bytes]:
+        """逐次执行流式导出时间范围内的结果，不在内存中合并全部数据"""
+        if fmt not in ("ndjson", "csv"):
+            raise ValueError(f"Unsupported export format: {fmt}")
+
+        if fmt == "csv":
+            header = io.StringIO()
+            csv.writer(header).writerow(CSV_COLUMNS)
+            yield header.getvalue().encode('utf-8')
+
+        for entry in self.list_executions(start, end, hostname):
+            path = self.path_for(entry["execution_id"], fmt)
+            if not exists_maybe_compressed(path):
+                continue
+            with open_maybe_compressed(path, 'rb') as f:
+                if fmt == "csv":
+                    # 跳过每个文件自带的表头
+                    f.readline()
+                for line in f:
+                    yield self._hydrate_line(line) if fmt == "ndjson" and line.strip() else line
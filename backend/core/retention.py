@@ -0,0 +1,233 @@
+import os
+import gzip
+import json
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+from core.logger import get_logger, fields
+from core.tracing import tracer
+
+logger = get_logger("retention")
+
+ARCHIVE_SUFFIX = ".gz"
+INDEX_FILENAME = "archive_index.json"
+# 条目文件的扩展名（报告渲染器和结果存储使用的格式），item_key只去掉这些扩展名
+ITEM_EXTENSIONS = (".md", ".html", ".json", ".ndjson", ".csv", ".txt")
+
+
+class RetentionPolicy:
+    """报告、结果和日志的保留策略，0表示不限制"""
+
+    def __init__(
+        self,
+        compress_after_days: float = 7,
+        max_age_days: float = 0,
+        max_count: int = 0,
+        max_total_mb: float = 0
+    ):
+        self.compress_after_days = compress_after_days
+        self.max_age_days = max_age_days
+        self.max_count = max_count
+        self.max_total_mb = max_total_mb
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        return cls(
+            compress_after_days=float(os.getenv("REPORT_RETENTION_COMPRESS_AFTER_DAYS", "7")),
+            max_age_days=float(os.getenv("REPORT_RETENTION_MAX_AGE_DAYS", "0")),
+            max_count=int(os.getenv("REPORT_RETENTION_MAX_COUNT", "0")),
+            max_total_mb=float(os.getenv("REPORT_RETENTION_MAX_TOTAL_MB", "0"))
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "compress_after_days": self.compress_after_days,
+            "max_age_days": self.max_age_days,
+            "max_count": self.max_count,
+            "max_total_mb": self.max_total_mb
+        }
+
+
+class ManagedDirectory:
+    """受保留策略管理的目录
+
+    matcher 决定哪些文件参与压缩和清理；同一个 stem（去掉扩展名和.gz）的文件
+    视为一个条目，例如同一次执行的 .json/.ndjson/.csv 会被一起清理。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        matcher: Callable[[str], bool],
+        timestamped_archives: bool = False,
+        on_removed: Optional[Callable[[List[str]], Any]] = None
+    ):
+        self.path = path
+        self.matcher = matcher
+        # 日志轮转文件名会被复用（app.log.1），压缩时需要在文件名中加入时间避免覆盖
+        self.timestamped_archives = timestamped_archives
+        # 清理后以被删除条目的key调用，用于同步目录自身的索引
+        self.on_removed = on_removed
+
+    def files(self) -> List[str]:
+        if not os.path.isdir(self.path):
+            return []
+        names = []
+        for name in os.listdir(self.path):
+            original = name[:-len(ARCHIVE_SUFFIX)] if name.endswith(ARCHIVE_SUFFIX) else name
+            if os.path.isfile(os.path.join(self.path, name)) and self.matcher(original):
+                names.append(name)
+        return names
+
+
+def item_key(name: str) -> str:
+    """同一条目的文件共用的key：去掉.gz和已知的格式扩展名，文件名中其余的点（如主机名）保留"""
+    if name.endswith(ARCHIVE_SUFFIX):
+        name = name[:-len(ARCHIVE_SUFFIX)]
+    stem, extension = os.path.splitext(name)
+    return stem if extension in ITEM_EXTENSIONS else name
+
+
+def open_maybe_compressed(path: str, mode: str = 'rb', encoding: Optional[str] = None):
+    """打开文件，原文件不存在时透明地读取已归档的.gz版本"""
+    if not os.path.exists(path) and os.path.exists(path + ARCHIVE_SUFFIX):
+        text_mode = 't' if 'b' not in mode else ''
+        return gzip.open(path + ARCHIVE_SUFFIX, mode.replace('t', '') + text_mode, encoding=encoding)
+    return open(path, mode, encoding=encoding)
+
+
+def exists_maybe_compressed(path: str) -> bool:
+    return os.path.exists(path) or os.path.exists(path + ARCHIVE_SUFFIX)
+
+
+class RetentionManager:
+    """压缩旧文件并按年龄、数量和总大小清理"""
+
+    def __init__(self, directories: List[ManagedDirectory], index_path: str, policy: Optional[RetentionPolicy] = None):
+        self.directories = directories
+        self.index_path = index_path
+        self.policy = policy or RetentionPolicy.from_env()
+        self._lock = threading.Lock()
+
+    # ---- 归档索引 ----
+
+    def load_index(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self, index: Dict[str, Dict[str, Any]]):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    # ---- 执行 ----
+
+    @tracer.traced("retention.run")
+    def run(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """执行一轮压缩和清理，返回本轮的统计"""
+        now = now or time.time()
+        with self._lock:
+            index = self.load_index()
+            summary = {"compressed": [], "deleted": [], "bytes_saved": 0, "bytes_deleted": 0}
+
+            for directory in self.directories:
+                self._compress(directory, now, index, summary)
+                self._prune(directory, now, index, summary)
+
+            self._save_index(index)
+
+        tracer.inc("retention_compressed_total", len(summary["compressed"]), help_text="Files compressed by retention")
+        tracer.inc("retention_deleted_total", len(summary["deleted"]), help_text="Files deleted by retention")
+        logger.info("Retention run finished", extra=fields(
+            compressed=len(summary["compressed"]), deleted=len(summary["deleted"]),
+            bytes_saved=summary["bytes_saved"], bytes_deleted=summary["bytes_deleted"]
+        ))
+        return summary
+
+    def _compress(self, directory: ManagedDirectory, now: float, index: Dict, summary: Dict):
+        if self.policy.compress_after_days <= 0:
+            return
+        cutoff = now - self.policy.compress_after_days * 86400
+        for name in directory.files():
+            if name.endswith(ARCHIVE_SUFFIX):
+                continue
+            path = os.path.join(directory.path, name)
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                continue
+
+            if directory.timestamped_archives:
+                stamp = datetime.fromtimestamp(stat.st_mtime).strftime("%Y%m%d_%H%M%S")
+                archive_name = f"{name}.{stamp}{ARCHIVE_SUFFIX}"
+            else:
+                archive_name = name + ARCHIVE_SUFFIX
+            archive_path = os.path.join(directory.path, archive_name)
+
+            try:
+                with open(path, 'rb') as src, gzip.open(archive_path + ".tmp", 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(archive_path + ".tmp", archive_path)
+                # 保留原始修改时间，后续按年龄清理时仍以内容产生的时间为准
+                os.utime(archive_path, (stat.st_atime, stat.st_mtime))
+                os.remove(path)
+            except OSError as e:
+                logger.warning("Failed to compress file", extra=fields(path=path, error=str(e)))
+                continue
+
+            compressed_size = os.path.getsize(archive_path)
+            index[os.path.join(directory.path, archive_name)] = {
+                "original_name": name,
+                "original_size": stat.st_size,
+                "compressed_size": compressed_size,
+                "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "archived_at": datetime.fromtimestamp(now).isoformat()
+            }
+            summary["compressed"].append(archive_path)
+            summary["bytes_saved"] += stat.st_size - compressed_size
+
+    def _prune(self, directory: ManagedDirectory, now: float, index: Dict, summary: Dict):
+        # 按条目聚合：mtime取条目内最新的文件，大小为条目内文件之和
+        items: Dict[str, Dict[str, Any]] = {}
+        for name in directory.files():
+            path = os.path.join(directory.path, name)
+            stat = os.stat(path)
+            key = name if directory.timestamped_archives else item_key(name)
+            item = items.setdefault(key, {"key": key, "paths": [], "mtime": 0.0, "size": 0})
+            item["paths"].append(path)
+            item["mtime"] = max(item["mtime"], stat.st_mtime)
+            item["size"] += stat.st_size
+
+        ordered = sorted(items.values(), key=lambda item: item["mtime"], reverse=True)
+        keep, remove = [], []
+        total_limit = self.policy.max_total_mb * 1024 * 1024
+        total = 0
+        for item in ordered:
+            too_old = self.policy.max_age_days > 0 and item["mtime"] < now - self.policy.max_age_days * 86400
+            too_many = self.policy.max_count > 0 and len(keep) >= self.policy.max_count
+            too_big = total_limit > 0 and total + item["size"] > total_limit
+            if too_old or too_many or too_big:
+                remove.append(item)
+            else:
+                keep.append(item)
+                total += item["size"]
+
+        for item in remove:
+            for path in item["paths"]:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning("Failed to delete file", extra=fields(path=path, error=str(e)))
+                    continue
+                index.pop(path, None)
+                summary["deleted"].append(path)
+            summary["bytes_deleted"] += item["size"]
+        if remove and directory.on_removed is not None:
+            directory.on_removed([item["key"] for item in remove])
@@ -0,0 +1,393 @@
+import os
+import json
+import random
+import socket
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Set, Callable, Awaitable
+from models.schemas import TestSchedule, TestPlan
+from core.logger import get_logger, fields
+from core.tracing import tracer
+from core.shared_state import SharedState, WORKER_ID
+
+logger = get_logger("scheduler")
+
+# 调度循环的最长休眠时间，保证手动修改时间后也能及时发现到期任务
+MAX_SLEEP_SECONDS = 60
+
+
+class CronExpression:
+    """最小的5段cron表达式实现：分 时 日 月 周
+
+    每段支持 *、数字、a-b 区间、a,b 列表和 /n 步长；周取0-7，0和7都表示周日。
+    日和周同时受限时按标准cron语义取并集。
+    """
+
+    FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Invalid cron expression (expected 5 fields): {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = [
+            self._parse_field(part, low, high) for part, (low, high) in zip(parts, self.FIELD_RANGES)
+        ]
+        self.weekdays = {0 if day == 7 else day for day in weekdays}
+        self.any_day = parts[2] == '*'
+        self.any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> Set[int]:
+        values = set()
+        for part in field.split(','):
+            step = 1
+            has_step = '/' in part
+            if has_step:
+                part, step_text = part.split('/', 1)
+                step = int(step_text)
+                if step <= 0:
+                    raise ValueError(f"Invalid cron step: {field}")
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-', 1))
+            else:
+                start = int(part)
+                end = high if has_step else start
+            if start < low or end > high or start > end:
+                raise ValueError(f"Cron field out of range: {field}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_match = moment.day in self.days
+        # cron中0为周日，Python中周一为0
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day and self.any_weekday:
+            return True
+        if self.any_day:
+            return weekday_match
+        if self.any_weekday:
+            return day_match
+        return day_match or weekday_match
+
+    def next_after(self, moment: datetime) -> datetime:
+        """返回严格晚于moment的下一个匹配时间（分钟精度）"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never matches: {self.expression}")
+
+
+class HostLocks:
+    """本机执行锁，防止同一主机上的测试执行互相重叠
+
+    测试总是在当前主机上执行，因此按本机主机名加锁，而不是按测试计划中记录的主机名
+    （计划可能在其他主机上生成，或多份计划记录了不同的主机名）。
+    进程内用asyncio.Lock排队；设置了共享状态时再持有一个按主机命名的租约，
+    使多个worker之间同样互斥，持有期间定期续期。
+    """
+
+    def __init__(
+        self,
+        state: Optional[SharedState] = None,
+        ttl: float = 60,
+        owner: str = WORKER_ID,
+        hostname: Optional[str] = None
+    ):
+        self._lock: Optional[asyncio.Lock] = None
+        self.state = state
+        self.ttl = ttl
+        self.owner = owner
+        self.hostname = hostname or socket.gethostname()
+
+    def get(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def locked(self) -> bool:
+        """本进程或其他worker是否正在本机上执行"""
+        if self.get().locked():
+            return True
+        if self.state is None:
+            return False
+        return await self.state.lease_owner(f"host:{self.hostname}") is not None
+
+    @asynccontextmanager
+    async def hold(self):
+        """持有本机执行锁，等待其他worker释放租约"""
+        async with self.get():
+            if self.state is None:
+                yield
+                return
+            lease = f"host:{self.hostname}"
+            while not await self.state.acquire_lease(lease, self.owner, self.ttl):
+                await asyncio.sleep(1)
+            renew = asyncio.create_task(self._renew(lease))
+            try:
+                yield
+            finally:
+                renew.cancel()
+                await asyncio.gather(renew, return_exceptions=True)
+                await self.state.release_lease(lease, self.owner)
+
+    async def _renew(self, lease: str):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            await self.state.acquire_lease(lease, self.owner, self.ttl)
+
+
+class Scheduler:
+    """进程内的定时测试调度器
+
+    定时计划持久化在JSON文件中；到期后通过runner在当前进程内执行，
+    复用已预热的测试引擎shell进程池和LLM连接。多worker部署时只有持有
+    调度租约的worker运行调度循环，其他worker修改计划后由refresh按文件
+    修改时间重新加载。
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[TestPlan], Awaitable[Dict[str, Any]]],
+        host_locks: HostLocks,
+        store_path: str = "data/schedules.json"
+    ):
+        self.runner = runner
+        self.host_locks = host_locks
+        self.store_path = store_path
+        self._schedules: Dict[str, TestSchedule] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._mtime: Optional[int] = None
+
+    # ---- 持久化 ----
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.store_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> Dict[str, TestSchedule]:
+        self._mtime = self._file_mtime()
+        if self._mtime is None:
+            return {}
+        with open(self.store_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {item["id"]: TestSchedule.model_validate(item) for item in data}
+
+    def _write(self, schedules: List[Dict[str, Any]]):
+        directory = os.path.dirname(self.store_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = self.store_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(schedules, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.store_path)
+        self._mtime = self._file_mtime()
+
+    async def _save(self):
+        schedules = [schedule.model_dump(mode="json") for schedule in self._schedules.values()]
+        await asyncio.to_thread(self._write, schedules)
+
+    async def refresh(self):
+        """文件被其他worker修改过时重新加载"""
+        if await asyncio.to_thread(self._file_mtime) != self._mtime:
+            self._schedules = await asyncio.to_thread(self._load)
+
+    # ---- 生命周期 ----
+
+    async def start(self):
+        """加载已保存的定时计划并启动调度循环"""
+        self._schedules = await asyncio.to_thread(self._load)
+        now = datetime.now()
+        for schedule in self._schedules.values():
+            if schedule.next_run_at is None or schedule.next_run_at < now:
+                schedule.next_run_at = self._next_run(schedule, now)
+        await self._save()
+        self._loop_task = asyncio.create_task(self._loop())
+        logger.info("Scheduler started", extra=fields(schedules=len(self._schedules)))
+
+    @property
+    def running(self) -> bool:
+        return self._loop_task is not None
+
+    def wake(self):
+        """唤醒调度循环，重新检查计划文件和到期时间"""
+        self._wakeup.set()
+
+    async def stop(self):
+        """停止调度循环并取消正在运行的定时任务"""
+        tasks = list(self._running.values())
+        if self._loop_task is not None:
+            tasks.append(self._loop_task)
+            self._loop_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---- 管理 ----
+
+    @staticmethod
+    def validate(schedule: TestSchedule):
+        """校验触发条件，cron和interval必须且只能设置一个"""
+        if bool(schedule.cron) == bool(schedule.interval_seconds):
+            raise ValueError("Exactly one of cron or interval_seconds must be set")
+        if schedule.cron:
+            CronExpression(schedule.cron)
+        elif schedule.interval_seconds <= 0:
+            raise ValueError("interval_seconds must be positive")
+        if schedule.jitter_seconds < 0:
+            raise ValueError("jitter_seconds must not be negative")
+
+    def list_schedules(self) -> List[TestSchedule]:
+        return sorted(self._schedules.values(), key=lambda schedule: schedule.created_at)
+
+    def get(self, schedule_id: str) -> Optional[TestSchedule]:
+        return self._schedules.get(schedule_id)
+
+    async def upsert(self, schedule: TestSchedule) -> TestSchedule:
+        """新增或更新定时计划"""
+        self.validate(schedule)
+        await self.refresh()
+        if not schedule.id:
+            schedule.id = f"schedule_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        existing = self._schedules.get(schedule.id)
+        if existing is not None:
+            schedule.created_at = existing.created_at
+            schedule.last_run_at = existing.last_run_at
+            schedule.last_status = existing.last_status
+            schedule.last_execution_id = existing.last_execution_id
+            schedule.last_error = existing.last_error
+        schedule.next_run_at = self._next_run(schedule, datetime.now())
+        self._schedules[schedule.id] = schedule
+        await self._save()
+        self._wakeup.set()
+        return schedule
+
+    async def remove(self, schedule_id: str) -> bool:
+        await self.refresh()
+        if self._schedules.pop(schedule_id, None) is None:
+            return False
+        await self._save()
+        self._wakeup.set()
+        return True
+
+    async def trigger(self, schedule_id: str) -> bool:
+        """立即执行一次定时计划，不影响下一次的计划时间"""
+        await self.refresh()
+        if schedule_id not in self._schedules:
+            return False
+        self._start_run(schedule_id)
+        return True
+
+    # ---- 调度 ----
+
+    @staticmethod
+    def _jitter(schedule: TestSchedule) -> timedelta:
+        """按计划ID取稳定的抖动偏移，使多个计划的启动时间错开且每次保持一致"""
+        if schedule.jitter_seconds <= 0:
+            return timedelta(0)
+        return timedelta(seconds=random.Random(schedule.id).uniform(0, schedule.jitter_seconds))
+
+    def _next_run(self, schedule: TestSchedule, after: datetime) -> datetime:
+        if schedule.cron:
+            base = CronExpression(schedule.cron).next_after(after)
+        else:
+            base = after + timedelta(seconds=schedule.interval_seconds)
+        return base + self._jitter(schedule)
+
+    async def _loop(self):
+        while True:
+            await self.refresh()
+            now = datetime.now()
+            due = [
+                schedule for schedule in self._schedules.values()
+                if schedule.enabled and schedule.next_run_at and schedule.next_run_at <= now
+            ]
+            for schedule in due:
+                # 从上一次的基准时间推算，避免抖动在每个周期上累积
+                next_run = self._next_run(schedule, schedule.next_run_at - self._jitter(schedule))
+                if next_run <= now:
+                    next_run = self._next_run(schedule, now)
+                schedule.next_run_at = next_run
+                self._start_run(schedule.id)
+            if due:
+                await self._save()
+
+            upcoming = [
+                schedule.next_run_at for schedule in self._schedules.values()
+                if schedule.enabled and schedule.next_run_at
+            ]
+            sleep = MAX_SLEEP_SECONDS
+            if upcoming:
+                sleep = min(sleep, max(0.0, (min(upcoming) - datetime.now()).total_seconds()))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=sleep)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start_run(self, schedule_id: str):
+        if schedule_id in self._running:
+            self._record_skip(self._schedules[schedule_id], "previous run still in progress")
+            return
+        task = asyncio.create_task(self._run(schedule_id))
+        self._running[schedule_id] = task
+        task.add_done_callback(lambda _: self._running.pop(schedule_id, None))
+
+    def _record_skip(self, schedule: TestSchedule, reason: str):
+        schedule.last_status = "skipped_overlap"
+        schedule.last_error = reason
+        tracer.inc("scheduler_runs_total", help_text="Scheduled test runs by outcome", status="skipped_overlap")
+        logger.warning("Scheduled run skipped", extra=fields(schedule_id=schedule.id, reason=reason))
+
+    async def _record_outcome(self, schedule_id: str, **values):
+        """记录执行结果：先重新加载，避免覆盖执行期间其他worker对计划的修改"""
+        await self.refresh()
+        schedule = self._schedules.get(schedule_id)
+        if schedule is None:
+            return
+        for key, value in values.items():
+            setattr(schedule, key, value)
+        await self._save()
+
+    async def _run(self, schedule_id: str):
+        schedule = self._schedules.get(schedule_id)
+        if schedule is None:
+            return
+
+        if await self.host_locks.locked():
+            self._record_skip(schedule, f"another run is in progress on {self.host_locks.hostname}")
+            await self._save()
+            return
+
+        logger.info("Scheduled run started", extra=fields(schedule_id=schedule.id, test_plan_id=schedule.test_plan.id))
+        outcome: Dict[str, Any] = {"last_run_at": datetime.now()}
+        with tracer.span("scheduler.run", schedule_id=schedule.id):
+            try:
+                result = await self.runner(schedule.test_plan)
+                outcome.update(last_status="completed", last_execution_id=result["test_results"].execution_id,
+                               last_error=None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                outcome.update(last_status="failed", last_error=str(e))
+                logger.error("Scheduled run failed", extra=fields(schedule_id=schedule.id, error=str(e)))
+
+        tracer.inc("scheduler_runs_total", help_text="Scheduled test runs by outcome", status=outcome["last_status"])
+        await self._record_outcome(schedule_id, **outcome)
@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional
+from core.logger import get_logger, fields
+
+logger = get_logger("shared_state")
+
+# 当前worker进程的标识，用于租约和任务归属
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SharedState(ABC):
+    """跨worker共享的状态接口
+
+    按namespace划分的键值存储（值为可JSON序列化的对象，可设置过期时间）以及
+    带过期时间的租约（用于选主和跨进程互斥）。单worker使用InProcessState，
+    多worker部署使用SQLiteState。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        await self.set_many(namespace, {key: value}, ttl)
+
+    @abstractmethod
+    async def set_many(self, namespace: str, values: Dict[str, Any], ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def items(self, namespace: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def clear(self, namespace: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """获取或续期租约，租约空闲、已过期或本来就属于owner时成功"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def release_lease(self, name: str, owner: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def lease_owner(self, name: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class InProcessState(SharedState):
+    """进程内实现，值经过JSON序列化保存，与SQLiteState的语义保持一致"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._leases: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _expired(expires_at: Optional[float]) -> bool:
+        return expires_at is not None and expires_at <= time.time()
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(namespace, {}).get(key)
+            if entry is None or self._expired(entry[1]):
+                return None
+            return json.loads(entry[0])
+
+    async def set_many(self, namespace: str, values: Dict[str, Any], ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl else None
+        encoded = {key: (json.dumps(value, ensure_ascii=False), expires_at) for key, value in values.items()}
+        with self._lock:
+            self._data.setdefault(namespace, {}).update(encoded)
+
+    async def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._data.get(namespace, {}).pop(key, None)
+
+    async def items(self, namespace: str) -> Dict[str, Any]:
+        with self._lock:
+            entries = list(self._data.get(namespace, {}).items())
+        return {key: json.loads(value) for key, (value, expires_at) in entries if not self._expired(expires_at)}
+
+    async def clear(self, namespace: str):
+        with self._lock:
+            self._data.pop(namespace, None)
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        with self._lock:
+            current = self._leases.get(name)
+            if current is not None and current[0] != owner and not self._expired(current[1]):
+                return False
+            self._leases[name] = (owner, time.time() + ttl)
+            return True
+
+    async def release_lease(self, name: str, owner: str):
+        with self._lock:
+            current = self._leases.get(name)
+            if current is not None and current[0] == owner:
+                del self._leases[name]
+
+    async def lease_owner(self, name: str) -> Optional[str]:
+        with self._lock:
+            current = self._leases.get(name)
+            if current is None or self._expired(current[1]):
+                return None
+            return current[0]
+
+
+class SQLiteState(SharedState):
+    """基于SQLite WAL的多进程实现
+
+    同一台机器上的多个worker共享一个数据库文件；WAL模式下读写互不阻塞，
+    每次调用在线程池中执行，每个线程持有自己的连接。
+    """
+
+    name = "sqlite"
+    # 每写入这么多次清理一次过期数据
+    PURGE_EVERY = 200
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "expires_at REAL, PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _get(self, namespace: str, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_many(self, namespace: str, values: Dict[str, Any], ttl: Optional[float]):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        rows = [(namespace, key, json.dumps(value, ensure_ascii=False), expires_at) for key, value in values.items()]
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)", rows)
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+
+    def _items(self, namespace: str) -> Dict[str, Any]:
+        rows = self._conn().execute(
+            "SELECT key, value FROM kv WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time())
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def _acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.owner = excluded.owner OR leases.expires_at <= ?",
+            (name, owner, now + ttl, now)
+        )
+        return cursor.rowcount > 0
+
+    def _lease_owner(self, name: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT owner FROM leases WHERE name = ? AND expires_at > ?", (name, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self._get, namespace, key)
+
+    async def set_many(self, namespace: str, values: Dict[str, Any], ttl: Optional[float] = None):
+        if values:
+            await asyncio.to_thread(self._set_many, namespace, values, ttl)
+
+    async def delete(self, namespace: str, key: str):
+        await asyncio.to_thread(
+            lambda: self._conn().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+        )
+
+    async def items(self, namespace: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._items, namespace)
+
+    async def clear(self, namespace: str):
+        await asyncio.to_thread(lambda: self._conn().execute("DELETE FROM kv WHERE namespace = ?", (namespace,)))
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        return await asyncio.to_thread(self._acquire_lease, name, owner, ttl)
+
+    async def release_lease(self, name: str, owner: str):
+        await asyncio.to_thread(
+            lambda: self._conn().execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+        )
+
+    async def lease_owner(self, name: str) -> Optional[str]:
+        return await asyncio.to_thread(self._lease_owner, name)
+
+    async def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+def create_shared_state() -> SharedState:
+    """按SHARED_STATE_BACKEND创建共享状态，WORKERS大于1时必须使用跨进程实现"""
+    backend = os.getenv("SHARED_STATE_BACKEND", "memory").lower()
+    workers = int(os.getenv("WORKERS", "1"))
+    if backend == "memory" and workers > 1:
+        logger.warning("In-process shared state cannot be used with multiple workers, using sqlite",
+                       extra=fields(workers=workers))
+        backend = "sqlite"
+    if backend == "sqlite":
+        return SQLiteState(os.getenv("SHARED_STATE_PATH", "data/shared_state.db"))
+    return InProcessState()
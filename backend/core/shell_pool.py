@@ -0,0 +1,247 @@
+import asyncio
+import os
+import shlex
+import signal
+import uuid
+from typing import Dict, Any, Optional, Set, Tuple, Callable
+
+
+class CommandStalled(Exception):
+    """命令超过stall_timeout没有任何新输出"""
+
+    def __init__(self, silence: float):
+        super().__init__(f"No output for {silence:.1f} seconds")
+        self.silence = silence
+
+
+class ShellWorkerError(Exception):
+    """Shell工作进程协议错误或进程异常退出"""
+
+
+class ShellWorker:
+    """常驻的bash工作进程，通过stdin管道接收命令
+
+    每条命令在子shell中执行，环境变量、工作目录等修改不会泄漏到下一条命令；
+    命令结束后工作进程向stdout和stderr各写一个带退出码的结束标记。
+    """
+
+    READ_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, cwd: str, env: Dict[str, str]):
+        self.cwd = cwd
+        self.env = env
+        self.commands_run = 0
+        self._token = uuid.uuid4().hex
+        self._marker = f"\0__SYSSCOPE_DONE_{self._token}:".encode()
+        self._process: Optional[asyncio.subprocess.Process] = None
+
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self):
+        """启动bash工作进程"""
+        self._process = await asyncio.create_subprocess_exec(
+            '/bin/bash', '--noprofile', '--norc', '-s',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.cwd,
+            env=self.env,
+            start_new_session=True
+        )
+
+    def _build_script(self, command: str) -> bytes:
+        """构建单条命令的管道协议脚本"""
+        delimiter = f"__SYSSCOPE_CMD_{self._token}"
+        done = f"__SYSSCOPE_DONE_{self._token}"
+        script = (
+            f"IFS= read -r -d '' __ss_cmd <<'{delimiter}'\n"
+            f"{command}\n"
+            f"{delimiter}\n"
+            f"( cd {shlex.quote(self.cwd)} 2>/dev/null; eval \"$__ss_cmd\" ) </dev/null\n"
+            f"__ss_rc=$?\n"
+            f"printf '\\000%s:%d\\n' '{done}' \"$__ss_rc\"\n"
+            f"printf '\\000%s:%d\\n' '{done}' \"$__ss_rc\" >&2\n"
+        )
+        return script.encode('utf-8')
+
+    async def _read_until_marker(
+        self,
+        reader: asyncio.StreamReader,
+        on_data: Optional[Callable[[], None]] = None
+    ) -> Tuple[bytes, int]:
+        """分块读取输出直到结束标记，返回输出内容和退出码；每读到数据调用一次on_data"""
+        buffer = bytearray()
+        search_from = 0
+        while True:
+            chunk = await reader.read(self.READ_CHUNK_SIZE)
+            if not chunk:
+                raise ShellWorkerError("Shell worker exited unexpectedly")
+            if on_data is not None:
+                on_data()
+            buffer.extend(chunk)
+            index = buffer.find(self._marker, search_from)
+            if index != -1:
+                tail_start = index + len(self._marker)
+                while b'\n' not in buffer[tail_start:]:
+                    chunk = await reader.read(self.READ_CHUNK_SIZE)
+                    if not chunk:
+                        raise ShellWorkerError("Shell worker exited unexpectedly")
+                    buffer.extend(chunk)
+                newline = buffer.index(b'\n', tail_start)
+                return bytes(buffer[:index]), int(buffer[tail_start:newline])
+            search_from = max(0, len(buffer) - len(self._marker))
+
+    async def run(self, command: str, timeout: int, stall_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """在工作进程中执行命令，返回与TestEngine._run_command相同的结果结构
+
+        设置了stall_timeout且超过该时长没有任何新输出时回收工作进程并抛出CommandStalled。
+        """
+        if not self.alive:
+            raise ShellWorkerError("Shell worker is not running")
+
+        self.commands_run += 1
+        self._process.stdin.write(self._build_script(command))
+        await self._process.stdin.drain()
+
+        loop = asyncio.get_running_loop()
+        started = last_output = loop.time()
+        max_silence = 0.0
+
+        def touch():
+            nonlocal last_output, max_silence
+            now = loop.time()
+            max_silence = max(max_silence, now - last_output)
+            last_output = now
+
+        reader = asyncio.ensure_future(asyncio.gather(
+            self._read_until_marker(self._process.stdout, touch),
+            self._read_until_marker(self._process.stderr, touch)
+        ))
+        try:
+            while not reader.done():
+                now = loop.time()
+                if now - started >= timeout:
+                    raise asyncio.TimeoutError()
+                if stall_timeout and now - last_output >= stall_timeout:
+                    raise CommandStalled(now - last_output)
+                deadline = started + timeout
+                if stall_timeout:
+                    deadline = min(deadline, last_output + stall_timeout)
+                await asyncio.wait({reader}, timeout=max(0.0, deadline - now))
+            (stdout, exit_code), (stderr, _) = reader.result()
+        except (asyncio.TimeoutError, CommandStalled) as e:
+            # 超时或卡住的命令可能仍在子shell中运行，直接回收整个工作进程
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+            await self.close()
+            if isinstance(e, CommandStalled):
+                raise
+            return {
+                'output': '',
+                'error': f'Command timed out after {timeout} seconds',
+                'exit_code': -1,
+                'raw_log': f'Command timed out after {timeout} seconds'
+            }
+        except BaseException:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+            raise
+
+        output = stdout.decode('utf-8', errors='ignore')
+        error_output = stderr.decode('utf-8', errors='ignore')
+
+        raw_log = output
+        if error_output:
+            raw_log += f"\nSTDERR:\n{error_output}"
+
+        return {
+            'output': output,
+            'error': error_output if exit_code != 0 else None,
+            'exit_code': exit_code,
+            'raw_log': raw_log,
+            # 结束标记也按输出计时，命令最后一段静默已包含在内
+            'max_silence': round(max_silence, 4)
+        }
+
+    async def close(self):
+        """终止工作进程及其所在进程组"""
+        if self._process is None:
+            return
+        if self._process.returncode is None:
+            try:
+                os.killpg(self._process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            try:
+                await asyncio.wait_for(self._process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+
+
+class ShellWorkerPool:
+    """常驻shell工作进程池
+
+    用于替代每条测试命令单独fork/exec一个/bin/bash，适合包含大量短命令的测试计划。
+    工作进程在执行max_commands条命令、超时或协议出错后自动回收。
+    """
+
+    def __init__(self, size: int = 2, max_commands: int = 100, cwd: Optional[str] = None):
+        self.size = max(1, size)
+        self.max_commands = max(1, max_commands)
+        self.cwd = cwd or os.getcwd()
+        # 启动时的环境快照，所有工作进程都从该环境启动
+        self.env = dict(os.environ)
+        self._workers: Set[ShellWorker] = set()
+        # 队列中为None表示空闲槽位，取出时再启动新的工作进程
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(None)
+
+    async def _acquire(self) -> ShellWorker:
+        worker = await self._idle.get()
+        if worker is not None and worker.alive:
+            return worker
+
+        worker = ShellWorker(self.cwd, self.env)
+        try:
+            await worker.start()
+        except Exception:
+            self._idle.put_nowait(None)
+            raise
+        self._workers.add(worker)
+        return worker
+
+    async def _release(self, worker: ShellWorker, healthy: bool):
+        if healthy and worker.alive and worker.commands_run < self.max_commands:
+            self._idle.put_nowait(worker)
+            return
+
+        self._workers.discard(worker)
+        await worker.close()
+        self._idle.put_nowait(None)
+
+    async def run(self, command: str, timeout: int, stall_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """从池中取出一个工作进程执行命令，命令卡住时抛出CommandStalled"""
+        worker = await self._acquire()
+        healthy = False
+        try:
+            result = await worker.run(command, timeout, stall_timeout)
+            healthy = True
+            return result
+        except ShellWorkerError as e:
+            return {
+                'output': '',
+                'error': str(e),
+                'exit_code': -1,
+                'raw_log': str(e)
+            }
+        finally:
+            await self._release(worker, healthy)
+
+    async def close(self):
+        """关闭所有工作进程"""
+        for worker in list(self._workers):
+            await worker.close()
+        self._workers.clear()
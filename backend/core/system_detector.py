@@ -5,7 +5,9 @@ import socket
 import os
 from datetime import datetime
 from typing import Dict, List, Any
-from models.schemas import SystemInfo
+from models.schemas import SystemInfo, CPUTopology, CPUCore, NumaNode, CacheInfo
+from core import linux_sysfs
+from core.tracing import tracer
 
 class SystemDetector:
     """系统信息检测器"""
@@ -13,6 +15,7 @@ class SystemDetector:
     def __init__(self):
         self.platform = platform.system().lower()
     
+    @tracer.traced("system.get_system_info")
     def get_system_info(self) -> SystemInfo:
         """获取完整的系统信息"""
         try:
@@ -23,7 +26,7 @@ class SystemDetector:
                 "release": platform.release(),
                 "version": platform.version(),
                 "machine": platform.machine(),
-                "processor": platform.processor(),
+                "processor": self._get_processor_name(),
                 "cpu_count": psutil.cpu_count(),
                 "hostname": socket.gethostname(),
                 "username": os.getenv('USER', 'unknown'),
@@ -43,11 +46,89 @@ class SystemDetector:
             # 网络接口信息
             system_info["network_interfaces"] = self._get_network_interfaces()
             
+            # CPU拓扑
+            system_info["cpu_topology"] = self.get_cpu_topology()
+            
             return SystemInfo(**system_info)
             
         except Exception as e:
             raise Exception(f"Failed to get system info: {str(e)}")
     
+    def _get_processor_name(self) -> str:
+        """获取处理器名称，Linux下platform.processor()通常为空，改读/proc/cpuinfo"""
+        processor = platform.processor()
+        if self.platform == "linux":
+            cpuinfo = linux_sysfs.read_cpuinfo()
+            model_name = next((cpu["model name"] for cpu in cpuinfo if "model name" in cpu), None)
+            if model_name:
+                return model_name
+        return processor
+    
+    def get_cpu_topology(self) -> CPUTopology:
+        """获取CPU拓扑：socket、物理核心、SMT兄弟、NUMA节点和缓存层级"""
+        if self.platform == "linux":
+            try:
+                return self._get_linux_cpu_topology()
+            except Exception:
+                pass
+        
+        # 其他平台只能得到核心数量，按单socket、单NUMA节点处理
+        logical = psutil.cpu_count() or 1
+        physical = psutil.cpu_count(logical=False) or logical
+        return CPUTopology(
+            sockets=1,
+            physical_cores=physical,
+            logical_cpus=logical,
+            threads_per_core=max(1, logical // physical),
+            numa_nodes=[NumaNode(id=0, cpus=list(range(logical)), memory_total=psutil.virtual_memory().total)]
+        )
+    
+    def _get_linux_cpu_topology(self) -> CPUTopology:
+        """从/sys/devices/system读取Linux CPU拓扑"""
+        raw = linux_sysfs.read_cpu_topology()
+        
+        cores = {}
+        for cpu in raw["cpus"]:
+            key = (cpu["socket"], cpu["core_id"])
+            cores.setdefault(key, set()).add(cpu["cpu"])
+        core_list = [
+            CPUCore(socket=socket, core_id=core_id, cpus=sorted(cpus))
+            for (socket, core_id), cpus in sorted(cores.items())
+        ]
+        
+        numa_nodes = [
+            NumaNode(id=node["id"], cpus=node["cpus"], memory_total=node["memory_total"])
+            for node in linux_sysfs.read_numa_nodes()
+            if node["cpus"]
+        ]
+        logical = len(raw["cpus"])
+        if not numa_nodes:
+            numa_nodes = [NumaNode(id=0, cpus=[cpu["cpu"] for cpu in raw["cpus"]],
+                                   memory_total=psutil.virtual_memory().total)]
+        
+        caches = {}
+        for cache in raw["caches"]:
+            key = (cache["level"], cache["type"])
+            if key not in caches:
+                caches[key] = CacheInfo(
+                    level=cache["level"] or 0,
+                    type=cache["type"] or "Unknown",
+                    size=cache["size"],
+                    instances=0,
+                    shared_cpus=linux_sysfs.parse_cpu_list(cache["shared_cpu_list"])
+                )
+            caches[key].instances += 1
+        
+        return CPUTopology(
+            sockets=len({cpu["socket"] for cpu in raw["cpus"]}) or 1,
+            physical_cores=len(core_list) or logical,
+            logical_cpus=logical,
+            threads_per_core=max(1, logical // max(1, len(core_list))),
+            cores=core_list,
+            numa_nodes=numa_nodes,
+            caches=sorted(caches.values(), key=lambda c: (c.level, c.type))
+        )
+    
     def _get_disk_usage(self) -> Dict[str, Any]:
         """获取磁盘使用情况"""
         try:
@@ -112,10 +193,13 @@ class SystemDetector:
         except Exception as e:
             return [{"error": str(e)}]
     
+    @tracer.traced("system.get_detailed_system_info")
     def get_detailed_system_info(self) -> Dict[str, Any]:
-        """获取更详细的系统信息（macOS特定）"""
+        """获取更详细的系统信息（macOS / Linux）"""
+        if self.platform == "linux":
+            return self._get_linux_detailed_info()
         if self.platform != "darwin":
-            return {"error": "Detailed system info only available on macOS"}
+            return {"error": "Detailed system info only available on macOS and Linux"}
         
         try:
             detailed_info = {}
@@ -143,6 +227,13 @@ class SystemDetector:
         except Exception as e:
             return {"error": str(e)}
     
+    def _get_linux_detailed_info(self) -> Dict[str, Any]:
+        """获取Linux详细系统信息，直接读取/proc和/sys，不启动子进程"""
+        try:
+            return linux_sysfs.get_detailed_system_info()
+        except Exception as e:
+            return {"error": str(e)}
+    
     def _run_command(self, command: str) -> str:
         """执行系统命令"""
         try:
@@ -1,35 +1,155 @@
 import asyncio
 import subprocess
+import shlex
+import shutil
 import time
 import os
+import platform
 from datetime import datetime
-from typing import List, Dict, Any
-from models.schemas import TestPlan, TestItem, TestResult, TestExecutionResult, TestStatus
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+from models.schemas import TestPlan, TestItem, TestResult, TestExecutionResult, TestStatus, TestCategory, CPUTopology, CPUCore
+from core.shell_pool import ShellWorkerPool, CommandStalled
+from core.probes import PROBES, run_probe
+from core.system_detector import SystemDetector
+from core.duration_history import DurationHistory
+from core.critical_path import predict
+from core.command_validator import CommandValidator, REJECT, SANDBOX, CRITICAL, INFO
+from core.tracing import tracer
 
 class TestEngine:
     """测试执行引擎"""
     
+    # 未单独指定placement时，计划级benchmark_placement作用于这些类别
+    BENCHMARK_CATEGORIES = [TestCategory.COMPUTING, TestCategory.COMPUTING_POWER]
+    PLACEMENT_MODES = ['none', 'per_core', 'per_numa_node']
+    
     def __init__(self):
         self.platform = os.name
+        self.system = platform.system().lower()
         self.supported_platforms = ['posix', 'nt']
+        self.shell_pool = self._create_shell_pool()
+        self.duration_history = self._create_duration_history()
+        self.command_validator = CommandValidator.from_env()
+        # 同时执行的测试数，基准测试类项目始终独占执行
+        self.concurrency = max(1, int(os.getenv("TEST_ENGINE_CONCURRENCY", "1")))
+        # 没有历史时长的测试的预计时长（秒）
+        self.default_estimate = float(os.getenv("ETA_DEFAULT_SECONDS", "5"))
+        self._topology: Optional[CPUTopology] = None
+    
+    def _create_shell_pool(self) -> Optional[ShellWorkerPool]:
+        """根据环境变量创建常驻shell工作进程池（仅POSIX）"""
+        if self.platform != 'posix':
+            return None
+        if os.getenv("TEST_SHELL_POOL_ENABLED", "false").lower() != "true":
+            return None
+        
+        return ShellWorkerPool(
+            size=int(os.getenv("TEST_SHELL_POOL_SIZE", "2")),
+            max_commands=int(os.getenv("TEST_SHELL_POOL_MAX_COMMANDS", "100"))
+        )
     
-    async def execute_tests(self, test_plan: TestPlan) -> TestExecutionResult:
-        """执行测试计划"""
+    def _create_duration_history(self) -> Optional[DurationHistory]:
+        """根据环境变量创建历史时长记录，用于自适应超时和卡住检测"""
+        if os.getenv("ADAPTIVE_TIMEOUT_ENABLED", "true").lower() != "true":
+            return None
+        return DurationHistory.from_env()
+    
+    async def close(self):
+        """释放执行引擎持有的资源"""
+        if self.shell_pool is not None:
+            await self.shell_pool.close()
+    
+    @tracer.traced("test_engine.execute_tests")
+    async def execute_tests(
+        self,
+        test_plan: TestPlan,
+        on_result: Optional[Callable[[TestResult], Awaitable[None]]] = None,
+        execution_id: Optional[str] = None,
+        completed_results: Optional[List[TestResult]] = None,
+        started_at: Optional[datetime] = None,
+        schedule: Optional[List[Dict[str, Any]]] = None,
+        on_item_state: Optional[Callable[[TestItem, str], Awaitable[None]]] = None
+    ) -> TestExecutionResult:
+        """执行测试计划，on_result在每个测试完成后被调用
+
+        从检查点恢复时传入completed_results，其中已有的测试直接复用结果而不再执行。
+        执行顺序由plan_schedule决定（可传入已计算好的schedule），on_item_state在每个计划项目
+        开始（running）和结束（done）时被调用。回调按完成顺序串行调用。
+        """
         try:
-            execution_id = f"exec_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            started_at = datetime.now()
+            execution_id = execution_id or self.new_execution_id()
+            started_at = started_at or datetime.now()
+            completed = {result.test_item_id: result for result in completed_results or []}
+            hostname = test_plan.system_info.hostname
             
-            # 过滤启用的测试项目
-            enabled_tests = [test for test in test_plan.test_items if test.enabled]
+            # 按历史时长安排执行顺序
+            if schedule is None:
+                schedule = await asyncio.to_thread(self.plan_schedule, test_plan)
+            tracer.current_span().set_attributes(
+                execution_id=execution_id, plan_id=test_plan.id, tests=len(schedule), concurrency=self.concurrency
+            )
+            
+            # 执行前并行校验全部待执行命令：拒绝的项目跳过，有风险的项目在资源限制下执行
+            verdicts: Dict[str, Dict[str, Any]] = {}
+            if self.command_validator.mode != "off":
+                pending = [entry["item"] for entry in schedule if entry["item"].id not in completed]
+                verdicts = {verdict["id"]: verdict for verdict in await self.validate_plan(pending)}
             
-            # 按优先级排序
-            enabled_tests.sort(key=lambda x: x.priority, reverse=True)
+            item_results: Dict[str, List[TestResult]] = {}
+            callback_lock = asyncio.Lock()
             
-            # 执行测试
-            test_results = []
-            for test_item in enabled_tests:
-                result = await self._execute_single_test(test_item)
-                test_results.append(result)
+            async def run_entry(entry: Dict[str, Any]):
+                test_item = entry["item"]
+                if test_item.id in completed:
+                    item_results[test_item.id] = [completed[test_item.id]]
+                    return
+                if on_item_state is not None:
+                    async with callback_lock:
+                        await on_item_state(test_item, "running")
+                
+                verdict = verdicts.get(test_item.id)
+                decision = verdict["decision"] if verdict is not None and self.command_validator.enforcing else None
+                if decision == SANDBOX:
+                    test_item = test_item.model_copy(update={"sandbox": True})
+                
+                if decision == REJECT:
+                    results = [self._rejected_result(test_item, verdict)]
+                elif entry["placement"] != 'none':
+                    results = await self._execute_placed_test(test_item, entry["placement"], completed, hostname)
+                else:
+                    results = [await self._execute_single_test(test_item, hostname)]
+                item_results[test_item.id] = results
+                
+                async with callback_lock:
+                    for result in results:
+                        if on_result is not None and result.test_item_id not in completed:
+                            await on_result(result)
+                    if on_item_state is not None:
+                        await on_item_state(test_item, "done")
+            
+            # 独占项目（以及未开启并发时的全部项目）串行执行，其余项目按最长优先在并发槽上执行
+            for entry in schedule:
+                if entry["exclusive"] or self.concurrency == 1:
+                    await run_entry(entry)
+            semaphore = asyncio.Semaphore(self.concurrency)
+            
+            async def run_shared(entry: Dict[str, Any]):
+                async with semaphore:
+                    await run_entry(entry)
+            
+            tasks = [
+                asyncio.ensure_future(run_shared(entry))
+                for entry in schedule if not entry["exclusive"] and self.concurrency > 1
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            
+            test_results = [result for entry in schedule for result in item_results.get(entry["item"].id, [])]
             
             # 计算统计信息
             completed_at = datetime.now()
@@ -60,8 +180,119 @@ class TestEngine:
         except Exception as e:
             raise Exception(f"Failed to execute tests: {str(e)}")
     
-    async def _execute_single_test(self, test_item: TestItem) -> TestResult:
-        """执行单个测试项目"""
+    async def validate_plan(self, test_items: List[TestItem], chunk_size: int = 64) -> List[Dict[str, Any]]:
+        """分批在线程池中并行校验测试命令，返回与test_items顺序一致的校验结果"""
+        chunks = [test_items[i:i + chunk_size] for i in range(0, len(test_items), chunk_size)]
+        with tracer.span("test_engine.validate_plan", tests=len(test_items)):
+            verdicts = await asyncio.gather(
+                *(asyncio.to_thread(self.command_validator.validate_items, chunk) for chunk in chunks)
+            )
+        return [verdict for chunk in verdicts for verdict in chunk]
+    
+    @staticmethod
+    def _rejected_result(test_item: TestItem, verdict: Dict[str, Any]) -> TestResult:
+        """被命令校验拒绝的项目记为跳过，不执行"""
+        now = datetime.now()
+        reasons = "; ".join(f["message"] for f in verdict["findings"] if f["severity"] == CRITICAL)
+        return TestResult(
+            test_item_id=test_item.id,
+            test_item_name=test_item.name,
+            status=TestStatus.SKIPPED,
+            start_time=now,
+            end_time=now,
+            duration=0,
+            output="Rejected by command validation",
+            error=f"Command rejected: {reasons}"
+        )
+    
+    def _is_exclusive(self, test_item: TestItem, placement: str) -> bool:
+        """基准测试类和按拓扑放置的项目独占执行，避免并发的其他测试干扰测量结果"""
+        return placement != 'none' or test_item.category in self.BENCHMARK_CATEGORIES
+    
+    def _estimate_item(self, test_item: TestItem, placement: str, hostname: str) -> Dict[str, Any]:
+        """单个计划项目的预计时长，拆分放置的项目为各位置之和"""
+        if placement != 'none':
+            runs = [
+                self._placed_item(test_item, target, placement) for target in self._expand_placements(placement)
+            ]
+        else:
+            runs = [test_item]
+        total, learned = 0.0, True
+        for run in runs:
+            estimate = self.duration_history.estimate(run, hostname) if self.duration_history is not None else None
+            if estimate is None:
+                learned = False
+                estimate = min(self.default_estimate, run.timeout)
+            total += estimate
+        return {"estimate": round(total, 3), "source": "history" if learned else "default"}
+    
+    def plan_schedule(self, test_plan: TestPlan) -> List[Dict[str, Any]]:
+        """按历史时长安排启用项目的执行顺序
+
+        串行执行时按优先级、同优先级内最长优先；并发执行时先串行执行独占项目，其余项目按
+        预计时长最长优先（关键路径上的长任务先开始，避免最后一个长任务拖长总时间）。
+        返回 {item, placement, exclusive, estimate, source} 列表，在线程中调用（会读取历史文件）。
+        """
+        hostname = test_plan.system_info.hostname
+        if self.duration_history is not None:
+            self.duration_history.refresh()
+        entries = []
+        for test_item in test_plan.test_items:
+            if not test_item.enabled:
+                continue
+            placement = self._resolve_placement(test_item, test_plan)
+            entries.append({
+                "item": test_item,
+                "placement": placement,
+                "exclusive": self.concurrency > 1 and self._is_exclusive(test_item, placement),
+                **self._estimate_item(test_item, placement, hostname)
+            })
+        if self.concurrency > 1:
+            entries.sort(key=lambda e: (not e["exclusive"], -e["item"].priority if e["exclusive"] else 0,
+                                        -e["estimate"], -e["item"].priority))
+        else:
+            entries.sort(key=lambda e: (-e["item"].priority, -e["estimate"]))
+        return entries
+    
+    def estimate_plan(self, test_plan: TestPlan) -> Dict[str, Any]:
+        """预测计划的执行顺序和总耗时，在线程中调用"""
+        schedule = self.plan_schedule(test_plan)
+        return {
+            "concurrency": self.concurrency,
+            "estimated_seconds": round(predict([(e["estimate"], e["exclusive"]) for e in schedule], self.concurrency), 3),
+            "sequential_seconds": round(sum(e["estimate"] for e in schedule), 3),
+            "items": [
+                {
+                    "id": e["item"].id,
+                    "name": e["item"].name,
+                    "order": index,
+                    "estimate_seconds": e["estimate"],
+                    "source": e["source"],
+                    "exclusive": e["exclusive"]
+                }
+                for index, e in enumerate(schedule)
+            ]
+        }
+    
+    @staticmethod
+    def new_execution_id() -> str:
+        """生成执行ID"""
+        return f"exec_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+    
+    async def _execute_single_test(self, test_item: TestItem, hostname: Optional[str] = None) -> TestResult:
+        """执行单个测试项目，有历史时长时按历史调整超时，成功后记录本次时长"""
+        with tracer.span("test_engine.test", test_id=test_item.id, category=test_item.category.value) as span:
+            if self.duration_history is not None and hostname:
+                test_item = self.duration_history.adapt(test_item, hostname)
+            result = await self._run_test_item(test_item)
+            span.set_attributes(status=result.status.value, exit_code=result.exit_code, timeout=test_item.timeout)
+            tracer.inc("tests_total", help_text="Executed test items by status", status=result.status.value)
+            if self.duration_history is not None and hostname:
+                await self.duration_history.record(test_item, result, hostname)
+            return result
+    
+    async def _run_test_item(self, test_item: TestItem) -> TestResult:
+        """执行单个测试项目并构建结果"""
         start_time = datetime.now()
         
         try:
@@ -78,8 +309,14 @@ class TestEngine:
                     error="Test skipped due to missing dependencies"
                 )
             
-            # 执行命令
-            result = await self._run_command(test_item.command, test_item.timeout)
+            # 执行原生探针或命令，需要时在资源限制下执行
+            command = test_item.command
+            if test_item.sandbox and self.platform == 'posix' and command:
+                command = self.command_validator.sandbox_command(command)
+            if test_item.probe:
+                result = await self._run_probe(test_item.probe, command, test_item.timeout, test_item.stall_timeout)
+            else:
+                result = await self._run_command(command, test_item.timeout, test_item.stall_timeout)
             
             # 计算执行时间
             end_time = datetime.now()
@@ -98,7 +335,10 @@ class TestEngine:
                 output=result['output'],
                 error=result['error'],
                 exit_code=result['exit_code'],
-                raw_log=result['raw_log']
+                raw_log=result['raw_log'],
+                timeout=test_item.timeout,
+                max_silence=result.get('max_silence'),
+                structured_data=result.get('data')
             )
             
         except Exception as e:
@@ -118,8 +358,213 @@ class TestEngine:
                 raw_log=str(e)
             )
     
-    async def _run_command(self, command: str, timeout: int) -> Dict[str, Any]:
-        """运行系统命令"""
+    def _resolve_placement(self, test_item: TestItem, test_plan: TestPlan) -> str:
+        """确定测试项目的拓扑放置方式"""
+        placement = test_item.placement
+        if placement is None and test_item.category in self.BENCHMARK_CATEGORIES:
+            placement = test_plan.custom_config.get('benchmark_placement')
+        if placement not in self.PLACEMENT_MODES:
+            return 'none'
+        return placement
+    
+    def _get_topology(self) -> CPUTopology:
+        """获取本机CPU拓扑（缓存）"""
+        if self._topology is None:
+            self._topology = SystemDetector().get_cpu_topology()
+        return self._topology
+    
+    def _expand_placements(self, placement: str) -> List[Dict[str, Any]]:
+        """按放置方式展开为每个核心或每个NUMA节点的绑定目标"""
+        topology = self._get_topology()
+        if placement == 'per_numa_node':
+            return [
+                {"mode": placement, "node": node.id, "cpus": node.cpus, "label": f"NUMA node {node.id}"}
+                for node in topology.numa_nodes
+            ]
+        
+        # 每个物理核心只绑定第一个SMT线程，避免兄弟线程之间互相干扰
+        cores = topology.cores or [
+            CPUCore(socket=0, core_id=cpu, cpus=[cpu]) for cpu in range(topology.logical_cpus)
+        ]
+        targets = []
+        for core in cores:
+            targets.append({
+                "mode": placement,
+                "socket": core.socket,
+                "core": core.core_id,
+                "cpus": core.cpus[:1],
+                "label": f"socket {core.socket} core {core.core_id}"
+            })
+        return targets
+    
+    def _pin_command(self, command: str, target: Dict[str, Any]) -> Optional[str]:
+        """为命令加上CPU/内存绑定前缀，没有可用的绑定工具时返回None"""
+        wrapped = f"/bin/bash -c {shlex.quote(command)}"
+        if target["mode"] == 'per_numa_node' and shutil.which('numactl'):
+            return f"numactl --cpunodebind={target['node']} --membind={target['node']} {wrapped}"
+        if shutil.which('taskset'):
+            cpu_list = ",".join(str(cpu) for cpu in target["cpus"])
+            return f"taskset -c {cpu_list} {wrapped}"
+        return None
+    
+    @staticmethod
+    def _placement_suffix(target: Dict[str, Any], placement: str) -> str:
+        return f"node{target['node']}" if placement == 'per_numa_node' else f"s{target['socket']}c{target['core']}"
+    
+    def _placed_item(self, test_item: TestItem, target: Dict[str, Any], placement: str) -> TestItem:
+        """绑定到某个核心或NUMA节点执行的测试项目（没有绑定工具时保持原命令）"""
+        return test_item.model_copy(update={
+            "id": f"{test_item.id}@{self._placement_suffix(target, placement)}",
+            "name": f"{test_item.name} [{target['label']}]",
+            "command": self._pin_command(test_item.command, target) or test_item.command,
+            "probe": None
+        })
+    
+    async def _execute_placed_test(
+        self,
+        test_item: TestItem,
+        placement: str,
+        completed: Optional[Dict[str, TestResult]] = None,
+        hostname: Optional[str] = None
+    ) -> List[TestResult]:
+        """在每个核心或NUMA节点上分别绑定执行测试，返回每个位置的结果"""
+        completed = completed or {}
+        results = []
+        for target in self._expand_placements(placement):
+            suffix = self._placement_suffix(target, placement)
+            if f"{test_item.id}@{suffix}" in completed:
+                results.append(completed[f"{test_item.id}@{suffix}"])
+                continue
+            placement_info = {key: value for key, value in target.items() if key != 'label'}
+            placement_info["group"] = test_item.id
+            
+            pinned_command = self._pin_command(test_item.command, target)
+            if pinned_command is None:
+                now = datetime.now()
+                results.append(TestResult(
+                    test_item_id=f"{test_item.id}@{suffix}",
+                    test_item_name=f"{test_item.name} [{target['label']}]",
+                    status=TestStatus.SKIPPED,
+                    start_time=now,
+                    end_time=now,
+                    duration=0,
+                    output="Placement not supported",
+                    error="Neither numactl nor taskset is available for CPU pinning",
+                    placement=placement_info
+                ))
+                continue
+            
+            placed_item = self._placed_item(test_item, target, placement)
+            result = await self._execute_single_test(placed_item, hostname)
+            result.placement = placement_info
+            results.append(result)
+        
+        return results
+    
+    @tracer.traced("test_engine.probe")
+    async def _run_probe(
+        self,
+        probe_id: str,
+        fallback_command: str,
+        timeout: int,
+        stall_timeout: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """在线程中执行原生探针，探针不存在或失败时回退到shell命令"""
+        tracer.current_span().set_attribute("probe", probe_id)
+        if probe_id in PROBES:
+            try:
+                return await asyncio.wait_for(asyncio.to_thread(run_probe, probe_id), timeout=timeout)
+            except asyncio.TimeoutError:
+                return {
+                    'output': '',
+                    'error': f'Probe timed out after {timeout} seconds',
+                    'exit_code': -1,
+                    'raw_log': f'Probe timed out after {timeout} seconds'
+                }
+            except Exception as e:
+                if not fallback_command:
+                    return {
+                        'output': '',
+                        'error': str(e),
+                        'exit_code': -1,
+                        'raw_log': str(e)
+                    }
+        elif not fallback_command:
+            return {
+                'output': '',
+                'error': f'Unknown probe: {probe_id}',
+                'exit_code': -1,
+                'raw_log': f'Unknown probe: {probe_id}'
+            }
+        
+        return await self._run_command(fallback_command, timeout, stall_timeout)
+    
+    async def _communicate(
+        self,
+        process: asyncio.subprocess.Process,
+        timeout: float,
+        stall_timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """读取命令的全部输出，同时记录最长的无输出间隔
+
+        超过timeout抛出asyncio.TimeoutError；设置了stall_timeout且超过该时长没有任何新输出时
+        抛出CommandStalled，不必等到超时。
+        """
+        loop = asyncio.get_running_loop()
+        started = last_output = loop.time()
+        max_silence = 0.0
+        chunks: Dict[str, List[bytes]] = {"stdout": [], "stderr": []}
+        
+        async def pump(name: str, stream: asyncio.StreamReader):
+            nonlocal last_output, max_silence
+            while True:
+                data = await stream.read(64 * 1024)
+                if not data:
+                    return
+                now = loop.time()
+                max_silence = max(max_silence, now - last_output)
+                last_output = now
+                chunks[name].append(data)
+        
+        reader = asyncio.ensure_future(asyncio.gather(
+            pump("stdout", process.stdout), pump("stderr", process.stderr), process.wait()
+        ))
+        try:
+            while not reader.done():
+                now = loop.time()
+                if now - started >= timeout:
+                    raise asyncio.TimeoutError()
+                if stall_timeout and now - last_output >= stall_timeout:
+                    raise CommandStalled(now - last_output)
+                deadline = started + timeout
+                if stall_timeout:
+                    deadline = min(deadline, last_output + stall_timeout)
+                await asyncio.wait({reader}, timeout=max(0.0, deadline - now))
+            reader.result()
+        except BaseException:
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+            raise
+        
+        return {
+            "stdout": b"".join(chunks["stdout"]),
+            "stderr": b"".join(chunks["stderr"]),
+            # 最后一次输出到进程退出之间的静默也计入
+            "max_silence": round(max(max_silence, loop.time() - last_output), 4)
+        }
+    
+    @tracer.traced("test_engine.command")
+    async def _run_command(self, command: str, timeout: int, stall_timeout: Optional[int] = None) -> Dict[str, Any]:
+        """运行系统命令，常驻shell池和逐次启动子进程两种模式都支持stall_timeout"""
+        mode = "pool" if self.shell_pool is not None else "spawn"
+        tracer.current_span().set_attributes(mode=mode, stall_timeout=stall_timeout)
+        tracer.inc("commands_total", help_text="Commands executed by execution mode", mode=mode)
+        if self.shell_pool is not None:
+            try:
+                return await self.shell_pool.run(command, timeout, stall_timeout)
+            except CommandStalled as e:
+                return self._stalled_result(e, stall_timeout)
+        
         try:
             # 在macOS上使用bash
             if self.platform == 'posix':
@@ -135,13 +580,10 @@ class TestEngine:
             )
             
             try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(),
-                    timeout=timeout
-                )
+                streams = await self._communicate(process, timeout, stall_timeout)
                 
-                output = stdout.decode('utf-8', errors='ignore')
-                error_output = stderr.decode('utf-8', errors='ignore')
+                output = streams["stdout"].decode('utf-8', errors='ignore')
+                error_output = streams["stderr"].decode('utf-8', errors='ignore')
                 exit_code = process.returncode
                 
                 # 合并输出
@@ -153,22 +595,22 @@ class TestEngine:
                     'output': output,
                     'error': error_output if exit_code != 0 else None,
                     'exit_code': exit_code,
-                    'raw_log': raw_log
+                    'raw_log': raw_log,
+                    'max_silence': streams["max_silence"]
                 }
                 
-            except asyncio.TimeoutError:
-                # 超时处理
-                process.terminate()
-                try:
-                    await asyncio.wait_for(process.wait(), timeout=5)
-                except asyncio.TimeoutError:
-                    process.kill()
+            except (asyncio.TimeoutError, CommandStalled) as e:
+                # 超时或卡住处理
+                await self._terminate(process)
+                if isinstance(e, CommandStalled):
+                    return self._stalled_result(e, stall_timeout)
+                message = f'Command timed out after {timeout} seconds'
                 
                 return {
                     'output': '',
-                    'error': f'Command timed out after {timeout} seconds',
+                    'error': message,
                     'exit_code': -1,
-                    'raw_log': f'Command timed out after {timeout} seconds'
+                    'raw_log': message
                 }
                 
         except Exception as e:
@@ -179,6 +621,29 @@ class TestEngine:
                 'raw_log': str(e)
             }
     
+    @staticmethod
+    def _stalled_result(stalled: CommandStalled, stall_timeout: Optional[float]) -> Dict[str, Any]:
+        """命令因长时间无输出被终止时的结果"""
+        tracer.inc("tests_stalled_total", help_text="Commands killed for producing no output")
+        message = f'Command stalled: no output for {stalled.silence:.0f} seconds (stall timeout {stall_timeout}s)'
+        return {
+            'output': '',
+            'error': message,
+            'exit_code': -1,
+            'raw_log': message
+        }
+    
+    @staticmethod
+    async def _terminate(process: asyncio.subprocess.Process):
+        """先terminate，5秒内未退出再kill"""
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            process.kill()
+    
     async def _check_dependencies(self, test_item: TestItem) -> bool:
         """检查测试项目的依赖"""
         if not test_item.dependencies:
@@ -192,28 +657,127 @@ class TestEngine:
     
     async def _check_command_exists(self, command: str) -> bool:
         """检查命令是否存在"""
-        try:
-            if self.platform == 'posix':
-                result = await asyncio.create_subprocess_exec(
-                    'which', command,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                await result.communicate()
-                return result.returncode == 0
-            else:
-                # Windows
-                result = await asyncio.create_subprocess_exec(
-                    'where', command,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                await result.communicate()
-                return result.returncode == 0
-        except Exception:
-            return False
+        # 直接在进程内搜索PATH，避免为每个依赖启动which/where子进程
+        return shutil.which(command) is not None
     
     def get_default_tests(self) -> List[TestItem]:
+        """获取当前平台的默认测试项目"""
+        if self.system == "linux":
+            return self._get_linux_default_tests()
+        return self._get_macos_default_tests()
+    
+    def _get_linux_default_tests(self) -> List[TestItem]:
+        """获取默认的测试项目（Linux）"""
+        return [
+            TestItem(
+                id="system_info_basic",
+                name="基本系统信息",
+                description="获取内核和发行版信息",
+                category="system_info",
+                command="uname -a && cat /etc/os-release",
+                timeout=10,
+                priority=5
+            ),
+            TestItem(
+                id="cpu_info",
+                name="CPU信息",
+                description="获取CPU详细信息",
+                category="hardware",
+                command="lscpu",
+                probe="cpu_info",
+                timeout=10,
+                priority=4
+            ),
+            TestItem(
+                id="memory_info",
+                name="内存信息",
+                description="获取内存使用情况",
+                category="hardware",
+                command="free -h",
+                probe="memory_info",
+                timeout=10,
+                priority=4
+            ),
+            TestItem(
+                id="disk_usage",
+                name="磁盘使用情况",
+                description="检查磁盘空间",
+                category="storage",
+                command="df -h",
+                probe="disk_usage",
+                timeout=10,
+                priority=3
+            ),
+            TestItem(
+                id="block_devices",
+                name="块设备",
+                description="检查磁盘设备类型和IO调度器",
+                category="storage",
+                command="lsblk",
+                probe="block_devices",
+                timeout=10,
+                priority=3
+            ),
+            TestItem(
+                id="network_interfaces",
+                name="网络接口",
+                description="检查网络接口状态",
+                category="network",
+                command="ip addr",
+                probe="network_interfaces",
+                timeout=10,
+                priority=3
+            ),
+            TestItem(
+                id="process_list",
+                name="进程列表",
+                description="查看运行中的进程",
+                category="software",
+                command="ps aux --sort=-%mem | head -20",
+                probe="process_top",
+                timeout=10,
+                priority=2
+            ),
+            TestItem(
+                id="installed_packages",
+                name="已安装软件包",
+                description="检查已安装的软件包",
+                category="software",
+                command="(dpkg-query -W -f='${Package} ${Version}\\n' 2>/dev/null || rpm -qa) | head -20",
+                timeout=15,
+                priority=2
+            ),
+            TestItem(
+                id="security_aslr",
+                name="安全设置",
+                description="检查地址空间布局随机化(ASLR)设置",
+                category="security",
+                command="cat /proc/sys/kernel/randomize_va_space",
+                timeout=10,
+                priority=3
+            ),
+            TestItem(
+                id="firewall_status",
+                name="防火墙状态",
+                description="检查防火墙状态",
+                category="security",
+                command="(command -v firewall-cmd >/dev/null && firewall-cmd --state) || (command -v ufw >/dev/null && ufw status) || echo 'No firewall frontend found'",
+                timeout=10,
+                priority=3
+            ),
+            TestItem(
+                id="performance_load",
+                name="系统负载",
+                description="检查系统负载情况",
+                category="performance",
+                command="uptime && cat /proc/loadavg",
+                probe="load_average",
+                timeout=10,
+                priority=3
+            )
+        ]
+    
+    def _get_macos_default_tests(self) -> List[TestItem]:
         """获取默认的测试项目（macOS）"""
         return [
             TestItem(
@@ -231,6 +795,7 @@ class TestEngine:
                 description="获取CPU详细信息",
                 category="hardware",
                 command="sysctl -n machdep.cpu.brand_string && sysctl -n hw.ncpu",
+                probe="cpu_info",
                 timeout=10,
                 priority=4
             ),
@@ -240,6 +805,7 @@ class TestEngine:
                 description="获取内存使用情况",
                 category="hardware",
                 command="vm_stat && top -l 1 | grep PhysMem",
+                probe="memory_info",
                 timeout=10,
                 priority=4
             ),
@@ -249,6 +815,7 @@ class TestEngine:
                 description="检查磁盘空间",
                 category="storage",
                 command="df -h",
+                probe="disk_usage",
                 timeout=10,
                 priority=3
             ),
@@ -258,6 +825,7 @@ class TestEngine:
                 description="检查网络接口状态",
                 category="network",
                 command="ifconfig",
+                probe="network_interfaces",
                 timeout=10,
                 priority=3
             ),
@@ -267,6 +835,7 @@ class TestEngine:
                 description="查看运行中的进程",
                 category="software",
                 command="ps aux | head -20",
+                probe="process_top",
                 timeout=10,
                 priority=2
             ),
@@ -293,7 +862,7 @@ class TestEngine:
                 name="防火墙状态",
                 description="检查防火墙状态",
                 category="security",
-                command="sudo /usr/libexec/ApplicationFirewall/socketfilterfw --getglobalstate",
+                command="/usr/libexec/ApplicationFirewall/socketfilterfw --getglobalstate",
                 timeout=10,
                 priority=3
             ),
@@ -303,6 +872,7 @@ class TestEngine:
                 description="检查系统负载情况",
                 category="performance",
                 command="uptime && top -l 1 | grep 'CPU usage'",
+                probe="load_average",
                 timeout=10,
                 priority=3
             )
@@ -310,32 +880,10 @@ class TestEngine:
     
     async def validate_test_command(self, command: str) -> Dict[str, Any]:
         """验证测试命令是否安全"""
-        dangerous_patterns = [
-            'rm -rf',
-            'sudo',
-            'chmod 777',
-            'dd if=',
-            'mkfs',
-            'fdisk',
-            'format',
-            '> /dev/',
-            '| bash',
-            'eval ',
-            'exec ',
-            'system(',
-            'subprocess.call'
-        ]
-        
-        command_lower = command.lower()
-        
-        for pattern in dangerous_patterns:
-            if pattern in command_lower:
-                return {
-                    'valid': False,
-                    'reason': f'Command contains potentially dangerous pattern: {pattern}'
-                }
-        
+        verdict = await asyncio.to_thread(self.command_validator.analyze, command)
+        reasons = [f["message"] for f in verdict["findings"] if f["severity"] != INFO]
         return {
-            'valid': True,
-            'reason': 'Command appears to be safe'
-        } 
\ No newline at end of file
+            'valid': verdict['decision'] != REJECT,
+            'reason': "; ".join(reasons) if reasons else 'Command appears to be safe',
+            **verdict
+        }
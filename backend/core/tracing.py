@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import asyncio
+import functools
+import threading
+import itertools
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+
+# 默认的耗时直方图分桶（秒）
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0]
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("sysscope_current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """一次被追踪的操作"""
+
+    def __init__(self, name: str, attributes: Dict[str, Any], parent: Optional["Span"]):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.lane = _current_lane()
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start_wall,
+            "duration": self.duration,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+
+class _NoopSpan:
+    """没有活动span时使用的空实现"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+
+def _current_lane() -> int:
+    """Chrome trace中的泳道：异步任务各自一条，其他情况按线程区分"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+class Tracer:
+    """基于span的耗时追踪和Prometheus指标汇总"""
+
+    def __init__(self, max_spans: Optional[int] = None, prefix: str = "sysscope"):
+        self.prefix = prefix
+        # 未指定时在第一个span完成时读取TRACE_MAX_SPANS，避免早于.env加载
+        self._max_spans = max_spans
+        self._buffer: Optional[deque] = None
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._gauges: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], Dict[str, Any]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+        # 附加到所有指标和trace进程名上的标签，例如多worker部署时的worker
+        self.constant_labels: Dict[str, str] = {}
+
+    def set_constant_labels(self, **labels):
+        """设置附加到所有导出指标上的标签"""
+        self.constant_labels = {key: str(value) for key, value in labels.items()}
+
+    # ---- 指标 ----
+
+    def _metric_name(self, name: str) -> str:
+        return f"{self.prefix}_{name}"
+
+    def inc(self, name: str, value: float = 1.0, help_text: str = "", **labels):
+        """累加计数器"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("counter", help_text))
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, help_text: str = "", **labels):
+        """设置瞬时值"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("gauge", help_text))
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, help_text: str = "",
+                buckets: Optional[List[float]] = None, **labels):
+        """记录一次直方图观测值"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help_text))
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                bounds = buckets or DEFAULT_BUCKETS
+                histogram = {"buckets": bounds, "counts": [0] * len(bounds), "sum": 0.0, "count": 0}
+                self._histograms[key] = histogram
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    # ---- span ----
+
+    def current_span(self):
+        """返回当前上下文中的span，没有时返回空实现"""
+        return _current_span.get() or _NoopSpan()
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """追踪一段同步或异步代码的耗时"""
+        span = Span(name, attributes, _current_span.get())
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span)
+
+    def traced(self, name: str):
+        """装饰器形式的span，支持同步和异步函数"""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @property
+    def _spans(self) -> deque:
+        if self._buffer is None:
+            max_spans = self._max_spans
+            if max_spans is None:
+                max_spans = int(os.getenv("TRACE_MAX_SPANS", "10000"))
+            self._buffer = deque(maxlen=max_spans)
+        return self._buffer
+
+    def _finish(self, span: Span):
+        span.duration = time.perf_counter() - span.start
+        with self._lock:
+            self._spans.append(span)
+        self.observe("span_duration_seconds", span.duration,
+                     help_text="Duration of traced operations", span=span.name)
+        if span.error:
+            self.inc("span_errors_total", help_text="Traced operations that raised", span=span.name)
+
+    def recent_spans(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """返回最近完成的span"""
+        with self._lock:
+            spans = list(self._spans)[-limit:]
+        return [span.to_dict() for span in spans]
+
+    # ---- 导出 ----
+
+    @staticmethod
+    def _escape_label(value: Any) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def _format_labels(self, labels: Tuple, extra: Optional[Dict[str, str]] = None) -> str:
+        items = list(self.constant_labels.items()) + list(labels) + list((extra or {}).items())
+        if not items:
+            return ""
+        return "{" + ",".join(f'{key}="{self._escape_label(value)}"' for key, value in items) + "}"
+
+    def render_prometheus(self) -> str:
+        """按Prometheus文本格式导出所有指标"""
+        lines = []
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: dict(value, counts=list(value["counts"])) for key, value in self._histograms.items()}
+            help_entries = dict(self._help)
+
+        for name, (metric_type, help_text) in sorted(help_entries.items()):
+            metric = self._metric_name(name)
+            if help_text:
+                lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+
+            if metric_type == "counter":
+                for (key_name, labels), value in sorted(counters.items()):
+                    if key_name == name:
+                        lines.append(f"{metric}{self._format_labels(labels)} {value}")
+            elif metric_type == "gauge":
+                for (key_name, labels), value in sorted(gauges.items()):
+                    if key_name == name:
+                        lines.append(f"{metric}{self._format_labels(labels)} {value}")
+            else:
+                for (key_name, labels), histogram in sorted(histograms.items()):
+                    if key_name != name:
+                        continue
+                    for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                        lines.append(f"{metric}_bucket{self._format_labels(labels, {'le': str(bound)})} {count}")
+                    lines.append(f"{metric}_bucket{self._format_labels(labels, {'le': '+Inf'})} {histogram['count']}")
+                    lines.append(f"{metric}_sum{self._format_labels(labels)} {histogram['sum']}")
+                    lines.append(f"{metric}_count{self._format_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """导出为Chrome trace格式（chrome://tracing 或 Perfetto 可直接打开）"""
+        with self._lock:
+            spans = list(self._spans)
+
+        pid = os.getpid()
+        lanes: Dict[int, int] = {}
+        events = []
+        for span in spans:
+            tid = lanes.setdefault(span.lane, len(lanes) + 1)
+            args = dict(span.attributes)
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": span.name,
+                "ph": "X",
+                "ts": int(span.start_wall * 1_000_000),
+                "dur": int((span.duration or 0) * 1_000_000),
+                "pid": pid,
+                "tid": tid,
+                "args": args
+            })
+        trace = {"traceEvents": events, "displayTimeUnit": "ms"}
+        if self.constant_labels:
+            # 多个worker的trace合并查看时按进程名区分
+            name = " ".join(f"{key}={value}" for key, value in self.constant_labels.items())
+            events.insert(0, {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}})
+            trace["otherData"] = dict(self.constant_labels)
+        return trace
+
+    def write_chrome_trace(self, path: str) -> str:
+        """将当前缓冲区中的span写入Chrome trace文件"""
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False, default=str)
+        return path
+
+
+tracer = Tracer()
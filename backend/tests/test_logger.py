@@ -0,0 +1,80 @@
+import io
+import sys
+import json
+import queue
+import logging
+import logging.handlers
+
+import pytest
+
+from core.logger import JsonFormatter, TextFormatter, _DroppingQueueHandler, register_secret, fields
+
+SECRET = "sk-SECRETKEY123"
+
+
+@pytest.fixture
+def capture(request):
+    """按给定格式化器搭建与setup_logging相同的队列链路，返回logger和读取输出的函数"""
+    register_secret(SECRET)
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(request.param())
+    log_queue = queue.Queue()
+    listener = logging.handlers.QueueListener(log_queue, output)
+    logger = logging.getLogger(f"sysscope.test.{request.param.__name__}")
+    logger.handlers = [_DroppingQueueHandler(log_queue, 1000)]
+    logger.propagate = False
+    listener.start()
+
+    def read() -> str:
+        listener.stop()
+        return stream.getvalue()
+
+    yield logger, read
+    logger.handlers = []
+
+
+def raise_with_secret():
+    raise RuntimeError(f"upstream rejected key {SECRET}")
+
+
+@pytest.mark.parametrize("capture", [JsonFormatter, TextFormatter], indirect=True)
+def test_exception_traceback_is_redacted(capture):
+    logger, read = capture
+    try:
+        raise_with_secret()
+    except RuntimeError:
+        logger.exception("call failed")
+    output = read()
+    assert SECRET not in output
+    assert "sk-***" in output
+    assert "Traceback" in output
+
+
+def test_json_keeps_exception_separate_from_message():
+    register_secret(SECRET)
+    log_queue = queue.Queue()
+    handler = _DroppingQueueHandler(log_queue, 200)
+    try:
+        raise_with_secret()
+    except RuntimeError:
+        record = logging.getLogger("sysscope.test").makeRecord(
+            "sysscope.test", logging.ERROR, __file__, 0, "call failed", None, sys.exc_info())
+    entry = json.loads(JsonFormatter().format(handler.prepare(record)))
+    assert entry["message"] == "call failed"
+    assert "RuntimeError" in entry["exception"]
+    assert SECRET not in entry["exception"]
+
+
+@pytest.mark.parametrize("capture", [TextFormatter], indirect=True)
+def test_long_tracebacks_and_fields_are_truncated(capture):
+    logger, read = capture
+    try:
+        raise RuntimeError("x" * 5000)
+    except RuntimeError:
+        logger.exception("call failed", extra=fields(body="y" * 5000, token=SECRET))
+    output = read()
+    assert "x" * 1500 not in output
+    assert "y" * 1500 not in output
+    assert "truncated" in output
+    assert SECRET not in output